@@ -0,0 +1,68 @@
+import os
+import random
+
+# Word lists of the synthetic corpus. The stub parsers tag with the same lists, so every
+# sentence gets the same parse on every run and on every commit.
+DETERMINERS = ['the', 'a', 'an', 'some', 'every']
+ADJECTIVES = ['radioactive', 'rare', 'large', 'small', 'heavy', 'common', 'stable', 'natural', 'chemical', 'toxic']
+NOUNS = ['element', 'metal', 'isotope', 'compound', 'mineral', 'crust', 'symbol', 'number', 'gas', 'reaction',
+         'animal', 'dog', 'cat', 'planet', 'star', 'city', 'river', 'scientist', 'country', 'language']
+PLURALS = [noun + 's' for noun in NOUNS]
+PROPER_NOUNS = ['Astatine', 'Uranium', 'Earth', 'Mars', 'Berlin', 'Germany', 'Curie', 'Europe', 'Maven', 'Danube']
+VERBS = ['is', 'contains', 'forms', 'produces', 'orbits', 'crosses', 'studies', 'replaces', 'includes', 'was']
+PREPOSITIONS = ['on', 'in', 'with', 'of', 'near']
+CONJUNCTIONS = ['and', 'or']
+
+TEMPLATES = [
+    '{P} {V} {D} {A} {N} {I} {D} {N}.',
+    '{P} {V} {D} {A} {N} with the {N} {N} {P} and {A} {N} {P2}.',
+    '{D} {A} {NS} such as {P}, {P2} and {P3} {V} {A}.',
+    '{NS} , such as {NS2} or {NS3} , {V} {D} {N}.',
+    '{P} and other {A} {NS} {V} {D} {N} {I} {P2}.',
+    '{D} {N} {V} {NS} including {NS2} and {NS3}.',
+    '{P} {V} {D} {N} , especially {NS} {I} {P2}.',
+    '{D} {A} {N} {V} {D} {N} {I} {D} {A} {N} {I} {P}.',
+]
+
+SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'sample.txt')
+
+
+def synthetic_sentence(rng):
+    template = rng.choice(TEMPLATES)
+    sentence = template.format(
+        D=rng.choice(DETERMINERS), A=rng.choice(ADJECTIVES), N=rng.choice(NOUNS),
+        NS=rng.choice(PLURALS), NS2=rng.choice(PLURALS), NS3=rng.choice(PLURALS),
+        P=rng.choice(PROPER_NOUNS), P2=rng.choice(PROPER_NOUNS), P3=rng.choice(PROPER_NOUNS),
+        V=rng.choice(VERBS), I=rng.choice(PREPOSITIONS),
+    ).replace(' ,', ',')
+    return sentence[0].upper() + sentence[1:]
+
+
+def synthetic_corpus(size, seed=0):
+    '''
+    size sentences drawn from the templates, the same for a given seed
+    '''
+    rng = random.Random(seed)
+    return [synthetic_sentence(rng) for _ in range(size)]
+
+
+def sample_corpus(size, path=SAMPLE):
+    '''
+    the bundled sample sentences, cycled to size sentences
+    '''
+    with open(path, 'r', encoding='utf-8') as f:
+        sentences = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    return [sentences[i % len(sentences)] for i in range(size)]
+
+
+CORPORA = {
+    'synthetic': synthetic_corpus,
+    'sample': sample_corpus,
+}
+
+
+def documents(sentences, size):
+    '''
+    groups sentences into documents of size sentences
+    '''
+    return [' '.join(sentences[i:i + size]) for i in range(0, len(sentences), size)]
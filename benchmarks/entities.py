@@ -0,0 +1,98 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from src.entityIndex import EntityIndex, resolve_entities
+
+# Times the entity resolution of depsAdv on a synthetic document: the linear entity scan over
+# the accumulated hypernyms it used to do, the same scan per sentence and the EntityIndex,
+# and checks that the index resolves every triple like the scan. Prints the seconds as JSON.
+#
+#   python -m benchmarks.entities --sentences 1000
+
+
+def scan(triplets, entities):
+    '''
+    the linear scan resolve_entities replaces, every argument becomes the first entity containing it
+    '''
+    entity_triples = list()
+    for triple in triplets:
+        triple = list(triple)
+        for entity in entities:
+            if triple[0] in entity:
+                triple[0] = entity
+                break
+        for entity in entities:
+            if triple[2] in entity:
+                triple[2] = entity
+                break
+        if triple[0] != triple[2]:
+            entity_triples.append(triple)
+    return entity_triples
+
+
+def document(sentences, triples, hypernyms, entities, seed=0):
+    '''
+    (triplets, hypernyms, entities) of every sentence, the entities are three words each
+    '''
+    rng = random.Random(seed)
+    vocabulary = ['word{}'.format(i) for i in range(2000)]
+    document = list()
+    for _ in range(sentences):
+        sentence_entities = [' '.join(rng.sample(vocabulary, 3)) for _ in range(entities)]
+        triplets = [(rng.choice(vocabulary), 'rel', rng.choice(vocabulary)) for _ in range(triples)]
+        sentence_hypernyms = [(rng.choice(vocabulary), 'hypernym', rng.choice(vocabulary)) for _ in range(hypernyms)]
+        document.append((triplets, sentence_hypernyms, sentence_entities))
+    return document
+
+
+def run(sentences):
+    for triplets, hypernyms, entities in sentences:
+        assert scan(triplets, entities) == resolve_entities(triplets, entities)
+
+    results = dict()
+    # before: the hypernyms of all the previous sentences were checked again for every sentence
+    start = time.perf_counter()
+    accumulated = list()
+    for triplets, hypernyms, entities in sentences:
+        accumulated.extend(hypernyms)
+        scan(triplets, entities)
+        scan(accumulated, entities)
+    results['scan_accumulated_seconds'] = round(time.perf_counter() - start, 4)
+
+    start = time.perf_counter()
+    for triplets, hypernyms, entities in sentences:
+        scan(triplets, entities)
+        scan(hypernyms, entities)
+    results['scan_seconds'] = round(time.perf_counter() - start, 4)
+
+    start = time.perf_counter()
+    for triplets, hypernyms, entities in sentences:
+        index = EntityIndex(entities)
+        resolve_entities(triplets, index)
+        resolve_entities(hypernyms, index)
+    results['index_seconds'] = round(time.perf_counter() - start, 4)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='EntityIndex against the linear entity scan')
+    parser.add_argument('--sentences', type=int, default=1000)
+    parser.add_argument('--triples', type=int, default=20, help='triples per sentence')
+    parser.add_argument('--hypernyms', type=int, default=3, help='hypernyms per sentence')
+    parser.add_argument('--entities', type=int, default=30, help='entities per sentence')
+    args = parser.parse_args(argv)
+    sentences = document(args.sentences, args.triples, args.hypernyms, args.entities)
+    print(json.dumps(dict(run(sentences), sentences=args.sentences)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
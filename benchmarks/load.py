@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.corpora import CORPORA
+from benchmarks.run import percentile
+
+# Load generator for src.service: concurrency clients on keep-alive connections post
+# requests sentences of a corpus and the throughput, latency percentiles and status counts
+# are printed as JSON.
+#
+#   python -m src.service --stubs --stub-latency 0.005 &
+#   python -m benchmarks.load --concurrency 64 --requests 5000
+
+
+async def post(reader, writer, host, path, text, deadline_ms):
+    request = {'text': text}
+    if deadline_ms is not None:
+        request['deadline_ms'] = deadline_ms
+    body = json.dumps(request).encode('utf-8')
+    writer.write('POST {} HTTP/1.1\r\nHost: {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n\r\n'.format(
+        path, host, len(body)).encode('latin-1') + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if not line.strip():
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def client(host, port, path, texts, deadline_ms, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for text in texts:
+            start = time.perf_counter()
+            status = await post(reader, writer, host, path, text, deadline_ms)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run(host, port, path, sentences, concurrency, deadline_ms):
+    latencies = list()
+    statuses = dict()
+    started = time.perf_counter()
+    await asyncio.gather(*[client(host, port, path, sentences[i::concurrency], deadline_ms, latencies, statuses) for i in range(concurrency)])
+    wall = time.perf_counter() - started
+    return {
+        'requests': len(sentences),
+        'concurrency': concurrency,
+        'wall_seconds': round(wall, 4),
+        'requests_per_sec': round(len(sentences) / wall, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'statuses': dict((str(k), v) for k, v in sorted(statuses.items())),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load generator for src.service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--path', default='/hearst', choices=['/hearst', '/triples'])
+    parser.add_argument('--corpus', default='synthetic', choices=sorted(CORPORA))
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--deadline-ms', type=float, default=None)
+    args = parser.parse_args(argv)
+    sentences = CORPORA[args.corpus](args.requests)
+    print(json.dumps(asyncio.run(run(args.host, args.port, args.path, sentences, args.concurrency, args.deadline_ms))))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.corpora import CORPORA, documents
+
+# End to end benchmarks of the extractors on stub parsers (see stubs.py).
+#
+#   python -m benchmarks.run --sizes 10 100 1000 --output report.json
+#   python -m benchmarks.run --compare baseline.json
+#
+# Every (benchmark, corpus, size) runs in a fresh interpreter, so the peak RSS is that of
+# the run alone, and the report records the git revision, so reports of different commits
+# can be compared.
+
+DEFAULT_SIZES = [10, 100, 1000]
+DOCUMENT_SENTENCES = 20
+
+
+def install_stubs(latency):
+    '''
+    swaps the spacy models and the CoreNLP parsers for the stubs
+    '''
+    from benchmarks import stubs
+    from src.models import registry
+    from src import deps, parseTree
+    nlp = stubs.StubNLP(latency)
+    for name in ['en', 'en_coref', 'de', 'fr', 'es']:
+        registry.set(name, nlp)
+    deps.dep_parser = stubs.StubDependencyParser(latency)
+    parseTree.parser = stubs.StubParser(latency)
+    return stubs.StubClient(latency)
+
+
+def uncached():
+    from src.parseCache import ParseCache
+    return ParseCache(max_size=0)
+
+
+def hearst(**options):
+    def setup(client):
+        from src.hpatterns import HearstPatterns
+        h = HearstPatterns(**options)
+        return h.find_hearstpatterns_spacy
+    return setup
+
+
+def treebank(client):
+    from src.parseTree import TripleExtraction
+    return TripleExtraction(parse_cache=uncached(), client=client).treebank
+
+
+def short_relations(client):
+    from src.deps import TripleExtraction_Deps
+    extractor = TripleExtraction_Deps(parse_cache=uncached(), client=client)
+    return lambda sentence: extractor.short_relations(extractor.dependency_graph(sentence), 2)
+
+
+def advanced_triples(client):
+    from src.depsAdv import AdvancedTripleExtractionDeps
+
+    def run(document):
+        extractor = AdvancedTripleExtractionDeps(document)
+        extractor.parse_cache = uncached()
+        extractor.client = client
+        return extractor.get_triples()
+    return run
+
+
+def multilang(language):
+    def setup(client):
+        from src.multiLang import TripleExtraction_Deps_Lang
+        extractor = TripleExtraction_Deps_Lang(language)
+        extractor.parse_cache = uncached()
+        return lambda sentence: extractor.short_relations(extractor.dep_parser.get_dependency_graph(sentence), 2)
+    return setup
+
+
+# name -> (setup(client) returning the function to time, unit it is called on)
+BENCHMARKS = {
+    'hearst_default': (hearst(), 'sentence'),
+    'hearst_extended': (hearst(extended=True), 'sentence'),
+    'hearst_greedy': (hearst(greedy=True), 'sentence'),
+    'hearst_semi': (hearst(semi=True), 'sentence'),
+    'treebank': (treebank, 'sentence'),
+    'short_relations': (short_relations, 'sentence'),
+    'advanced_triples': (advanced_triples, 'document'),
+    'multilang_german': (multilang('german'), 'sentence'),
+    'multilang_french': (multilang('french'), 'sentence'),
+    'multilang_spanish': (multilang('spanish'), 'sentence'),
+}
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return None
+    k = min(len(values) - 1, max(0, int(math.ceil(q / 100.0 * len(values))) - 1))
+    return values[k]
+
+
+def run_one(name, corpus, size, latency=0, with_metrics=False):
+    '''
+    runs one benchmark in this process, returns its result dict, with the per stage
+    summary of src.metrics if with_metrics. Calls which raise are counted as errors and left
+    out of the latencies, a result with errors is marked failed and gets no sentences/sec
+    '''
+    client = install_stubs(latency)
+    from src.metrics import metrics
+    metrics.reset()
+    if with_metrics:
+        metrics.enable()
+    setup, unit = BENCHMARKS[name]
+    function = setup(client)
+    sentences = CORPORA[corpus](size)
+    items = documents(sentences, DOCUMENT_SENTENCES) if unit == 'document' else sentences
+    latencies = list()
+    errors = 0
+    first_error = None
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    for item in items:
+        start = time.perf_counter()
+        try:
+            function(item)
+        except Exception as e:
+            errors += 1
+            if first_error is None:
+                first_error = '{}: {}'.format(type(e).__name__, e)
+            continue
+        latencies.append(time.perf_counter() - start)
+    wall = time.perf_counter() - wall
+    cpu = time.process_time() - cpu
+    metrics.disable()
+    result = {
+        'benchmark': name,
+        'corpus': corpus,
+        'sentences': len(sentences),
+        'unit': unit,
+        'calls': len(items),
+        'errors': errors,
+        'wall_seconds': round(wall, 6),
+        'cpu_seconds': round(cpu, 6),
+        'sentences_per_sec': round(len(sentences) / wall, 2) if wall and not errors else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 4) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 4) if latencies else None,
+        # kilobytes on linux
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    if errors:
+        result['failed'] = '{} of {} calls raised, the first {}'.format(errors, len(items), first_error)
+    if with_metrics:
+        result['metrics'] = metrics.summary()
+    return result
+
+
+def run_isolated(name, corpus, size, latency=0, with_metrics=False):
+    command = [sys.executable, '-m', 'benchmarks.run', '--worker', name, corpus, str(size), '--latency', str(latency)]
+    if with_metrics:
+        command.append('--metrics')
+    process = subprocess.run(command, cwd=ROOT_DIR, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if process.returncode != 0:
+        return {'benchmark': name, 'corpus': corpus, 'sentences': size, 'failed': process.stderr.strip().splitlines()[-1:]}
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def git_revision():
+    try:
+        rev = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT_DIR, universal_newlines=True).strip()
+        dirty = subprocess.call(['git', 'diff', '--quiet', 'HEAD'], cwd=ROOT_DIR) != 0
+        return rev + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline, threshold):
+    '''
+    prints the change in sentences/sec and error count against a baseline report, returns the
+    regressions (slowdowns by more than threshold, e.g. 0.1 for 10%, results which fail where
+    the baseline did not and results with more errors)
+    '''
+    key = lambda r: (r['benchmark'], r['corpus'], r['sentences'])
+    before = dict((key(r), r) for r in baseline['results'])
+    regressions = list()
+    for result in report['results']:
+        old = before.get(key(result))
+        if old is None:
+            continue
+        flags = list()
+        regression = False
+        change = None
+        if result.get('sentences_per_sec') and old.get('sentences_per_sec'):
+            change = result['sentences_per_sec'] / old['sentences_per_sec'] - 1
+            if change < -threshold:
+                flags.append('REGRESSION')
+                regression = True
+        if 'failed' in result and 'failed' not in old:
+            flags.append('FAILED')
+            regression = True
+        errors = result.get('errors') or 0
+        old_errors = old.get('errors') or 0
+        if errors != old_errors:
+            flags.append('ERRORS {} -> {}'.format(old_errors, errors))
+            regression = regression or errors > old_errors
+        if regression:
+            regressions.append(result)
+        change = '{:>+8.1%}'.format(change) if change is not None else '{:>8}'.format('n/a')
+        print('{:20} {:10} {:>7} {}{}'.format(result['benchmark'], result['corpus'], result['sentences'], change,
+                                              ''.join('  ' + flag for flag in flags)))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='End to end benchmarks of the extractors on stub parsers')
+    parser.add_argument('--benchmarks', nargs='+', default=sorted(BENCHMARKS), choices=sorted(BENCHMARKS))
+    parser.add_argument('--corpora', nargs='+', default=sorted(CORPORA), choices=sorted(CORPORA))
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES, help='sentences per corpus, e.g. 10 100 1000 10000 100000')
+    parser.add_argument('--latency', type=float, default=0, help='seconds every stub parse sleeps, models a remote parser')
+    parser.add_argument('--output', default=None, help='JSON report file, printed if not given')
+    parser.add_argument('--compare', default=None, help='baseline JSON report to compare sentences/sec and errors with')
+    parser.add_argument('--threshold', type=float, default=0.1, help='slowdown reported as a regression')
+    parser.add_argument('--metrics', action='store_true', help='add the per stage times of src.metrics to every result')
+    parser.add_argument('--in-process', action='store_true', help='run everything in this interpreter (peak RSS becomes cumulative)')
+    parser.add_argument('--worker', nargs=3, metavar=('BENCHMARK', 'CORPUS', 'SIZE'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        name, corpus, size = args.worker
+        print(json.dumps(run_one(name, corpus, int(size), args.latency, args.metrics)))
+        return 0
+
+    results = list()
+    for name in args.benchmarks:
+        for corpus in args.corpora:
+            for size in args.sizes:
+                if args.in_process:
+                    result = run_one(name, corpus, size, args.latency, args.metrics)
+                else:
+                    result = run_isolated(name, corpus, size, args.latency, args.metrics)
+                print('{} {} {}: {}'.format(name, corpus, size, result.get('failed') or result.get('sentences_per_sec')), file=sys.stderr)
+                results.append(result)
+    report = {
+        'git_revision': git_revision(),
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'latency': args.latency,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,355 @@
+import math
+import re
+import time
+
+from nltk.tree import Tree
+
+from src.depGraph import DependencyGraph, ROOT
+
+from .corpora import DETERMINERS, ADJECTIVES, NOUNS, PLURALS, VERBS, PREPOSITIONS, CONJUNCTIONS
+
+# Local stand-ins for spacy and the CoreNLP server. They tag from the corpus word lists and
+# build the parses with a few fixed rules, cheaply and deterministically, so the benchmarks
+# measure the extractors and not the parsers. latency (seconds) is slept per parse to model
+# a remote parser, it shows up in the wall time but not in the CPU time.
+
+TOKEN = re.compile(r"\w+(?:[-']\w+)*|[^\w\s]")
+
+# like the real parsers and client, which all talk to the same server, the stubs share one url,
+# so parses cached through one of them are found through the others
+STUB_URL = 'stub://corenlp'
+
+LEXICON = dict()
+LEXICON.update((w, 'DT') for w in DETERMINERS)
+LEXICON.update((w, 'JJ') for w in ADJECTIVES + ['other', 'such', 'chemical', 'largest', 'first'])
+LEXICON.update((w, 'NN') for w in NOUNS)
+LEXICON.update((w, 'NNS') for w in PLURALS)
+LEXICON.update((w, 'VBZ') for w in VERBS + ['are', 'has', 'had', 'covers', 'provides', 'include'])
+LEXICON.update((w, 'IN') for w in PREPOSITIONS + ['as', 'by', 'from', 'for', 'into', 'after', 'like', 'including'])
+LEXICON.update((w, 'CC') for w in CONJUNCTIONS)
+LEXICON.update((w, 'RB') for w in ['especially', 'very', 'highly', 'primarily'])
+PUNCTUATION = {'.': '.', ',': ',', '!': '.', '?': '.', ';': ':', ':': ':'}
+SENTENCE_END = set(['.', '!', '?'])
+
+
+def tag(word, first):
+    if word in PUNCTUATION:
+        return PUNCTUATION[word]
+    lower = word.lower()
+    if lower in LEXICON:
+        return LEXICON[lower]
+    if word[0].isupper() and not first:
+        return 'NNP'
+    if word.isdigit():
+        return 'CD'
+    return 'NNS' if lower.endswith('s') else 'NN'
+
+
+def is_noun(t):
+    return t.startswith('NN') or t == 'CD'
+
+
+def rule_parse(words, tags):
+    '''
+    heads and relations for a tagged sentence: the first verb is the root, nouns before it
+    are its subjects and nouns after it its objects (through the preceding preposition if
+    there is one), determiners and adjectives attach to the next noun
+    '''
+    n = len(words)
+    verbs = [i for i in range(n) if tags[i].startswith('VB')]
+    root = verbs[0] if verbs else next((i for i in range(n) if is_noun(tags[i])), 0)
+    heads = [root] * n
+    relations = ['dep'] * n
+    heads[root] = ROOT
+    relations[root] = 'ROOT'
+    preposition = None
+    for i in range(n):
+        if i == root:
+            continue
+        t = tags[i]
+        if t in ('DT', 'JJ', 'CD', 'RB'):
+            head = next((j for j in range(i + 1, n) if is_noun(tags[j]) and j != root), root)
+            heads[i] = head
+            relations[i] = {'DT': 'det', 'JJ': 'amod', 'CD': 'nummod', 'RB': 'advmod'}[t]
+        elif t == 'IN':
+            preposition = i
+            relations[i] = 'prep'
+        elif is_noun(t):
+            if preposition is not None:
+                heads[i] = preposition
+                relations[i] = 'pobj'
+                preposition = None
+            elif i < root:
+                relations[i] = 'nsubj'
+            else:
+                relations[i] = 'dobj'
+        elif t == 'CC':
+            relations[i] = 'cc'
+        elif t in ('.', ',', ':'):
+            relations[i] = 'punct'
+    return heads, relations
+
+
+def noun_chunk_spans(tags):
+    spans = list()
+    start = None
+    for i, t in enumerate(tags + ['.']):
+        if t in ('DT', 'JJ') or is_noun(t):
+            if start is None:
+                start = i
+            continue
+        if start is not None:
+            end = i
+            while end > start and not is_noun(tags[end - 1]):
+                end -= 1
+            if end > start:
+                spans.append((start, end))
+            start = None
+    return spans
+
+
+class StubToken(object):
+    __slots__ = ('doc', 'i', 'idx', 'text', 'lemma_', 'tag_', 'dep_', 'whitespace_', 'head_i', 'ent')
+
+    @property
+    def head(self):
+        return self.doc.tokens[self.head_i]
+
+
+class StubSpan(object):
+
+    def __init__(self, doc, start, end):
+        self.doc = doc
+        self.start = start
+        self.end = end
+
+    def __iter__(self):
+        return iter(self.doc.tokens[self.start:self.end])
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __getitem__(self, i):
+        return self.doc.tokens[self.start:self.end][i]
+
+    @property
+    def start_char(self):
+        return self.doc.tokens[self.start].idx
+
+    @property
+    def text(self):
+        tokens = self.doc.tokens[self.start:self.end]
+        return self.doc.text[tokens[0].idx:tokens[-1].idx + len(tokens[-1].text)] if tokens else ''
+
+    @property
+    def noun_chunks(self):
+        return [c for c in self.doc.chunks if c.start >= self.start and c.end <= self.end]
+
+    @property
+    def ents(self):
+        return [e for e in self.doc.entities if e.start >= self.start and e.end <= self.end]
+
+
+class StubExtensions(object):
+    pass
+
+
+class StubDoc(StubSpan):
+
+    def __init__(self, text):
+        self.text_ = text
+        self.tokens = list()
+        sentence_starts = [0]
+        for m in TOKEN.finditer(text):
+            token = StubToken()
+            token.doc = self
+            token.i = len(self.tokens)
+            token.idx = m.start()
+            token.text = m.group(0)
+            token.whitespace_ = ' ' if text[m.end():m.end() + 1].isspace() else ''
+            self.tokens.append(token)
+            if token.text in SENTENCE_END:
+                sentence_starts.append(token.i + 1)
+        super().__init__(self, 0, len(self.tokens))
+        self.sents = list()
+        self.chunks = list()
+        self.entities = list()
+        bounds = sorted(set(sentence_starts + [len(self.tokens)]))
+        for start, end in zip(bounds, bounds[1:]):
+            tokens = self.tokens[start:end]
+            tags = [tag(t.text, k == 0) for k, t in enumerate(tokens)]
+            heads, relations = rule_parse([t.text for t in tokens], tags)
+            for t, t_tag, head, relation in zip(tokens, tags, heads, relations):
+                t.tag_ = t_tag
+                t.lemma_ = t.text.lower()[:-1] if t_tag == 'NNS' else t.text.lower()
+                t.dep_ = relation
+                t.head_i = t.i if head == ROOT else start + head
+            self.sents.append(StubSpan(self, start, end))
+            self.chunks.extend(StubSpan(self, start + s, start + e) for s, e in noun_chunk_spans(tags))
+            self.entities.extend(StubSpan(self, start + k, start + k + 1) for k, t in enumerate(tags) if t == 'NNP')
+        self._ = StubExtensions()
+        self._.coref_resolved = text
+
+    @property
+    def text(self):
+        return self.text_
+
+
+class StubNLP(object):
+    """
+    spacy Language stand-in: nlp(text), nlp.pipe(texts) and the coref_resolved extension
+    """
+
+    def __init__(self, latency=0):
+        self.latency = latency
+
+    def __call__(self, text, disable=()):
+        if self.latency:
+            time.sleep(self.latency)
+        return StubDoc(text)
+
+    def pipe(self, texts, batch_size=1000, n_process=1, disable=()):
+        '''
+        like spacy, a batch costs the latency once
+        '''
+        texts = list(texts)
+        for start in range(0, len(texts), batch_size):
+            if self.latency:
+                time.sleep(self.latency)
+            for text in texts[start:start + batch_size]:
+                yield StubDoc(text)
+
+
+def tagged(tokens):
+    return [tag(t, k == 0) for k, t in enumerate(tokens)]
+
+
+def dependency_graph(tokens):
+    tags = tagged(tokens)
+    heads, relations = rule_parse(tokens, tags)
+    return DependencyGraph(tokens, tags, heads, relations)
+
+
+def constituency_tree(tokens):
+    '''
+    (ROOT (S (NP ..) (VP (VBZ ..) (NP ..) (PP (IN ..) (NP ..))) (. .)))
+    '''
+    tags = tagged(tokens)
+    chunks = dict((start, end) for start, end in noun_chunk_spans(tags))
+    root = next((i for i, t in enumerate(tags) if t.startswith('VB')), len(tokens))
+
+    def phrases(start, end):
+        nodes = list()
+        i = start
+        while i < end:
+            if i in chunks and chunks[i] <= end:
+                nodes.append(Tree('NP', [Tree(tags[k], [tokens[k]]) for k in range(i, chunks[i])]))
+                i = chunks[i]
+            elif tags[i] == 'IN' and i + 1 in chunks:
+                j = chunks[i + 1]
+                nodes.append(Tree('PP', [Tree('IN', [tokens[i]]), Tree('NP', [Tree(tags[k], [tokens[k]]) for k in range(i + 1, j)])]))
+                i = j
+            else:
+                nodes.append(Tree(tags[i], [tokens[i]]))
+                i += 1
+        return nodes
+
+    end = len(tokens) - 1 if tokens and tags[-1] == '.' else len(tokens)
+    children = phrases(0, min(root, end))
+    if root < end:
+        children.append(Tree('VP', [Tree(tags[root], [tokens[root]])] + phrases(root + 1, end)))
+    children.extend(Tree(tags[k], [tokens[k]]) for k in range(end, len(tokens)))
+    return Tree('ROOT', [Tree('S', children)])
+
+
+class StubDependencyParse(object):
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def triples(self):
+        return self.graph.to_triples()
+
+
+class StubDependencyParser(object):
+    """
+    CoreNLPDependencyParser stand-in, parse(tokens) as used by TripleExtraction_Deps
+    """
+
+    url = STUB_URL
+
+    def __init__(self, latency=0):
+        self.latency = latency
+
+    def parse(self, tokens):
+        if self.latency:
+            time.sleep(self.latency)
+        return iter([StubDependencyParse(dependency_graph(list(tokens)))])
+
+
+class StubParser(object):
+    """
+    CoreNLPParser stand-in, raw_parse(sentence) as used by TripleExtraction
+    """
+
+    url = STUB_URL
+
+    def __init__(self, latency=0):
+        self.latency = latency
+
+    def raw_parse(self, sentence):
+        if self.latency:
+            time.sleep(self.latency)
+        return iter([constituency_tree(TOKEN.findall(sentence))])
+
+
+class StubClient(object):
+    """
+    CoreNLPClient stand-in for the batch and document level methods, the *_many methods
+    cost the latency once per max_workers requests like the concurrent requests of the pool
+    """
+
+    url = STUB_URL
+
+    def __init__(self, latency=0, max_workers=4):
+        self.latency = latency
+        self.max_workers = max_workers
+
+    def __request(self, count=1):
+        if self.latency:
+            time.sleep(self.latency * math.ceil(count / float(self.max_workers)) if count > 1 else self.latency)
+
+    def dependency_graph(self, tokens):
+        self.__request()
+        return dependency_graph(list(tokens))
+
+    def dependency_graphs_many(self, tokenized_sentences):
+        tokenized_sentences = list(tokenized_sentences)
+        self.__request(len(tokenized_sentences))
+        return [dependency_graph(list(tokens)) for tokens in tokenized_sentences]
+
+    def dependency_graphs_document(self, tokenized_sentences, max_chars=None):
+        self.__request()
+        return [dependency_graph(list(tokens)) for tokens in tokenized_sentences]
+
+    def dependencies(self, tokens):
+        self.__request()
+        return dependency_graph(list(tokens)).to_triples()
+
+    def dependencies_many(self, tokenized_sentences):
+        tokenized_sentences = list(tokenized_sentences)
+        self.__request(len(tokenized_sentences))
+        return [dependency_graph(list(tokens)).to_triples() for tokens in tokenized_sentences]
+
+    def dependencies_document(self, tokenized_sentences, max_chars=None):
+        self.__request()
+        return [dependency_graph(list(tokens)).to_triples() for tokens in tokenized_sentences]
+
+    def parse_tree(self, sentence):
+        self.__request()
+        return constituency_tree(TOKEN.findall(sentence))
+
+    def parse_trees(self, sentences):
+        sentences = list(sentences)
+        self.__request(len(sentences))
+        return [constituency_tree(TOKEN.findall(sentence)) for sentence in sentences]
@@ -6,3 +6,6 @@ class Constants(object):
         self.NOUNS = ['NN', 'NNS', 'NNP', 'NNPS']
 
         self.ADECTIVES = ['JJ', 'JJR', 'JJS']
+
+        # relations linking a noun to its preposition, 'case' for CoreNLP/UD and 'prep' for spacy
+        self.preposition_relations = ['case', 'prep']
@@ -1,3 +1,19 @@
-from .hpatterns import HearstPatterns
-from .treegex import TripleExtraction
-from .deps import TripleExtraction_Deps
\ No newline at end of file
+import importlib
+
+# The extractors are imported on first access, so importing the package stays cheap and
+# only the modules (and models) which are actually used get loaded.
+_exports = {
+    'HearstPatterns': '.hpatterns',
+    'TripleExtraction': '.treegex',
+    'TripleExtraction_Deps': '.deps',
+}
+
+__all__ = list(_exports)
+
+
+def __getattr__(name):
+    if name in _exports:
+        value = getattr(importlib.import_module(_exports[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module {} has no attribute {}".format(__name__, name))
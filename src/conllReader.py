@@ -0,0 +1,150 @@
+import io
+import mmap
+import os
+import re
+import struct
+from array import array
+
+from .depGraph import DependencyGraph
+
+# sentences are separated by blank (or whitespace only) lines
+SENTENCE_BREAK = re.compile(rb'\n(?:[ \t\r]*\n)+')
+
+INDEX_MAGIC = b'CONLLIDX'
+INDEX_VERSION = 1
+# magic, version, size and modification time of the indexed file, number of sentences
+INDEX_HEADER = struct.Struct('<8sIqqq')
+
+
+class ConllReader(object):
+    """
+    Random access and streaming over the sentences of a CoNLL-U file.
+
+    The file is memory mapped and a sentence offset index is built in one pass over it.
+    The index is saved next to the file (path + '.idx' unless index_path is given) and
+    reused as long as the file keeps its size and modification time. reader[i] parses
+    sentence i into a TokenList, iterating parses the sentences one at a time, so only
+    the sentence being processed is ever held in memory.
+    """
+
+    def __init__(self, path, index_path=None, rebuild=False):
+        self.path = path
+        self.index_path = index_path or path + '.idx'
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.size = stat.st_size
+            self.mtime = stat.st_mtime_ns
+            # mmap keeps its own handle, the file itself is closed right away
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        self.starts = None
+        self.ends = None
+        if not rebuild:
+            self.__load_index()
+        if self.starts is None:
+            self.__build_index()
+            self.__save_index()
+
+    def __build_index(self):
+        self.starts = array('q')
+        self.ends = array('q')
+        if self.mm is None:
+            return
+        start = 0
+        for m in SENTENCE_BREAK.finditer(self.mm):
+            self.__add_block(start, m.start() + 1)
+            start = m.end()
+        self.__add_block(start, self.size)
+
+    def __add_block(self, start, end):
+        if self.mm[start:end].strip():
+            self.starts.append(start)
+            self.ends.append(end)
+
+    def __load_index(self):
+        try:
+            with open(self.index_path, 'rb') as f:
+                magic, version, size, mtime, count = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+                if (magic, version, size, mtime) != (INDEX_MAGIC, INDEX_VERSION, self.size, self.mtime):
+                    return
+                starts = array('q')
+                ends = array('q')
+                starts.fromfile(f, count)
+                ends.fromfile(f, count)
+        except (OSError, EOFError, struct.error):
+            return
+        self.starts = starts
+        self.ends = ends
+
+    def __save_index(self):
+        try:
+            with open(self.index_path, 'wb') as f:
+                f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, self.size, self.mtime, len(self.starts)))
+                self.starts.tofile(f)
+                self.ends.tofile(f)
+        except OSError:
+            # a read only location only costs rebuilding the index next time
+            pass
+
+    def __len__(self):
+        return len(self.starts)
+
+    def block(self, i):
+        '''
+        returns the raw CoNLL-U text of sentence i
+        '''
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('sentence index out of range')
+        return self.mm[self.starts[i]:self.ends[i]].decode('utf-8')
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[k] for k in range(*i.indices(len(self)))]
+        # only the TokenLists need the conllu parser, the graphs are read from the columns directly
+        from .conllu.conllu import parse_single
+        return parse_single(io.StringIO(self.block(i)))[0]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def graph(self, i):
+        '''
+        returns the dependency parse of sentence i as a DependencyGraph, read from the heads and
+        relations of the file without building a TokenList
+        '''
+        return DependencyGraph.from_conll_text(self.block(i))
+
+    def graphs(self, start=0, stop=None):
+        '''
+        yields the DependencyGraph of every sentence from start up to stop
+        '''
+        stop = len(self) if stop is None else min(stop, len(self))
+        for i in range(start, stop):
+            yield self.graph(i)
+
+    def trees(self):
+        '''
+        yields the token tree of every sentence
+        '''
+        for tokenlist in self:
+            yield tokenlist.to_tree()
+
+    def noun_chunks(self, subject):
+        '''
+        yields the noun chunk tagged sentences (get_noun_chunks) of every sentence
+        '''
+        for tokenlist in self:
+            yield tokenlist.get_noun_chunks(subject)
+
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,253 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from nltk.tree import Tree
+
+from .depGraph import DependencyGraph
+from .metrics import metrics
+
+CORENLP_URL = 'http://localhost:9000'
+
+# upper bound on the characters sent in one document level request
+DOCUMENT_MAX_CHARS = 50000
+
+# the same annotation settings nltk's CoreNLPParser/CoreNLPDependencyParser send
+PARSE_PROPERTIES = {
+    'annotators': 'tokenize,pos,lemma,ssplit,parse',
+    'outputFormat': 'json',
+    'ssplit.eolonly': 'true',
+}
+
+# sentence splitting left to the server, for parsing whole texts
+TEXT_PARSE_PROPERTIES = {
+    'annotators': 'tokenize,pos,lemma,ssplit,parse',
+    'outputFormat': 'json',
+}
+
+DEPENDENCY_PROPERTIES = {
+    'annotators': 'tokenize,pos,lemma,ssplit,depparse',
+    'outputFormat': 'json',
+    'ssplit.eolonly': 'true',
+    'tokenize.whitespace': 'true',
+}
+
+
+class CoreNLPException(Exception):
+    pass
+
+
+def document_chunks(lines, max_chars=DOCUMENT_MAX_CHARS):
+    '''
+    groups consecutive lines into chunks of at most max_chars characters (counting the
+    newlines joining them), a line longer than max_chars gets a chunk of its own.
+    Returns lists of line indices.
+    '''
+    chunks = list()
+    chunk = list()
+    size = 0
+    for i, line in enumerate(lines):
+        length = len(line) + 1
+        if chunk and size + length > max_chars:
+            chunks.append(chunk)
+            chunk = list()
+            size = 0
+        chunk.append(i)
+        size += length
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def sentence_graph(sentence):
+    '''
+    converts a sentence of a CoreNLP json response into a DependencyGraph
+    '''
+    tokens = sentence['tokens']
+    heads = [-1] * len(tokens)
+    relations = ['ROOT'] * len(tokens)
+    for dependency in sentence['basicDependencies']:
+        i = dependency['dependent'] - 1
+        heads[i] = dependency['governor'] - 1
+        relations[i] = dependency['dep']
+    return DependencyGraph([t['word'] for t in tokens], [t['pos'] for t in tokens], heads, relations)
+
+
+def sentence_dependencies(sentence):
+    '''
+    converts a sentence of a CoreNLP json response into the dependency triples nltk's
+    DependencyGraph.triples() returns, (('word', POS), relation, ('word', POS))
+    '''
+    return sentence_graph(sentence).to_triples()
+
+
+class CoreNLPClient(object):
+    """
+    Pooled client for a CoreNLP server.
+
+    All requests go through one requests.Session whose keep-alive connection pool holds
+    max_workers connections. The *_many methods run up to max_workers requests at once
+    on a thread pool and return the results in input order. Failed requests (connection
+    errors, timeouts, 5xx responses) are retried up to retries times, waiting backoff,
+    2*backoff, 4*backoff, ... seconds in between.
+    """
+
+    def __init__(self, url=CORENLP_URL, max_workers=4, retries=3, backoff=0.5, timeout=60):
+        self.url = url
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def __executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            return self.executor
+
+    def annotate(self, text, properties, url=None):
+        '''
+        posts text to the server and returns the json response
+        '''
+        params = {'properties': json.dumps(properties)}
+        attempt = 0
+        while True:
+            try:
+                with metrics.stage('corenlp.request'):
+                    r = self.session.post(url or self.url, params=params, data=text.encode('utf-8'), timeout=self.timeout)
+                if r.status_code < 500:
+                    r.raise_for_status()
+                    return r.json()
+                error = CoreNLPException('CoreNLP server returned {}: {}'.format(r.status_code, r.text))
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            if attempt >= self.retries:
+                raise error
+            metrics.error('corenlp.retry', error)
+            time.sleep(self.backoff * (2 ** attempt))
+            attempt += 1
+
+    def map(self, function, items):
+        '''
+        applies function to every item on the thread pool, results are in input order
+        '''
+        items = list(items)
+        if len(items) <= 1:
+            return [function(item) for item in items]
+        return list(self.__executor().map(function, items))
+
+    def annotate_many(self, texts, properties):
+        return self.map(lambda text: self.annotate(text, properties), texts)
+
+    def parse_tree(self, sentence):
+        '''
+        returns the constituency tree of the sentence as an nltk Tree
+        '''
+        response = self.annotate(sentence, PARSE_PROPERTIES)
+        return Tree.fromstring(response['sentences'][0]['parse'])
+
+    def parse_trees(self, sentences):
+        return self.map(self.parse_tree, sentences)
+
+    def parse_text(self, text):
+        '''
+        returns the constituency trees of all the sentences of a text
+        '''
+        response = self.annotate(text, TEXT_PARSE_PROPERTIES)
+        return [Tree.fromstring(sentence['parse']) for sentence in response['sentences']]
+
+    def parse_texts(self, texts):
+        return self.map(self.parse_text, texts)
+
+    def dependency_graph(self, tokens):
+        '''
+        returns the dependency parse of a tokenized sentence as a DependencyGraph
+        '''
+        if not ' '.join(tokens).strip():
+            return DependencyGraph([], [], [], [])
+        response = self.annotate(' '.join(tokens), DEPENDENCY_PROPERTIES)
+        return sentence_graph(response['sentences'][0])
+
+    def dependency_graphs_many(self, tokenized_sentences):
+        return self.map(self.dependency_graph, tokenized_sentences)
+
+    def dependencies(self, tokens):
+        '''
+        returns the dependency triples of a tokenized sentence
+        '''
+        return self.dependency_graph(tokens).to_triples()
+
+    def dependencies_many(self, tokenized_sentences):
+        return self.map(self.dependencies, tokenized_sentences)
+
+    def dependencies_document(self, tokenized_sentences, max_chars=DOCUMENT_MAX_CHARS):
+        '''
+        dependency_graphs_document, as dependency triples
+        '''
+        return [graph.to_triples() for graph in self.dependency_graphs_document(tokenized_sentences, max_chars)]
+
+    def dependency_graphs_document(self, tokenized_sentences, max_chars=DOCUMENT_MAX_CHARS):
+        '''
+        dependency graphs for many tokenized sentences using as few requests as possible.
+        The sentences are sent one per line in chunks of at most max_chars characters, the
+        server splits on the newlines only, so every sentence is parsed exactly as a single
+        sentence request would parse it. Returns the graph of every sentence, in order.
+
+        Empty sentences are not sent, the server would drop their lines, they get empty graphs. Should
+        the server still return another number of sentences for a chunk, the sentences of that
+        chunk are parsed with one request each.
+        '''
+        tokenized_sentences = list(tokenized_sentences)
+        lines = [' '.join(tokens) for tokens in tokenized_sentences]
+        sent = [i for i, line in enumerate(lines) if line.strip()]
+        chunks = document_chunks([lines[i] for i in sent], max_chars)
+
+        def parse_chunk(chunk):
+            response = self.annotate('\n'.join(lines[sent[i]] for i in chunk), DEPENDENCY_PROPERTIES)
+            sentences = response['sentences']
+            if len(sentences) != len(chunk):
+                metrics.error('corenlp.document_split', CoreNLPException('Expected {} sentences from CoreNLP, got {}'.format(len(chunk), len(sentences))))
+                # sequentially, this already runs on the thread pool
+                return [self.dependency_graph(tokenized_sentences[sent[i]]) for i in chunk]
+            return [sentence_graph(sentence) for sentence in sentences]
+
+        graphs = [None] * len(lines)
+        for chunk, parsed in zip(chunks, self.map(parse_chunk, chunks)):
+            for i, graph in zip(chunk, parsed):
+                graphs[sent[i]] = graph
+        for i, graph in enumerate(graphs):
+            if graph is None:
+                graphs[i] = DependencyGraph([], [], [], [])
+        return graphs
+
+    def close(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+        self.session.close()
+
+
+_clients = dict()
+_clients_lock = threading.Lock()
+
+
+def get_client(url=CORENLP_URL, **kwargs):
+    '''
+    returns the shared client for a server url, creating it with kwargs on first use
+    '''
+    with _clients_lock:
+        client = _clients.get(url)
+        if client is None:
+            client = CoreNLPClient(url, **kwargs)
+            _clients[url] = client
+        return client
@@ -0,0 +1,141 @@
+import argparse
+import json
+import multiprocessing
+import os
+
+from .models import registry
+from .tripleStore import DEFAULT_LEMMATIZER, TripleAggregator, TripleStore
+
+# Corpus level driver for AdvancedTripleExtractionDeps. Documents are read from a directory
+# of .txt files or a JSONL file ({"id": ..., "text": ...} per line), fanned out over a process
+# pool and the triples are streamed to a JSONL file, one record per document. Every worker
+# loads the spacy/neuralcoref pipeline once. The ids of successfully extracted documents go to
+# a checkpoint file, so an interrupted run picks up where it stopped and retries the failures.
+
+_worker_options = dict()
+
+
+def read_documents(path):
+    '''
+    yields (document id, text) for a directory of .txt files or a JSONL file
+    '''
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith('.txt'):
+                    filepath = os.path.join(root, name)
+                    with open(filepath, 'r', encoding='utf-8') as f:
+                        yield os.path.relpath(filepath, path), f.read()
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f):
+                if not line.strip():
+                    continue
+                document = json.loads(line)
+                yield str(document.get('id', line_number)), document['text']
+
+
+def read_checkpoint(checkpoint):
+    done = set()
+    if checkpoint and os.path.exists(checkpoint):
+        with open(checkpoint, 'r', encoding='utf-8') as f:
+            done.update(line.rstrip('\n') for line in f if line.strip())
+    return done
+
+
+def _init_worker(options):
+    _worker_options.update(options)
+    # load the pipeline once per worker, every document of the worker reuses it
+    registry.preload(['en_coref'])
+
+
+def extract_document(document):
+    '''
+    runs AdvancedTripleExtractionDeps on one (id, text) document, errors are returned in the
+    record instead of raised so that one bad document does not stop the run
+    '''
+    from .depsAdv import AdvancedTripleExtractionDeps
+    doc_id, text = document
+    try:
+        extractor = AdvancedTripleExtractionDeps(text, document_parse=_worker_options.get('document_parse', False))
+        return {'id': doc_id, 'triples': extractor.get_triples()}
+    except Exception as e:
+        return {'id': doc_id, 'error': '{}: {}'.format(type(e).__name__, e)}
+
+
+def run_corpus(path, output, processes=None, checkpoint=None, chunksize=1, document_parse=False, store=None, flush_every=100000, lemmatizer=None):
+    '''
+    extracts the triples of every document under path into the JSONL file output.
+
+    processes is the size of the process pool (the cpu count by default), checkpoint the file
+    recording finished document ids (output + '.done' by default). Documents already in the
+    checkpoint are skipped, so rerunning after an interruption resumes the run. Failed documents
+    are not checkpointed, a rerun retries them and appends their new record to output.
+    store is the path of a TripleStore the triples are also aggregated into, with the document
+    ids as their sources, merged every flush_every triples. lemmatizer is the name of the lemmatizer
+    the store terms go through (see tripleStore.LEMMATIZERS), None to keep the words as they are.
+    Returns the counts of processed, failed and skipped documents.
+    '''
+    checkpoint = checkpoint or output + '.done'
+    triple_store = TripleStore(store) if store else None
+    aggregator = TripleAggregator(lemmatizer=lemmatizer) if store else None
+    done = read_checkpoint(checkpoint)
+    counts = {'processed': 0, 'failed': 0, 'skipped': 0}
+
+    def pending():
+        for document in read_documents(path):
+            if document[0] in done:
+                counts['skipped'] += 1
+                continue
+            yield document
+
+    options = {'document_parse': document_parse}
+    pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=(options,))
+    try:
+        with open(output, 'a', encoding='utf-8') as out, open(checkpoint, 'a', encoding='utf-8') as finished:
+            for record in pool.imap_unordered(extract_document, pending(), chunksize):
+                out.write(json.dumps(record, default=str) + '\n')
+                out.flush()
+                if triple_store is not None:
+                    aggregator.add_many(record.get('triples') or [], record['id'])
+                    if aggregator.seen >= flush_every:
+                        aggregator.flush(triple_store)
+                if 'error' in record:
+                    counts['failed'] += 1
+                    continue
+                finished.write(record['id'] + '\n')
+                finished.flush()
+                counts['processed'] += 1
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+        if triple_store is not None:
+            # merges the triples aggregated since the last flush. A hard kill skips this while their
+            # documents are already checkpointed; merges do not count a (triple, document) twice, so
+            # python -m src.tripleStore build OUTPUT STORE recovers them
+            aggregator.flush(triple_store)
+            triple_store.close()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Extract triples from a corpus with AdvancedTripleExtractionDeps')
+    parser.add_argument('input', help='directory of .txt files or a JSONL file with id and text fields')
+    parser.add_argument('output', help='JSONL file the triples are appended to')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes, defaults to the cpu count')
+    parser.add_argument('--checkpoint', default=None, help='file of finished document ids, defaults to OUTPUT.done')
+    parser.add_argument('--chunksize', type=int, default=1, help='documents handed to a worker at a time')
+    parser.add_argument('--document-parse', action='store_true', help='parse each document with document level CoreNLP requests')
+    parser.add_argument('--store', default=None, help='SQLite TripleStore the deduplicated triples are aggregated into')
+    parser.add_argument('--lemmatize', action='store_true', help='lemmatize the store terms with the {} lemmatizer'.format(DEFAULT_LEMMATIZER))
+    args = parser.parse_args(argv)
+    lemmatizer = DEFAULT_LEMMATIZER if args.lemmatize else None
+    counts = run_corpus(args.input, args.output, args.processes, args.checkpoint, args.chunksize, args.document_parse, args.store,
+                        lemmatizer=lemmatizer)
+    print(json.dumps(counts))
+
+
+if __name__ == "__main__":
+    main()
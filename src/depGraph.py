@@ -0,0 +1,268 @@
+import sys
+from array import array
+from collections import deque
+
+
+class Vocab(object):
+    """
+    Interns strings to small integer ids.
+    """
+
+    def __init__(self):
+        self.ids = dict()
+        self.strings = list()
+
+    def intern(self, string):
+        i = self.ids.get(string)
+        if i is None:
+            i = self.ids.setdefault(string, len(self.strings))
+            if i == len(self.strings):
+                self.strings.append(string)
+        return i
+
+    def string(self, i):
+        return self.strings[i]
+
+    def __len__(self):
+        return len(self.strings)
+
+
+# relation and POS ids are shared by all graphs
+RELATIONS = Vocab()
+TAGS = Vocab()
+
+ROOT = -1
+
+
+class DependencyGraph(object):
+    """
+    Array backed dependency parse of one sentence.
+
+    Nodes are token indices 0..n-1, so repeated words stay distinct. heads, tags and
+    relations are parallel integer arrays, heads[i] is the token index of the governor
+    of token i (ROOT for the root), tags and relations hold ids interned in TAGS and
+    RELATIONS. Children are looked up through a CSR index which is built on first use.
+
+    The adapters from_triples/to_triples convert from and to the
+        (('word', POS), relation, ('word', POS))
+    tuple lists used by TripleExtraction_Deps.short_relations.
+    """
+
+    __slots__ = ('words', 'tags', 'heads', 'relations', '_child_offsets', '_children')
+
+    def __init__(self, words, tags, heads, relations):
+        self.words = [sys.intern(w) for w in words]
+        self.tags = array('i', (TAGS.intern(t) for t in tags))
+        self.heads = array('i', heads)
+        self.relations = array('i', (RELATIONS.intern(r) for r in relations))
+        self._child_offsets = None
+        self._children = None
+
+    def __len__(self):
+        return len(self.words)
+
+    def __getstate__(self):
+        # the ids are only valid in the process which interned them, pickles hold the strings
+        return (self.words, [TAGS.string(t) for t in self.tags], self.heads.tolist(),
+                [RELATIONS.string(r) for r in self.relations])
+
+    def __setstate__(self, state):
+        words, tags, heads, relations = state
+        DependencyGraph.__init__(self, words, tags, heads, relations)
+
+    @classmethod
+    def from_spacy(cls, doc):
+        '''
+        builds the graph of a spacy Doc or Span
+        '''
+        tokens = list(doc)
+        offset = tokens[0].i if tokens else 0
+        heads = [ROOT if token.head.i == token.i else token.head.i - offset for token in tokens]
+        return cls([t.text for t in tokens], [t.tag_ for t in tokens], heads, [t.dep_ for t in tokens])
+
+    @classmethod
+    def from_conll(cls, tokenlist):
+        '''
+        builds the graph of a conllu TokenList, multiword token ranges and empty nodes are skipped
+        '''
+        tokens = [token for token in tokenlist if isinstance(token['id'], int)]
+        words = [token['form'] for token in tokens]
+        tags = [conll_tag(token) for token in tokens]
+        heads = [(token['head'] or 0) - 1 for token in tokens]
+        relations = [token['deprel'] for token in tokens]
+        return cls(words, tags, heads, relations)
+
+    @classmethod
+    def from_conll_text(cls, text):
+        '''
+        builds the graph of the CoNLL-U lines of one sentence straight from the FORM, XPOS/UPOS,
+        HEAD and DEPREL columns, the same graph from_conll builds from the parsed TokenList
+        '''
+        words = list()
+        tags = list()
+        heads = list()
+        relations = list()
+        for line in text.split('\n'):
+            if not line.strip() or line[0] == '#':
+                continue
+            fields = line.rstrip('\r').split('\t')
+            # multiword token ranges (1-2) and empty nodes (1.1) have no plain integer id
+            if not fields[0].isdigit():
+                continue
+            words.append(fields[1])
+            tags.append(fields[4] if fields[4] not in ('', '_') else fields[3] or '_')
+            heads.append(int(fields[6]) - 1 if fields[6].isdigit() else ROOT)
+            relations.append(fields[7])
+        return cls(words, tags, heads, relations)
+
+    @classmethod
+    def from_corenlp(cls, parse):
+        '''
+        builds the graph of an nltk DependencyGraph, as returned by CoreNLPDependencyParser.parse
+        '''
+        addresses = sorted(address for address in parse.nodes if address)
+        nodes = [parse.nodes[address] for address in addresses]
+        heads = [(node['head'] or 0) - 1 for node in nodes]
+        return cls([n['word'] for n in nodes], [n['tag'] for n in nodes], heads, [n['rel'] for n in nodes])
+
+    @classmethod
+    def from_triples(cls, dependencies):
+        '''
+        builds the graph of a tuple dependency list. Nodes of that format are (word, POS)
+        pairs, so repeated words are merged into one node as before
+        '''
+        nodes = dict()
+        words = list()
+        tags = list()
+        heads = list()
+        relations = list()
+        for governor, relation, dependent in dependencies:
+            for node in (governor, dependent):
+                if node not in nodes:
+                    nodes[node] = len(words)
+                    words.append(node[0])
+                    tags.append(node[1])
+                    heads.append(ROOT)
+                    relations.append('ROOT')
+            if governor == dependent:
+                continue
+            heads[nodes[dependent]] = nodes[governor]
+            relations[nodes[dependent]] = relation
+        return cls(words, tags, heads, relations)
+
+    def node(self, i):
+        return (self.words[i], TAGS.string(self.tags[i]))
+
+    def tag(self, i):
+        return TAGS.string(self.tags[i])
+
+    def relation(self, i):
+        return RELATIONS.string(self.relations[i])
+
+    def roots(self):
+        return [i for i in range(len(self.heads)) if self.heads[i] == ROOT]
+
+    def __build_children(self):
+        n = len(self.heads)
+        counts = array('i', bytes(4 * (n + 1)))
+        for head in self.heads:
+            if head != ROOT:
+                counts[head + 1] += 1
+        for i in range(n):
+            counts[i + 1] += counts[i]
+        children = array('i', bytes(4 * counts[n]))
+        fill = array('i', counts)
+        for i, head in enumerate(self.heads):
+            if head != ROOT:
+                children[fill[head]] = i
+                fill[head] += 1
+        self._child_offsets = counts
+        self._children = children
+
+    def children(self, i):
+        '''
+        returns the token indices governed by token i, in sentence order
+        '''
+        if self._children is None:
+            self.__build_children()
+        return self._children[self._child_offsets[i]:self._child_offsets[i + 1]]
+
+    def edges(self):
+        '''
+        yields (head, relation id, dependent) index triples, the root edges excluded
+        '''
+        for i, head in enumerate(self.heads):
+            if head != ROOT:
+                yield head, self.relations[i], i
+
+    def tree_edges(self, root=None):
+        '''
+        yields (head, relation id, dependent) index triples in the order of to_triples(), depth
+        first from the roots (only from root if given) with the children in sentence order, the
+        root edges excluded
+        '''
+        for root in (self.roots() if root is None else [root]):
+            stack = [iter(self.children(root))]
+            parents = [root]
+            while stack:
+                child = next(stack[-1], None)
+                if child is None:
+                    stack.pop()
+                    parents.pop()
+                    continue
+                yield parents[-1], self.relations[child], child
+                stack.append(iter(self.children(child)))
+                parents.append(child)
+
+    def bfs(self, start, max_level, expand=None):
+        '''
+        yields (head, dependent, level) for every edge reachable from start within max_level hops.
+        With expand (a predicate on token indices) the walk only continues below the dependents
+        it accepts, the others are yielded but not descended into
+        '''
+        queue = deque([(start, 0)])
+        while queue:
+            node, level = queue.popleft()
+            if level >= max_level:
+                continue
+            for child in self.children(node):
+                yield node, child, level + 1
+                if expand is None or expand(child):
+                    queue.append((child, level + 1))
+
+    def to_triples(self, order='tree', include_root=False):
+        '''
+        returns the tuple dependency list. order='tree' walks the tree depth first from the root
+        with the children in sentence order, like nltk's DependencyGraph.triples, order='tokens'
+        lists the edges in token order like the spacy get_dependencies. include_root adds the
+        self loop root edge spacy reports.
+        '''
+        if order == 'tokens':
+            triples = list()
+            for i, head in enumerate(self.heads):
+                if head == ROOT:
+                    if include_root:
+                        triples.append((self.node(i), self.relation(i), self.node(i)))
+                else:
+                    triples.append((self.node(head), self.relation(i), self.node(i)))
+            return triples
+
+        if not include_root:
+            return [(self.node(head), RELATIONS.string(relation), self.node(child)) for head, relation, child in self.tree_edges()]
+        triples = list()
+        for root in self.roots():
+            triples.append((self.node(root), self.relation(root), self.node(root)))
+            for head, relation, child in self.tree_edges(root):
+                triples.append((self.node(head), RELATIONS.string(relation), self.node(child)))
+        return triples
+
+
+def conll_tag(token):
+    '''
+    returns the PTB tag of a conllu token, falling back to the universal tag
+    '''
+    for key in ('xpostag', 'xpos', 'upostag', 'upos'):
+        tag = token.get(key)
+        if tag and tag != '_':
+            return tag
+    return '_'
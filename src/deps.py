@@ -2,64 +2,146 @@ import sys
 sys.path.append("../../..")
 sys.path.append("..")
 
-from .conllu.conllu import parse_single, TokenList
+from .conllReader import ConllReader
 
 from nltk.parse.corenlp import CoreNLPDependencyParser
 from nltk.parse import CoreNLPParser
 from nltk.tree import ParentedTree, Tree
-from nltk.tokenize import word_tokenize
+from nltk.tokenize import word_tokenize, sent_tokenize
 from .Constants import Constants
+from .parseCache import default_cache, parser_identity
+from .depGraph import DependencyGraph, TAGS, RELATIONS
+from .corenlpClient import get_client, DOCUMENT_MAX_CHARS
+from .metrics import metrics
+from collections import defaultdict, deque
 import json
+import logging
+import multiprocessing
+
+logger = logging.getLogger(__name__)
 
 
 parser = CoreNLPParser(url='http://localhost:9000')
 dep_parser = CoreNLPDependencyParser(url='http://localhost:9000')
 
+# the extractor of a conll_short_relations pool worker, with the CoNLL-U file opened once per worker
+_conll_extractor = None
+
+
+def index_dependencies(dependencies):
+    '''
+    indexes a dependency list by governor, returns a dict governor -> [dependencies], with the
+    dependencies of each governor in their original order
+    '''
+    index = defaultdict(list)
+    for dep in dependencies:
+        index[dep[0]].append(dep)
+    return index
+
 class TripleExtraction_Deps(object):
 
-    def __init__(self, filepath_to_conll=None, deps_level=None):
+    def __init__(self, filepath_to_conll=None, deps_level=None, parse_cache=None, client=None):
+        '''
+        parse_cache is the ParseCache used for the dependency parses, the shared default_cache if not given.
+        client is the CoreNLPClient used for the dependency parses, the shared client of the dep_parser url if not given
+        '''
         self.deps_level = deps_level
+        self.parse_cache = parse_cache if parse_cache is not None else default_cache
+        self.client = client if client is not None else get_client(dep_parser.url)
         self.filepath_to_conll = None
         self.tokenlist = None
         self.tokenTree = None
         if filepath_to_conll:
             self.filepath_to_conll = filepath_to_conll
-            data_file = open(filepath_to_conll, "r", encoding="utf-8")
-            self.tokenlist = parse_single(data_file)
-            self.tokenTree = tokenlist[0].to_tree()
+            self.tokenlist = ConllReader(filepath_to_conll)
+            self.tokenTree = self.tokenlist[0].to_tree() if len(self.tokenlist) else None
 
         self.Constants = Constants()
 
+    def token_trees(self):
+        '''
+        yields the token tree of every sentence of the CoNLL-U file, tokenTree is the first one
+        '''
+        if self.tokenlist is None:
+            return
+        for tree in self.tokenlist.trees():
+            yield tree
+
     def dependency_triplets(self, sentence):
-        word_tokenized_sent = word_tokenize(sentence)
-        parses = dep_parser.parse(word_tokenized_sent)
-        dependencies = [[(governor, dep, dependent) for governor, dep, dependent in parse.triples()] for parse in parses][0]
-        return dependencies
+        # parsed and keyed like dependency_triplets_many, so the two share their cached parses
+        return self.parse_cache.get_or_parse(sentence, parser_identity(self.client, 'dependency'), self.parse_dependencies)
+
+    def parse_dependencies(self, sentence):
+        return self.client.dependencies(word_tokenize(sentence))
+
+    def dependency_triplets_many(self, sentences):
+        '''
+        dependency_triplets for a list of sentences, the uncached ones are sent to the server
+        concurrently through the pooled client
+        '''
+        return self.parse_cache.get_or_parse_many(list(sentences), parser_identity(self.client, 'dependency'), self.parse_dependencies_many)
+
+    def parse_dependencies_many(self, sentences):
+        return self.client.dependencies_many([word_tokenize(sentence) for sentence in sentences])
+
+    def document_dependency_triplets(self, text, max_chars=DOCUMENT_MAX_CHARS):
+        '''
+        dependency_triplets for a whole document, text is a string (split with sent_tokenize) or
+        a list of sentences. The uncached sentences are parsed with document level requests of
+        at most max_chars characters each. Returns a list of (sentence, dependencies)
+        '''
+        sentences = sent_tokenize(text) if isinstance(text, str) else list(text)
+        parse_document = lambda missing: self.client.dependencies_document([word_tokenize(sentence) for sentence in missing], max_chars)
+        dependencies = self.parse_cache.get_or_parse_many(sentences, parser_identity(self.client, 'dependency'), parse_document)
+        return list(zip(sentences, dependencies))
+
+    def dependency_graph(self, sentence):
+        '''
+        returns the CoreNLP dependency parse of the sentence as a DependencyGraph
+        '''
+        return self.parse_cache.get_or_parse(sentence, parser_identity(self.client, 'dependency_graph'), self.parse_dependency_graph)
+
+    def parse_dependency_graph(self, sentence):
+        return self.client.dependency_graph(word_tokenize(sentence))
+
+    def dependency_graphs_many(self, sentences):
+        '''
+        dependency_graph for a list of sentences, the uncached ones are sent to the server
+        concurrently through the pooled client
+        '''
+        parse_many = lambda missing: self.client.dependency_graphs_many([word_tokenize(sentence) for sentence in missing])
+        return self.parse_cache.get_or_parse_many(list(sentences), parser_identity(self.client, 'dependency_graph'), parse_many)
+
+    def document_dependency_graphs(self, text, max_chars=DOCUMENT_MAX_CHARS):
+        '''
+        document_dependency_triplets with the parses as DependencyGraphs, returns a list of
+        (sentence, graph)
+        '''
+        sentences = sent_tokenize(text) if isinstance(text, str) else list(text)
+        parse_document = lambda missing: self.client.dependency_graphs_document([word_tokenize(sentence) for sentence in missing], max_chars)
+        graphs = self.parse_cache.get_or_parse_many(sentences, parser_identity(self.client, 'dependency_graph'), parse_document)
+        return list(zip(sentences, graphs))
 
-    def bfs_triplets(self, start_dep, level, dependencies):
+    def bfs_triplets(self, start_dep, level, dependencies, index=None):
         '''
         finds all noun-dependencies from a start_dep
 
-        returns connected dependencies (which are not nouns), connected noun dependencies, within the level limit
-        '''
-        node_1 = start_dep[0]
-        node_2 = start_dep[2]
-        count = 0
-        queue = [node_2]
-        queue_level = [0]
-        connected_dependencies = list()
-        connected_noun_dependencies = list()
-        while queue != []:
-            node = queue[0]
-            queue = queue[:-1]
-            level_current = queue_level[0]
-            queue_level = queue_level[:-1]
-            for dep in dependencies:
-                dep_node_1 = dep[0]
-                if dep_node_1 == node and level_current < level:
+        returns connected dependencies (which are not nouns), connected noun dependencies, within the level limit.
+        index is the governor index of dependencies (see index_dependencies), built here if not given
+        '''
+        with metrics.stage('deps.bfs'):
+            if index is None:
+                index = index_dependencies(dependencies)
+            queue = deque([(start_dep[2], 0)])
+            connected_dependencies = list()
+            connected_noun_dependencies = list()
+            while queue:
+                node, level_current = queue.popleft()
+                if level_current >= level:
+                    continue
+                for dep in index.get(node, ()):
                     if dep[2][1] not in self.Constants.NOUNS:
-                        queue.append(dep[2])
-                        queue_level.append(level_current+1)
+                        queue.append((dep[2], level_current+1))
                         connected_dependencies.append(dep)
                     else:
                         connected_noun_dependencies.append(dep)
@@ -75,50 +157,136 @@ class TripleExtraction_Deps(object):
             direct relations, these are immediate but not with the nsubj relation
             short relations which are the short relations between nouns and connections
             hypernyms - direct relations which have the relation of nsubj
+
+        dependencies is a DependencyGraph or a tuple dependency list. The walk runs on the token
+        indices of the graph, so repeated words stay distinct nodes, and the results are turned
+        into dependency tuples at the end. A tuple list is made into a graph first, its repeated
+        (word, POS) nodes are merged as before
         '''
+        if isinstance(dependencies, DependencyGraph):
+            graph = dependencies
+            edges = graph.tree_edges()
+        else:
+            graph, edges = triples_graph(dependencies)
+        nouns = set(TAGS.intern(tag) for tag in self.Constants.NOUNS)
+        is_noun = [tag in nouns for tag in graph.tags]
+        expand = lambda i: not is_noun[i]
+        nsubj = RELATIONS.intern('nsubj')
+        triple = lambda head, relation, dependent: (graph.node(head), RELATIONS.string(relation), graph.node(dependent))
         hypernyms = list()
         direct_relations = list()
         short_relations = [] #a list of double tuples, first one with the start dep and the second one as the short relations
-        for connection in dependencies:
-            node_1 = connection[0]
-            node_2 = connection[2]
-            if node_1[1] in self.Constants.NOUNS and node_2[1] in self.Constants.NOUNS:
-                if connection[1] == 'nsubj':
-                    hypernyms.append(connection)
-                else:
-                    direct_relations.append(connection)
-            elif node_1[1] in self.Constants.NOUNS:
-                r = self.bfs_triplets(connection, width, dependencies)[1] #checks for noun dependencies which are indirect 
-                if len(r) >=1 :
-                    short_relations.append([node_1, r])
-        prepositions = list()
-        for r in short_relations:
-            n2 = r[1][-1][-1]
-            prepositions_list = self.get_prepositions(n2, dependencies)
-            prepositions.append(prepositions_list)
+        noun_edges = list()
+        with metrics.stage('deps.bfs'):
+            for head, relation, dependent in edges:
+                if is_noun[head] and is_noun[dependent]:
+                    if relation == nsubj:
+                        hypernyms.append(triple(head, relation, dependent))
+                    else:
+                        direct_relations.append(triple(head, relation, dependent))
+                elif is_noun[head]:
+                    #checks for noun dependencies which are indirect
+                    r = [(parent, child) for parent, child, level in graph.bfs(dependent, width, expand) if is_noun[child]]
+                    if r:
+                        noun_edges.append(r)
+                        short_relations.append([graph.node(head), [triple(parent, graph.relations[child], child) for parent, child in r]])
+            prepositions = list()
+            preposition_relations = set(RELATIONS.intern(relation) for relation in self.Constants.preposition_relations)
+            for r in noun_edges:
+                n2 = r[-1][1]
+                prepositions.append([triple(n2, graph.relations[child], child) for child in graph.children(n2) if graph.relations[child] in preposition_relations])
         return direct_relations, short_relations, hypernyms, prepositions
 
-    def get_prepositions(self, start_node, dependencies):
-        count = 0
-        queue = [start_node]
-        queue_level = [0]
+    def conll_dependency_triplets(self, i=0):
+        '''
+        dependency_triplets of sentence i of the CoNLL-U file, built from the heads and relations
+        of the file (e.g. the SyntaxNet output) instead of a CoreNLP parse
+        '''
+        if self.tokenlist is None:
+            raise Exception("No CoNLL-U file given, pass filepath_to_conll")
+        return self.tokenlist.graph(i).to_triples()
+
+    def iter_conll_dependencies(self, start=0, stop=None):
+        '''
+        yields (sentence index, dependencies) for the sentences of the CoNLL-U file from start up to stop
+        '''
+        if self.tokenlist is None:
+            raise Exception("No CoNLL-U file given, pass filepath_to_conll")
+        for i, graph in enumerate(self.tokenlist.graphs(start, stop), start):
+            yield i, graph.to_triples()
+
+    def conll_short_relations(self, width=None, processes=1, chunksize=256):
+        '''
+        short_relations over every sentence of the CoNLL-U file, no server involved. Yields
+        (sentence index, short_relations result) in file order.
+
+        width defaults to deps_level (2 if that is not set either). With processes > 1 the
+        sentences are handed out in chunks of chunksize to a process pool, every worker maps
+        the file itself, so only sentence indices and results cross process boundaries.
+        '''
+        if self.tokenlist is None:
+            raise Exception("No CoNLL-U file given, pass filepath_to_conll")
+        width = width or self.deps_level or 2
+        if processes is None or processes > 1:
+            chunks = [(start, min(start + chunksize, len(self.tokenlist)), width) for start in range(0, len(self.tokenlist), chunksize)]
+            with multiprocessing.Pool(processes, initializer=_init_conll_worker, initargs=(self.filepath_to_conll,)) as pool:
+                for results in pool.imap(_conll_short_relations, chunks):
+                    for result in results:
+                        yield result
+            return
+        for i, graph in enumerate(self.tokenlist.graphs()):
+            yield i, self.short_relations(graph, width)
+
+    def store_short_relations(self, store, width):
+        '''
+        short_relations over the dependency parses of a ParseStore, no parsing involved.
+        Yields (sentence text, short_relations result) per sentence
+        '''
+        for sentence in store:
+            yield sentence.text, self.short_relations(sentence.graph(), width)
+
+    def get_prepositions(self, start_node, dependencies, index=None):
+        '''
+        returns the preposition dependencies governed by start_node
+        '''
+        if index is None:
+            index = index_dependencies(dependencies)
+        queue = deque([(start_node, 0)])
         preposition_dependencies = list()
-        while queue != []:
-            node = queue[0]
-            queue = queue[:-1]
-            level_current = queue_level[0]
-            queue_level = queue_level[:-1]
-            for dep in dependencies:
-                dep_node_1 = dep[0]
-                if dep_node_1 == node and level_current < 1:
-                    if dep[1] in self.Constants.preposition_relations:
-                        queue.append(dep[2])
-                        queue_level.append(level_current+1)
-                        preposition_dependencies.append(dep)
-        print(preposition_dependencies)
+        while queue:
+            node, level_current = queue.popleft()
+            if level_current >= 1:
+                continue
+            for dep in index.get(node, ()):
+                if dep[1] in self.Constants.preposition_relations:
+                    queue.append((dep[2], level_current+1))
+                    preposition_dependencies.append(dep)
+        logger.debug('prepositions of %s: %s', start_node, preposition_dependencies)
         return preposition_dependencies        
 
 
+def triples_graph(dependencies):
+    '''
+    returns the DependencyGraph of a tuple dependency list with its edges as (head, relation id,
+    dependent) index triples, in the order of the list
+    '''
+    graph = DependencyGraph.from_triples(dependencies)
+    nodes = dict((graph.node(i), i) for i in range(len(graph)))
+    edges = [(nodes[governor], RELATIONS.intern(relation), nodes[dependent]) for governor, relation, dependent in dependencies]
+    return graph, edges
+
+
+def _init_conll_worker(filepath_to_conll):
+    global _conll_extractor
+    _conll_extractor = TripleExtraction_Deps(filepath_to_conll=filepath_to_conll)
+
+
+def _conll_short_relations(chunk):
+    start, stop, width = chunk
+    graphs = _conll_extractor.tokenlist.graphs(start, stop)
+    return [(i, _conll_extractor.short_relations(graph, width)) for i, graph in enumerate(graphs, start)]
+
+
 class TripleExtraction_Deps_SS(TripleExtraction_Deps):
     def __init__(self, filepath_to_conll=None, deps_level=None):
         super().__init__(filepath_to_conll=None, deps_level=None)
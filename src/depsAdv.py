@@ -1,73 +1,157 @@
 from .deps import TripleExtraction_Deps
+from .corenlpClient import DOCUMENT_MAX_CHARS
+from .depGraph import DependencyGraph
+from .entityIndex import EntityIndex, resolve_entities
 from .Utils import hearst_get_triplet, hypernym_clean, directRelation_clean, short_relations_clean, annotate_triple
-import spacy
-import neuralcoref
-from nltk.tokenize import sent_tokenize
+from .models import get_model
+from .metrics import metrics
 
-nlp = spacy.load('en')
-neuralcoref.add_to_pipe(nlp)
 
 class AdvancedTripleExtractionDeps(TripleExtraction_Deps):
-    def __init__(self, text, filepath_to_conll=None, deps_level=None):
+    def __init__(self, text, filepath_to_conll=None, deps_level=None, document_parse=False, max_chars=DOCUMENT_MAX_CHARS, spacy_dependencies=False, doc=None):
+        '''
+        doc is the parse of text by the coref pipeline when it was already made (e.g. by nlp.pipe),
+        text is parsed here if not given.
+        document_parse parses all the sentences of the text with a few document level CoreNLP requests
+        of at most max_chars characters, instead of one request per sentence.
+        spacy_dependencies takes the dependencies from the spacy parse and skips CoreNLP altogether.
+        '''
         super().__init__(filepath_to_conll=None, deps_level=None)
+        self.document_parse = document_parse
+        self.max_chars = max_chars
+        self.spacy_dependencies = spacy_dependencies
         self.text = text
-        doc = nlp(self.text)
+        if doc is None:
+            with metrics.stage('spacy.coref'):
+                doc = self.nlp(self.text)
         self.coref_fixed_text = doc._.coref_resolved
+        # the coref resolved text is parsed once, sentences, entities and spacy dependencies all
+        # come from this doc. When coref changed nothing the first parse is reused as is.
+        if self.coref_fixed_text == self.text:
+            self.doc = doc
+        else:
+            with metrics.stage('spacy.parse'):
+                self.doc = self.nlp(self.coref_fixed_text, disable=['neuralcoref'])
+
+    @property
+    def nlp(self):
+        '''
+        the shared spacy pipeline with neuralcoref, loaded on first use
+        '''
+        return get_model('en_coref')
 
     def get_dependencies(self, sentence):
         """
         The dependency format must be 
             (('word', POS), dependency, ('word', POS))
         the first dependency is 
+        sentence is a text or an already parsed spacy Span/Doc
         """
-        doc = nlp(sentence)
+        doc = self.__parsed(sentence)
         dependencies_list = list()
         for token in doc:
             dep = ((token.head.text, token.head.tag_), token.dep_, (token.text, token.tag_))
             dependencies_list.append(dep)
         return dependencies_list
 
+    def get_dependency_graph(self, sentence):
+        '''
+        returns the spacy parse as a DependencyGraph, graph.to_triples('tokens', True) gives the
+        get_dependencies format
+        '''
+        return DependencyGraph.from_spacy(self.__parsed(sentence))
+
+    def spacy_dependency_triplets(self, sentence):
+        '''
+        dependency triples of the spacy parse in the dependency_triplets format (no ROOT triple),
+        note the relation labels are the ones of the spacy model, not CoreNLP's
+        '''
+        return self.get_dependency_graph(sentence).to_triples()
+
     def get_entites(self, sentence):
-        doc = nlp(sentence)
+        doc = self.__parsed(sentence)
         return [ ent.text for ent in doc.ents ]
 
-    def tripletsEntityCheck(self, triplets, sentence):
+    def sentences(self):
+        '''
+        the sentences of the coref resolved text, as spans of the document parse
+        '''
+        return list(self.doc.sents)
+
+    def __parsed(self, sentence):
+        if isinstance(sentence, str):
+            with metrics.stage('spacy.parse'):
+                return self.nlp(sentence, disable=['neuralcoref'])
+        return sentence
+
+    def tripletsEntityCheck(self, triplets, sentence, entities=None):
         """
         Replaces main words with the entire entites they reperesent
+        entities is a list of entity strings or an EntityIndex, built from the sentence if None
         """
-        entity_triples = list()
-        entities = self.get_entites(sentence)
-        for triple in triplets:
-            triple = list(triple)
-            for entity in entities:
-                if triple[0] in entity:
-                    triple[0] = entity
-                    break
-            for entity in entities:
-                if triple[2] in entity:
-                    triple[2] = entity
-                    break
-            if triple[0] != triple[2]:
-                entity_triples.append(triple)
-        return entity_triples
+        if entities is None:
+            entities = self.get_entites(sentence)
+        with metrics.stage('entity.check'):
+            return resolve_entities(triplets, entities)
     
     
+    def sentence_dependencies(self, sentences):
+        '''
+        yields (sentence, DependencyGraph) for every sentence, sentences are texts or spans
+        '''
+        if self.spacy_dependencies:
+            for sentence in sentences:
+                yield sentence, self.get_dependency_graph(sentence)
+        elif self.document_parse:
+            texts = [sentence if isinstance(sentence, str) else sentence.text for sentence in sentences]
+            for sentence, (text, graph) in zip(sentences, self.document_dependency_graphs(texts, self.max_chars)):
+                yield sentence, graph
+        else:
+            for sentence in sentences:
+                yield sentence, self.dependency_graph(sentence if isinstance(sentence, str) else sentence.text)
+
     def get_triples(self):
+        return list(self.iter_triples())
+
+    def iter_triples(self, with_sentences=False):
+        '''
+        generator version of get_triples, yields the triples of each sentence as soon as it is parsed.
+        with_sentences yields (sentence index, triple) pairs instead, e.g. as sources for a TripleAggregator
+        '''
         NOUN_RELATIONS = ['nmod', 'hypernym (low confidence)']
-        triplets = list()
-        cleaned_hypernyms = list()
-        for sentence in sent_tokenize(self.coref_fixed_text):
+        for i, (sentence, dependencies) in enumerate(self.sentence_dependencies(self.sentences())):
             sentence_triples = list()
-            dependencies = self.dependency_triplets(sentence)
             direct_relations, short_relations, hypernyms, prepositions = self.short_relations(dependencies, 2)
-            cleaned_hypernyms.extend([ hypernym_clean(hypernym) for hypernym in hypernyms ])
+            cleaned_hypernyms = [ hypernym_clean(hypernym) for hypernym in hypernyms ]
             cleaned_drs = [ directRelation_clean(direct_relation) for direct_relation in direct_relations ]
-            for i in cleaned_drs:
-                if i[1] in NOUN_RELATIONS:
-                    sentence_triples.append(i)
+            for relation in cleaned_drs:
+                if relation[1] in NOUN_RELATIONS:
+                    sentence_triples.append(relation)
             for short_relation in range(len(short_relations)):
                 sentence_triples.extend(short_relations_clean(short_relations[short_relation], prepositions[short_relation]))
-            triplets += self.tripletsEntityCheck(sentence_triples, sentence)
-            triplets += self.tripletsEntityCheck(cleaned_hypernyms, sentence)
-        return triplets
-        
\ No newline at end of file
+            entities = EntityIndex(self.get_entites(sentence))
+            for triple in self.tripletsEntityCheck(sentence_triples, sentence, entities) + self.tripletsEntityCheck(cleaned_hypernyms, sentence, entities):
+                yield (i, triple) if with_sentences else triple
+
+
+def extract_triples_many(texts, client=None, batch_size=1000, **options):
+    '''
+    get_triples for a list of texts, returns a list of triple lists in input order. The texts go
+    through the coref pipeline together with nlp.pipe, and unless the options ask for spacy
+    dependencies or document parses, the sentences of all the texts are parsed through the pooled
+    client in one go, so the extractors find their parses in the cache.
+    options are passed on to AdvancedTripleExtractionDeps, client replaces its CoreNLPClient
+    '''
+    texts = list(texts)
+    if not texts:
+        return []
+    nlp = get_model('en_coref')
+    with metrics.stage('spacy.coref'):
+        docs = list(nlp.pipe(texts, batch_size=batch_size))
+    extractors = [AdvancedTripleExtractionDeps(text, doc=doc, **options) for text, doc in zip(texts, docs)]
+    if client is not None:
+        for extractor in extractors:
+            extractor.client = client
+    if not (options.get('spacy_dependencies') or options.get('document_parse')):
+        extractors[0].dependency_graphs_many([sentence.text for extractor in extractors for sentence in extractor.sentences()])
+    return [extractor.get_triples() for extractor in extractors]
@@ -0,0 +1,63 @@
+from bisect import bisect_right
+
+# joins the entities of the index, words never contain it (the scan handles those which do)
+SEPARATOR = '\x00'
+
+
+class EntityIndex(object):
+    """
+    Resolves words to the entities containing them, built once per sentence.
+
+    The entities are joined into one string, lookup(word) finds the first occurrence of the
+    word in it and maps the position back to its entity with a bisect over the entity
+    offsets. That is the first entity (in entity order) the word is a substring of, the
+    same entity the linear scan `for entity in entities: if word in entity` picks.
+    Lookups are memoized.
+    """
+
+    def __init__(self, entities):
+        self.entities = list(entities)
+        self.starts = list()
+        position = 0
+        for entity in self.entities:
+            self.starts.append(position)
+            position += len(entity) + len(SEPARATOR)
+        self.text = SEPARATOR.join(self.entities)
+        self.resolved = dict()
+
+    def lookup(self, word):
+        '''
+        returns the first entity containing word, None if there is none
+        '''
+        if word in self.resolved:
+            return self.resolved[word]
+        entity = None
+        if SEPARATOR in word:
+            entity = next((e for e in self.entities if word in e), None)
+        elif self.entities:
+            position = self.text.find(word)
+            if position >= 0:
+                entity = self.entities[bisect_right(self.starts, position) - 1]
+        self.resolved[word] = entity
+        return entity
+
+
+def resolve_entities(triplets, entities):
+    '''
+    replaces the arguments of the triples with the entities they are part of, dropping the
+    triples whose arguments end up equal
+    '''
+    index = entities if isinstance(entities, EntityIndex) else EntityIndex(entities)
+    entity_triples = list()
+    for triple in triplets:
+        triple = list(triple)
+        entity = index.lookup(triple[0])
+        if entity is not None:
+            triple[0] = entity
+        entity = index.lookup(triple[2])
+        if entity is not None:
+            triple[2] = entity
+        if triple[0] != triple[2]:
+            entity_triples.append(triple)
+    return entity_triples
+
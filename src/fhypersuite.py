@@ -2,18 +2,47 @@ import sys
 sys.path.append("../../..")
 sys.path.append("..")
 
+from collections import defaultdict, deque
+
+import numpy as np
+
 from GSoC2019.hypernymysuite.hypernymysuite.base import HypernymySuiteModel
 
 class FBHypernymBench(HypernymySuiteModel):
+    """
+    Scores hypernymy from the extracted triplets. The (hyponym, hypernym) pairs are kept in
+    a hashed index, terms are lowercased if lowercase and passed through lemmatizer (a
+    callable term -> lemma) if one is given.
+
+    With max_hops > 1 is-a chains are followed as well: a pair reachable in k hops over the
+    hypernym graph scores decay ** (k - 1), a direct pair scores 1. Reachability is
+    precomputed in get_hypernyms.
+    """
 
     HYPERNYMY_PREDICATES = ['is', 'was']
 
-    def __init__(self):
+    def __init__(self, lowercase=False, lemmatizer=None, max_hops=1, decay=0.5):
         self.triplets_list = None
         self.hypernyms = None
         self.clean_hypernyms = None
+        self.lowercase = lowercase
+        self.lemmatizer = lemmatizer
+        self.max_hops = max_hops
+        self.decay = decay
+        self.hypernym_index = set()
+        self.reachability = dict()
+        self.term_ids = dict()
+        self.pair_keys = np.zeros(0, dtype=np.int64)
+        self.pair_scores = np.zeros(0, dtype=np.float32)
         super().__init__(self)
 
+    def normalize(self, term):
+        if self.lowercase:
+            term = term.lower()
+        if self.lemmatizer is not None:
+            term = self.lemmatizer(term)
+        return term
+
     def get_hypernyms(self, triplets):
         '''
         triplets have the following form, (subject [attrs], predicate [attrs], object [attrs])
@@ -24,19 +53,81 @@ class FBHypernymBench(HypernymySuiteModel):
         clean_hypernyms = list()
         for triplet in triplets:
             predicate = triplet[1]
-            if predicate[0] in HYPERNYMY_PREDICATES:
+            if predicate[0] in self.HYPERNYMY_PREDICATES:
                 hypernym = (triplet[0], triplet[2])
                 clean_hypernym = (triplet[0][0], triplet[2][0])
                 hypernyms.append(hypernym)
                 clean_hypernyms.append(clean_hypernym)
         self.hypernyms = hypernyms
         self.clean_hypernyms = clean_hypernyms
+        self.hypernym_index = set((self.normalize(hypo), self.normalize(hyper)) for hypo, hyper in clean_hypernyms)
+        self.__build_reachability()
 
-    def predict(self, hypo, hyper):
-        if (hypo, hyper) in self.clean_hypernyms or (hyper, hypo) in clean_hypernyms:
-            return 1.
-        else:
-            return 0.
+    def __build_reachability(self):
+        '''
+        breadth first search from every hyponym up to max_hops, reachability[hypo][hyper] is
+        the score of the shortest chain
+        '''
+        graph = defaultdict(set)
+        for hypo, hyper in self.hypernym_index:
+            graph[hypo].add(hyper)
+        self.reachability = dict()
+        for start in graph:
+            scores = dict()
+            queue = deque([(start, 0)])
+            while queue:
+                node, hops = queue.popleft()
+                if hops >= self.max_hops:
+                    continue
+                for hyper in graph.get(node, ()):
+                    if hyper not in scores:
+                        scores[hyper] = self.decay ** hops
+                        queue.append((hyper, hops + 1))
+            self.reachability[start] = scores
+
+        # the same scores as sorted integer keys for predict_many
+        self.term_ids = dict()
+        for hypo, scores in self.reachability.items():
+            self.term_ids.setdefault(hypo, len(self.term_ids))
+            for hyper in scores:
+                self.term_ids.setdefault(hyper, len(self.term_ids))
+        n = len(self.term_ids)
+        keys = list()
+        values = list()
+        for hypo, scores in self.reachability.items():
+            for hyper, score in scores.items():
+                keys.append(self.term_ids[hypo] * n + self.term_ids[hyper])
+                values.append(score)
+        keys = np.array(keys, dtype=np.int64)
+        order = np.argsort(keys)
+        self.pair_keys = keys[order]
+        self.pair_scores = np.array(values, dtype=np.float32)[order]
+
+    def score(self, hypo, hyper):
+        return self.reachability.get(hypo, {}).get(hyper, 0.)
 
+    def predict(self, hypo, hyper):
+        hypo = self.normalize(hypo)
+        hyper = self.normalize(hyper)
+        return float(max(self.score(hypo, hyper), self.score(hyper, hypo)))
 
+    def predict_many(self, hypos, hypers):
+        '''
+        scores whole evaluation sets at once, returns a float32 array with the predict score of
+        every (hypos[i], hypers[i]) pair
+        '''
+        n = len(self.term_ids)
+        hypo_ids = np.array([self.term_ids.get(self.normalize(t), -1) for t in hypos], dtype=np.int64)
+        hyper_ids = np.array([self.term_ids.get(self.normalize(t), -1) for t in hypers], dtype=np.int64)
+        known = (hypo_ids >= 0) & (hyper_ids >= 0)
+        return np.maximum(self.__lookup(hypo_ids * n + hyper_ids, known), self.__lookup(hyper_ids * n + hypo_ids, known))
 
+    def __lookup(self, keys, known):
+        scores = np.zeros(len(keys), dtype=np.float32)
+        if not len(self.pair_keys):
+            return scores
+        positions = np.searchsorted(self.pair_keys, keys)
+        positions = np.minimum(positions, len(self.pair_keys) - 1)
+        found = known & (self.pair_keys[positions] == keys)
+        scores[found] = self.pair_scores[positions[found]]
+        return scores
@@ -0,0 +1,162 @@
+import re
+import time
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:
+    import sre_parse
+    import sre_constants
+
+from .hpatternTokens import compile_token_pattern
+from .metrics import metrics
+
+# Literals which every Hearst pattern carries and which therefore say nothing about
+# whether a pattern can match a given sentence.
+UNINFORMATIVE_CUES = ['NP_', 'CD_']
+MIN_CUE_LENGTH = 2
+
+
+def required_literals(pattern):
+    '''
+    returns the literal strings which must occur in every match of the regex pattern.
+
+    Only literals which sit on the mandatory path of the pattern are collected, anything
+    inside an alternation, an optional group or a character class is ignored.
+    '''
+    literals = list()
+    _collect_literals(sre_parse.parse(pattern), literals)
+    return literals
+
+
+def _collect_literals(parsed, literals):
+    run = list()
+    for op, av in parsed:
+        if op is sre_constants.LITERAL:
+            run.append(chr(av))
+            continue
+        if run:
+            literals.append(''.join(run))
+            run = list()
+        if op is sre_constants.SUBPATTERN:
+            _collect_literals(av[-1], literals)
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) and av[0] >= 1:
+            _collect_literals(av[2], literals)
+    if run:
+        literals.append(''.join(run))
+
+
+def pattern_cue(pattern):
+    '''
+    picks the longest informative required literal of a pattern, this is the cue phrase
+    which has to be present in a sentence for the pattern to possibly match.
+    Returns None when the pattern has no usable cue.
+    '''
+    cues = [literal for literal in required_literals(pattern)
+            if literal.strip() and literal.strip() not in UNINFORMATIVE_CUES]
+    if not cues:
+        return None
+    cue = max(cues, key=len)
+    if len(cue.strip()) < MIN_CUE_LENGTH:
+        return None
+    return cue
+
+
+class HearstPatternEngine(object):
+    r"""
+    Precompiled matcher for a list of hearst patterns of the form
+    (<hearst-pattern>, <parser>, <hearst-type>, <process-type>).
+
+    Every pattern is compiled once. A single combined scan over the sentence finds
+    all the cue phrases present, and only the patterns whose cue was found (or which
+    have no cue at all) run their full regex. Matches are returned in pattern order,
+    so the results are the same as running re.search for every pattern.
+
+    With backend='tokens' the gap style patterns (.*NP_(\w+).*?of.*?NP_(\w+) and the like)
+    run on the NP_/CD_ token sequence in linear time instead of as backtracking regexes,
+    see hpatternTokens. The remaining patterns still run as regexes.
+
+    time_budget (seconds) bounds the time spent on one sentence. Once it is used up the
+    patterns not yet started are skipped, their matches are missing from the results. A token
+    pattern search checks the budget between its steps and gives up past it, a regex search
+    can not be interrupted and runs to its end, so with the regex backend a single slow pattern
+    can still overrun the budget, the patterns after it are skipped.
+    """
+
+    def __init__(self, patterns, backend='regex', time_budget=None):
+        if backend not in ('regex', 'tokens'):
+            raise Exception("Unknown hearst pattern backend {}, use 'regex' or 'tokens'".format(backend))
+        self.patterns = list(patterns)
+        self.backend = backend
+        self.time_budget = time_budget
+        self.budget_exceeded = 0
+        self.compiled = [re.compile(p[0]) for p in self.patterns]
+        self.cues = [pattern_cue(p[0]) for p in self.patterns]
+        self.token_patterns = [None] * len(self.patterns)
+        if backend == 'tokens':
+            self.token_patterns = [compile_token_pattern(p[0]) for p in self.patterns]
+
+        unique_cues = sorted(set(c for c in self.cues if c is not None), key=len, reverse=True)
+        self.cue_scanner = None
+        if unique_cues:
+            self.cue_scanner = re.compile('(?=(%s))' % '|'.join(re.escape(c) for c in unique_cues))
+        # the scanner only reports the longest cue starting at each position, every cue
+        # contained in a reported cue is then present as well
+        self.contained_cues = dict()
+        for cue in unique_cues:
+            self.contained_cues[cue] = [c for c in unique_cues if c in cue]
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def present_cues(self, sentence):
+        found = set()
+        if self.cue_scanner is None:
+            return found
+        for m in self.cue_scanner.finditer(sentence):
+            cue = m.group(1)
+            if cue not in found:
+                found.update(self.contained_cues[cue])
+        return found
+
+    def matches(self, sentence, stop=None):
+        '''
+        yields (pattern, match) for every pattern (up to the index stop) which matches the sentence,
+        the patterns left when the time_budget runs out are skipped
+        '''
+        found = self.present_cues(sentence)
+        stop = len(self.patterns) if stop is None else stop
+        deadline = time.perf_counter() + self.time_budget if self.time_budget is not None else None
+        # checked once per sentence, the patterns are only timed while the metrics are on
+        timed = metrics.enabled
+        for i in range(stop):
+            cue = self.cues[i]
+            if cue is not None and cue not in found:
+                continue
+            if self.__over_budget(deadline):
+                return
+            token_pattern = self.token_patterns[i]
+            if token_pattern is not None:
+                search = lambda sentence: token_pattern.search(sentence, deadline)
+            else:
+                search = self.compiled[i].search
+            if timed:
+                with metrics.stage('hearst.pattern', self.patterns[i][0]):
+                    m = search(sentence)
+            else:
+                m = search(sentence)
+            if m:
+                yield self.patterns[i], m
+            elif token_pattern is not None and self.__over_budget(deadline):
+                # the search gave up
+                return
+
+    def __over_budget(self, deadline):
+        '''
+        counts the sentences whose time_budget ran out
+        '''
+        if deadline is None or time.perf_counter() <= deadline:
+            return False
+        self.budget_exceeded += 1
+        metrics.error('hearst.time_budget')
+        return True
@@ -0,0 +1,248 @@
+import re
+import string
+import time
+
+# Grammar of the gap style hearst patterns (the bornOn, memberOf, ... family), e.g.
+#   .*NP_(\w+).*?(member).*?of.*?NP_(\w+)
+# Anything outside of it is left to the regex engine.
+PATTERN_ELEMENT = re.compile(r'''
+      (?P<lazy>\.\*\?)
+    | (?P<greedy>\.\*)
+    | (?P<np>NP_\(\\w\+\))
+    | (?P<cd_opt>CD_\(\\d\+\)\?)
+    | (?P<cd>CD_\(\\w\+\))
+    | (?P<word>\(\\w\+\))
+    | (?P<alt>\([a-z]+(?:[ ][a-z]+)*(?:\|[a-z]+(?:[ ][a-z]+)*)*\))
+    | (?P<kw>[a-z]+)
+    | (?P<space>[ ])
+''', re.X)
+
+WORD = re.compile(r'\w+')
+DIGITS = re.compile(r'\d+')
+
+LAZY = 'lazy'
+GREEDY = 'greedy'
+
+
+def _word_value(token):
+    m = WORD.match(token)
+    return m.group(0) if m else None
+
+
+def _keyword_value(token):
+    return token.strip(string.punctuation)
+
+
+class TokenMatch(object):
+    """
+    Mimics the parts of re.Match used by HearstPatterns for a TokenPattern match.
+    """
+
+    def __init__(self, tokens, start, end, captures):
+        self.tokens = tokens
+        self.start = start
+        self.end = end
+        self.captures = captures
+
+    def group(self, i=0):
+        if i == 0:
+            return ' '.join(self.tokens[self.start:self.end])
+        return self.captures[i-1]
+
+    def groups(self):
+        return tuple(self.captures)
+
+
+class TokenPattern(object):
+    """
+    A gap style hearst pattern compiled into a sequence of steps over the whitespace
+    separated tokens of an NP_/CD_ tagged sentence.
+
+    Each step is a run of adjacent atoms (NP_ token, CD_ token, keyword, any word), and
+    steps are separated by lazy (.*?) or greedy (.*) gaps. Matching takes one backward
+    pass, computing the latest start from which the remaining steps can still match,
+    and one forward pass, choosing for every step the earliest (lazy) or latest (greedy)
+    feasible start. This is the match the regex would prefer, found in linear time.
+
+    Keywords are matched against whole tokens, so 'on' no longer matches inside 'only'.
+
+    search takes an optional deadline (a time.perf_counter() value) which is checked before
+    every step of both passes, past it the search gives up and returns None.
+    """
+
+    def __init__(self, pattern, steps, gaps, requires_tail, leading_gap):
+        self.pattern = pattern
+        self.steps = steps
+        self.gaps = gaps
+        self.requires_tail = requires_tail
+        # a leading .* or .*? makes the whole match start at the first token
+        self.leading_gap = leading_gap
+
+    def match_step(self, step, tokens, i):
+        captures = list()
+        n = len(tokens)
+        for kind, value in step:
+            if i >= n:
+                return None
+            token = tokens[i]
+            if kind == 'np':
+                if not token.startswith('NP_'):
+                    return None
+                word = _word_value(token[3:])
+                if word is None:
+                    return None
+                captures.append(word)
+                i += 1
+            elif kind == 'cd':
+                if not token.startswith('CD_'):
+                    return None
+                if value:
+                    # CD_(\d+)? followed by a space, the token is CD_ alone or CD_ and digits
+                    digits = token[3:]
+                    if digits and not DIGITS.fullmatch(digits):
+                        return None
+                    captures.append(digits or None)
+                else:
+                    word = _word_value(token[3:])
+                    if word is None:
+                        return None
+                    captures.append(word)
+                i += 1
+            elif kind == 'word':
+                word = _word_value(token)
+                if word is None:
+                    return None
+                captures.append(word)
+                i += 1
+            else:
+                alternatives, capture = value
+                for alternative in alternatives:
+                    end = i + len(alternative)
+                    if end <= n and all(_keyword_value(tokens[i+k]) == w for k, w in enumerate(alternative)):
+                        break
+                else:
+                    return None
+                if capture:
+                    captures.append(' '.join(alternative))
+                i = end
+        return i, captures
+
+    def search(self, sentence, deadline=None):
+        tokens = sentence.split()
+        n = len(tokens)
+        k = len(self.steps)
+
+        # backward pass, latest[j] is the latest start of step j from which steps j.. can match
+        # a pattern ending in a space needs a next token, or whitespace ending the sentence
+        requires_tail = self.requires_tail and not sentence[-1:].isspace()
+        limit = n - 1 if requires_tail else n
+        latest = [None] * k
+        for j in range(k-1, -1, -1):
+            if deadline is not None and time.perf_counter() > deadline:
+                return None
+            for i in range(limit-1, -1, -1):
+                m = self.match_step(self.steps[j], tokens, i)
+                if m is not None and m[0] <= limit:
+                    latest[j] = i
+                    break
+            if latest[j] is None:
+                return None
+            limit = latest[j]
+
+        # forward pass
+        captures = list()
+        position = 0
+        start = None
+        for j in range(k):
+            if deadline is not None and time.perf_counter() > deadline:
+                return None
+            bound = latest[j+1] if j+1 < k else (n - 1 if requires_tail else n)
+            if self.gaps[j] == GREEDY:
+                i = latest[j]
+                end, step_captures = self.match_step(self.steps[j], tokens, i)
+            else:
+                i = position
+                while True:
+                    m = self.match_step(self.steps[j], tokens, i)
+                    if m is not None and m[0] <= bound:
+                        end, step_captures = m
+                        break
+                    i += 1
+            if start is None:
+                start = 0 if self.leading_gap else i
+            captures.extend(step_captures)
+            position = end
+        return TokenMatch(tokens, start, position, captures)
+
+
+def compile_token_pattern(pattern):
+    '''
+    compiles a gap style hearst pattern into a TokenPattern, returns None when the
+    pattern falls outside of the supported grammar
+    '''
+    elements = list()
+    position = 0
+    while position < len(pattern):
+        m = PATTERN_ELEMENT.match(pattern, position)
+        if not m:
+            return None
+        elements.append((m.lastgroup, m.group(0)))
+        position = m.end()
+
+    # the token check of CD_(\d+)? relies on the space after it, CD_may must not match
+    for i, (kind, text) in enumerate(elements):
+        if kind == 'cd_opt' and (i+1 == len(elements) or elements[i+1][0] != 'space'):
+            return None
+
+    steps = list()
+    gaps = list()
+    step = None
+    pending_gap = None
+    separated = True
+    trailing_space = False
+    leading_gap = None
+    for kind, text in elements:
+        trailing_space = False
+        if kind in (LAZY, GREEDY):
+            if step is None and not steps:
+                leading_gap = kind
+            if step is not None:
+                steps.append(step)
+                step = None
+            pending_gap = kind
+            separated = True
+            continue
+        if kind == 'space':
+            separated = True
+            trailing_space = True
+            continue
+        if not separated:
+            return None
+        if kind == 'np':
+            atom = ('np', None)
+        elif kind == 'cd_opt':
+            atom = ('cd', True)
+        elif kind == 'cd':
+            atom = ('cd', False)
+        elif kind == 'word':
+            atom = ('word', None)
+        elif kind == 'alt':
+            alternatives = [tuple(a.split(' ')) for a in text[1:-1].split('|')]
+            atom = ('kw', (alternatives, True))
+        else:
+            atom = ('kw', ([(text,)], False))
+        if step is None:
+            step = list()
+            gaps.append(pending_gap or LAZY)
+            pending_gap = None
+        step.append(atom)
+        separated = False
+    if step is not None:
+        steps.append(step)
+    if not steps:
+        return None
+
+    n_captures = sum(1 for s in steps for kind, value in s if kind != 'kw' or value[1])
+    if n_captures != re.compile(pattern).groups:
+        return None
+    return TokenPattern(pattern, steps, gaps, trailing_space, leading_gap)
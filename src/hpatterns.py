@@ -3,9 +3,12 @@ sys.path.append("../../..")
 
 import re
 import string
-import spacy
+from .models import get_model
 from .conllu.conllu import parse_single, TokenList
+from .conllReader import ConllReader
 from .hpatternUtils import create_default, create_greedy, create_semi
+from .hpatternEngine import HearstPatternEngine
+from .metrics import metrics
 
 class HearstPatterns(object):
     """
@@ -16,7 +19,20 @@ class HearstPatterns(object):
     For tagged sentences, check out the get_noun_chunks functions.
     """
 
-    def __init__(self, extended = False, greedy = False, same_sentence = False, semi = False):
+    # pipeline components which chunking does not need, these are switched off for batches.
+    # neuralcoref is there once en_coref, which shares the en pipeline, has been loaded
+    UNUSED_PIPES = ['ner', 'neuralcoref']
+
+    def __init__(self, extended = False, greedy = False, same_sentence = False, semi = False, backend = 'regex', time_budget = None, model = 'en'):
+        '''
+        backend = 'tokens' matches the greedy and semi-greedy gap patterns on the NP_ token
+        sequence in linear time, time_budget (seconds) caps the time spent on the patterns of a sentence,
+        the patterns left once it is used up are skipped.
+        See HearstPatternEngine.
+        The default, greedy, same_sentence and semi pattern sets are all compiled here, the flags
+        pick the one in use and use_patterns switches to another without compiling.
+        model is the name of the spacy pipeline in the model registry, it is loaded on first use
+        '''
         self.__adj_stopwords = ['able', 'available', 'brief', 'certain', 'different', 'due', 'enough', 'especially','few', 'fifth', 'former', 'his', 'howbeit', 'immediate', 'important', 'inc', 'its', 'last', 'latter', 'least', 'less', 'likely', 'little', 'many', 'ml', 'more', 'most', 'much', 'my', 'necessary', 'new', 'next', 'non', 'old', 'other', 'our', 'ours', 'own', 'particular', 'past', 'possible', 'present', 'proud', 'recent', 'same', 'several', 'significant', 'similar', 'such', 'sup', 'sure']
         # now define the Hearst patterns
         # format is <hearst-pattern>, <general-term>
@@ -183,69 +199,134 @@ class HearstPatterns(object):
                 ('((NP_\\w+ ?(, )?)+(and |or )?sort of NP_\\w+)', 'last', 'typeOf', 0)
             ])
 
-        self.__spacy_nlp = spacy.load('en')
-
+        self.__model = model
+
+        self.__pattern_sets = {
+            'default': self.__hearst_patterns,
+            'greedy': self.__hearst_patterns_greedy + create_greedy(),
+            'same_sentence': self.__hearst_patterns_ss,
+            'semi': self.__hearst_patterns_semigreedy + create_semi(),
+        }
+        self.__backend = backend
+        self.__time_budget = time_budget
+        # all four sets are compiled up front, so use_patterns switches between them without compiling
+        self.__pattern_engines = dict()
+        for name in self.__pattern_sets:
+            self.__compile(name)
+
+        # semi wins over same_sentence, which wins over greedy
+        active = 'default'
         if greedy:
-            self.__hearst_patterns = self.__hearst_patterns_greedy + create_greedy()
-
+            active = 'greedy'
         if same_sentence:
-            self.__hearst_patterns = self.__hearst_patterns_ss
-
+            active = 'same_sentence'
         if semi:
-            self.__hearst_patterns = self.__hearst_patterns_semigreedy + create_semi()
-        
+            active = 'semi'
+        self.use_patterns(active)
+
+    def __compile(self, name):
+        self.__pattern_engines[name] = HearstPatternEngine(self.__pattern_sets[name], self.__backend, self.__time_budget)
+
+    def use_patterns(self, name):
+        '''
+        switches to one of the precompiled pattern sets, 'default', 'greedy', 'same_sentence' or 'semi'
+        '''
+        if name not in self.__pattern_sets:
+            raise Exception("Unknown hearst pattern set {}, use one of {}".format(name, ', '.join(sorted(self.__pattern_sets))))
+        self.__active = name
+        self.__hearst_patterns = self.__pattern_sets[name]
+        self.__pattern_engine = self.__pattern_engines[name]
+
+    @property
+    def __spacy_nlp(self):
+        return get_model(self.__model)
+
     def chunk(self, rawtext):
-        STOP_TOKENS = ["the", "a", "an"]
-        doc = self.__spacy_nlp(rawtext)
-        chunks = []
-        for sentence in doc.sents:
-            sentence_text = sentence.text.lower()
-            for chunk in sentence.noun_chunks:
-                chunk_arr = []
-                replace_arr = []
-                for token in chunk:
-                    if token.text not in STOP_TOKENS:
-                        chunk_arr.append(token.text)
-                    # Remove punctuation and stopword adjectives (generally quantifiers of plurals)
-                    if token.lemma_.isalnum() and token.lemma_ not in self.__adj_stopwords and token.text not in STOP_TOKENS:
-                        replace_arr.append(token.lemma_)
-                    elif not token.lemma_.isalnum() and token.text not in STOP_TOKENS:
-                        if token.lemma_ != '-PRON-':
-                            replace_arr.append(''.join(char for char in token.lemma_ if char.isalnum()))
-                        else:
-                            replace_arr.append(token.text)
-                chunk_lemma = ' '.join(chunk_arr).lower()
-                replacement_value = 'NP_' + '_'.join(replace_arr).lower()
-                if chunk_lemma:
-                    sentence_text = re.sub(r'\b%s\b' % re.escape(chunk_lemma),
-                                           r'%s' % replacement_value,
-                                           sentence_text)
-            chunks.append(sentence_text)
-        return chunks
+        with metrics.stage('spacy.parse'):
+            doc = self.__spacy_nlp(rawtext, disable=['neuralcoref'])
+        with metrics.stage('hearst.chunk'):
+            return [self.__chunk_sentence(sentence) for sentence in doc.sents]
 
     def chunk_root(self, rawtext):
-        doc = self.__spacy_nlp(rawtext)
-        chunks = []
-        for sentence in doc.sents:
-            sentence_text = sentence.lemma_
-            for chunk in sentence.noun_chunks:
-                chunk_arr = []
-                replace_arr = []
-                for token in chunk:
-                    chunk_arr.append(token.lemma_)
-                    # Remove punctuation and stopword adjectives (generally quantifiers of plurals)
-                    if token.lemma_.isalnum() and token.lemma_ not in self.__adj_stopwords:
-                        replace_arr.append(token.lemma_)
-                    elif not token.lemma_.isalnum():
+        with metrics.stage('spacy.parse'):
+            doc = self.__spacy_nlp(rawtext, disable=['neuralcoref'])
+        with metrics.stage('hearst.chunk'):
+            return [self.__chunk_sentence_root(sentence) for sentence in doc.sents]
+
+    def chunk_batch(self, texts, batch_size=1000, n_process=1):
+        '''
+        streams an iterable of texts through spacy's nlp.pipe and yields the chunked
+        sentences of every text, in input order
+        '''
+        docs = self.__spacy_nlp.pipe(texts, batch_size=batch_size, n_process=n_process, disable=self.UNUSED_PIPES)
+        for doc in metrics.iterate('spacy.parse', docs):
+            with metrics.stage('hearst.chunk'):
+                chunked = [self.__chunk_sentence(sentence) for sentence in doc.sents]
+            yield chunked
+
+    def __chunk_sentence(self, sentence):
+        '''
+        returns the lowercased sentence text with every noun chunk replaced by its NP_ tag.
+        Replacements are spliced in by the character offsets of the chunk tokens, in a single
+        left to right pass over the sentence.
+        '''
+        STOP_TOKENS = ["the", "a", "an"]
+        text = sentence.text
+        offset = sentence.start_char
+        pieces = []
+        cursor = 0
+        for chunk in sentence.noun_chunks:
+            chunk_tokens = []
+            replace_arr = []
+            for token in chunk:
+                if token.text not in STOP_TOKENS:
+                    chunk_tokens.append(token)
+                # Remove punctuation and stopword adjectives (generally quantifiers of plurals)
+                if token.lemma_.isalnum() and token.lemma_ not in self.__adj_stopwords and token.text not in STOP_TOKENS:
+                    replace_arr.append(token.lemma_)
+                elif not token.lemma_.isalnum() and token.text not in STOP_TOKENS:
+                    if token.lemma_ != '-PRON-':
                         replace_arr.append(''.join(char for char in token.lemma_ if char.isalnum()))
-                chunk_lemma = ' '.join(chunk_arr)
-                replacement_value = 'NP_' + '_'.join(replace_arr)
-                if chunk_lemma:
-                    sentence_text = re.sub(r'\b%s\b' % re.escape(chunk_lemma),
-                                           r'%s' % replacement_value,
-                                           sentence_text)
-            chunks.append(sentence_text)
-        return chunks
+                    else:
+                        replace_arr.append(token.text)
+            if not chunk_tokens:
+                continue
+            # leading determiners stay in the text, the tag covers the rest of the chunk
+            start = chunk_tokens[0].idx - offset
+            end = chunk_tokens[-1].idx + len(chunk_tokens[-1].text) - offset
+            if start < cursor:
+                continue
+            pieces.append(text[cursor:start].lower())
+            pieces.append('NP_' + '_'.join(replace_arr).lower())
+            cursor = end
+        pieces.append(text[cursor:].lower())
+        return ''.join(pieces)
+
+    def __chunk_sentence_root(self, sentence):
+        '''
+        returns the lemmatized sentence with every noun chunk replaced by its NP_ tag, the
+        chunk lemmas are swapped out by token position
+        '''
+        lemmas = [token.lemma_ for token in sentence]
+        pieces = []
+        cursor = 0
+        for chunk in sentence.noun_chunks:
+            replace_arr = []
+            for token in chunk:
+                # Remove punctuation and stopword adjectives (generally quantifiers of plurals)
+                if token.lemma_.isalnum() and token.lemma_ not in self.__adj_stopwords:
+                    replace_arr.append(token.lemma_)
+                elif not token.lemma_.isalnum():
+                    replace_arr.append(''.join(char for char in token.lemma_ if char.isalnum()))
+            start = chunk.start - sentence.start
+            end = chunk.end - sentence.start
+            if start < cursor or not ' '.join(lemmas[start:end]):
+                continue
+            pieces.extend(lemmas[cursor:start])
+            pieces.append('NP_' + '_'.join(replace_arr))
+            cursor = end
+        pieces.extend(lemmas[cursor:])
+        return ' '.join(pieces).strip()
 
     """
         This is the main entry point for this code.
@@ -254,134 +335,126 @@ class HearstPatterns(object):
     """
     def find_hearstpatterns(self, filepath_to_conll, subject):
         
-        data_file = open(filepath_to_conll, "r", encoding="utf-8")
-        tokenList = parse_single(data_file)
-        sentence_tokenList = tokenList[0]
+        with ConllReader(filepath_to_conll) as reader:
+            sentence_tokenList = reader[0]
         hearst_patterns = []
         # np_tagged_sentences = self.chunk(rawtext)
         np_tagged_sentences = sentence_tokenList.get_noun_chunks(subject)
         # for sentence in np_tagged_sentences:
         # two or more NPs next to each other should be merged into a single NP, it's a chunk error
 
-        for (hearst_pattern, parser, hearst_type, process_type) in self.__hearst_patterns:
-            matches = re.search(hearst_pattern, np_tagged_sentences)
-            if matches:
-                match_str = matches.group(0)
-
-                if process_type == 0:
-                    nps = [a for a in match_str.split() if a.startswith("NP_")]
-
-                    if parser == "first":
-                        general = nps[0]
-                        specifics = nps[1:]
-                    else:
-                        general = nps[-1]
-                        specifics = nps[:-1]
-
-                    for i in range(len(specifics)):
-                        #print("%s, %s %s" % (specifics[i], general, hearst_type))
-                        hearst_patterns.append((self.clean_hyponym_term(specifics[i]), self.clean_hyponym_term(general), hearst_type))
-
-                else:
-                    if parser == "first":
-                        general = matches.group(1)
-                        specifics = [matches.group(i) for i in range(2,process_type+1)]
-                    else:
-                        general = matches.group(process_type)
-                        specifics = [matches.group(i) for i in range(1,process_type)]
-
-                    #print("%s, %s %s" % (specifics[i], general, hearst_type))
-                    hearst_patterns.append((specifics, general, hearst_type))
-
-
+        for (hearst_pattern, parser, hearst_type, process_type), matches in self.__pattern_engine.matches(np_tagged_sentences):
+            hearst_patterns.extend(self.__process_match(matches, parser, hearst_type, process_type, False))
 
         return hearst_patterns
 
-    def find_hearstpatterns_spacy(self, rawtext):
+    def iter_hearstpatterns(self, filepath_to_conll, subject):
+        '''
+        find_hearstpatterns over every sentence of the CoNLL-U file instead of the first one only,
+        the sentences are read and matched one at a time
+        '''
+        with ConllReader(filepath_to_conll) as reader:
+            for np_tagged_sentences in reader.noun_chunks(subject):
+                for (hearst_pattern, parser, hearst_type, process_type), matches in self.__pattern_engine.matches(np_tagged_sentences):
+                    for hypernym in self.__process_match(matches, parser, hearst_type, process_type, False):
+                        yield hypernym
 
-        hearst_patterns = []
+    def find_hearstpatterns_spacy(self, rawtext):
         np_tagged_sentences = self.chunk(rawtext)
+        return self.__match_sentences(np_tagged_sentences, len(self.__hearst_patterns)-1)
+
+    def find_hearstpatterns_spacy_batch(self, texts, batch_size=1000, n_process=1):
+        '''
+        batched version of find_hearstpatterns_spacy, yields the hearst patterns of every text in
+        input order. See chunk_batch for the parameters.
+        '''
+        for np_tagged_sentences in self.chunk_batch(texts, batch_size, n_process):
+            yield self.__match_sentences(np_tagged_sentences, len(self.__hearst_patterns)-1)
+
+    def iter_hearstpatterns_spacy(self, texts, batch_size=1000, n_process=1):
+        '''
+        streaming version of find_hearstpatterns_spacy over an iterable of texts, yields the
+        hearst patterns one by one as the texts are chunked
+        '''
+        for np_tagged_sentences in self.chunk_batch(texts, batch_size, n_process):
+            for hearst_pattern in self.__iter_match_sentences(np_tagged_sentences, len(self.__hearst_patterns)-1):
+                yield hearst_pattern
+
+    def iter_hearstpatterns_store(self, store, root=False):
+        '''
+        hearst patterns of the sentences of a ParseStore, chunked from the stored tokens and noun
+        chunks like find_hearstpatterns_spacy (find_hearstpatterns_spacy_root if root) chunks spacy docs
+        '''
+        if root:
+            np_tagged_sentences = (self.__chunk_sentence_root(sentence) for sentence in store)
+            stop = None
+        else:
+            np_tagged_sentences = (self.__chunk_sentence(sentence) for sentence in store)
+            stop = len(self.__hearst_patterns)-1
+        for hearst_pattern in self.__iter_match_sentences(np_tagged_sentences, stop):
+            yield hearst_pattern
+
+    def __match_sentences(self, np_tagged_sentences, stop=None):
+        return list(self.__iter_match_sentences(np_tagged_sentences, stop))
 
+    def __iter_match_sentences(self, np_tagged_sentences, stop=None):
         for sentence in np_tagged_sentences:
             # two or more NPs next to each other should be merged into a single NP, it's a chunk error
-            for (hearst_pattern, parser, hearst_type, process_type) in self.__hearst_patterns[:-1]:
-                matches = re.search(hearst_pattern, sentence)
-                if matches:
-                    match_str = matches.group(0)
-
-                    if process_type == 0:
-                        nps = [a for a in match_str.split() if a.startswith("NP_")]
-
-                        if parser == "first":
-                            general = nps[0]
-                            specifics = nps[1:]
-                        else:
-                            general = nps[-1]
-                            specifics = nps[:-1]
-
-                        for i in range(len(specifics)):
-                            #print("%s, %s %s" % (specifics[i], general, hearst_type))
-                            hearst_patterns.append((self.clean_hyponym_term(specifics[i]), self.clean_hyponym_term(general), hearst_type))
-
-                    else:
-                        if parser == "first":
-                            general = matches.group(1)
-                            specifics = [matches.group(i) for i in range(2,process_type+1)]
-                        else:
-                            general = matches.group(process_type)
-                            specifics = [matches.group(i) for i in range(1,process_type)]
-
-                        #print("%s, %s %s" % (specifics[i], general, hearst_type))
-                        hearst_patterns.append((specifics, general, hearst_type, parser))
-
-        return hearst_patterns
+            for (hearst_pattern, parser, hearst_type, process_type), matches in self.__pattern_engine.matches(sentence, stop):
+                for hypernym in self.__process_match(matches, parser, hearst_type, process_type):
+                    yield hypernym
 
     def find_hearstpatterns_spacy_root(self, rawtext):
-
-        hearst_patterns = []
         np_tagged_sentences = self.chunk_root(rawtext)
+        return self.__match_sentences(np_tagged_sentences)
 
-        for sentence in np_tagged_sentences:
-            # two or more NPs next to each other should be merged into a single NP, it's a chunk error
-            for (hearst_pattern, parser, hearst_type, process_type) in self.__hearst_patterns:
-                matches = re.search(hearst_pattern, sentence)
-                if matches:
-                    match_str = matches.group(0)
-
-                    if process_type == 0:
-                        nps = [a for a in match_str.split() if a.startswith("NP_")]
-
-                        if parser == "first":
-                            general = nps[0]
-                            specifics = nps[1:]
-                        else:
-                            general = nps[-1]
-                            specifics = nps[:-1]
+    def __process_match(self, matches, parser, hearst_type, process_type, with_parser=True):
+        '''
+        converts a pattern match into hypernym tuples. with_parser adds the parser type to
+        the tuples of the regex-group patterns (process_type > 0)
+        '''
+        hearst_patterns = []
+        if process_type == 0:
+            match_str = matches.group(0)
+            nps = [a for a in match_str.split() if a.startswith("NP_")]
 
-                        for i in range(len(specifics)):
-                            #print("%s, %s %s" % (specifics[i], general, hearst_type))
-                            hearst_patterns.append((self.clean_hyponym_term(specifics[i]), self.clean_hyponym_term(general), hearst_type))
+            if parser == "first":
+                general = nps[0]
+                specifics = nps[1:]
+            else:
+                general = nps[-1]
+                specifics = nps[:-1]
 
-                    else:
-                        if parser == "first":
-                            general = matches.group(1)
-                            specifics = [matches.group(i) for i in range(2,process_type+1)]
-                        else:
-                            general = matches.group(process_type)
-                            specifics = [matches.group(i) for i in range(1,process_type)]
-
-                        #print("%s, %s %s" % (specifics[i], general, hearst_type))
-                        hearst_patterns.append((specifics, general, hearst_type, parser))
+            for i in range(len(specifics)):
+                #print("%s, %s %s" % (specifics[i], general, hearst_type))
+                hearst_patterns.append((self.clean_hyponym_term(specifics[i]), self.clean_hyponym_term(general), hearst_type))
 
+        else:
+            if parser == "first":
+                general = matches.group(1)
+                specifics = [matches.group(i) for i in range(2,process_type+1)]
+            else:
+                general = matches.group(process_type)
+                specifics = [matches.group(i) for i in range(1,process_type)]
+
+            #print("%s, %s %s" % (specifics[i], general, hearst_type))
+            if with_parser:
+                hearst_patterns.append((specifics, general, hearst_type, parser))
+            else:
+                hearst_patterns.append((specifics, general, hearst_type))
         return hearst_patterns
 
     def add_patterns(self, patterns, t):
         if t == 'Default':
-            self.__hearst_patterns.extend(patterns)
+            # as before the sets were precompiled, Default patterns extend the set in use
+            name = self.__active
         elif t == 'Non-greedy':
-            self.__hearst_patterns_greedy.extend(patterns)
+            name = 'greedy'
         else:
-            self.__hearst_patterns_semigreedy.extend(patterns)
+            name = 'semi'
+        self.__pattern_sets[name].extend(patterns)
+        self.__compile(name)
+        self.use_patterns(self.__active)
 
 
     def clean_hyponym_term(self, term):
@@ -0,0 +1,276 @@
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# set to 1 to switch the metrics on at import, or to 'log' to also log every stage
+METRICS_ENV = 'TRIPLES_METRICS'
+
+
+class NullStage(object):
+    """
+    what stage() returns while the metrics are off, entering and leaving it does nothing
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NULL_STAGE = NullStage()
+
+
+class Stage(object):
+    """
+    times the wall and CPU (of the calling thread) time of a with block, an exception
+    leaving the block is counted as an error of the stage and propagates
+    """
+
+    __slots__ = ('metrics', 'name', 'detail', 'wall', 'cpu')
+
+    def __init__(self, metrics, name, detail=None):
+        self.metrics = metrics
+        self.name = name
+        self.detail = detail
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.metrics.record(self.name, time.perf_counter() - self.wall, time.thread_time() - self.cpu, exc_type is not None, self.detail)
+        return False
+
+
+class Metrics(object):
+    """
+    Opt-in per stage instrumentation of the extraction pipeline.
+
+    The pipeline wraps its stages (spacy parse, coref, CoreNLP requests, chunking, every
+    hearst pattern, the dependency BFS, the entity check, Spotlight requests) in
+    `with metrics.stage(name):` blocks and reports the errors it swallows with
+    metrics.error(site). While the metrics are off stage() returns NULL_STAGE, so the cost
+    is an attribute lookup and an empty with block.
+
+    When on, every stage gets its call count, error count, total wall and CPU time and
+    slowest call. summary() returns them as a dict, to_json() as JSON, prometheus() in the
+    Prometheus text format and serve(port) exposes both over http. enable(log=True)
+    additionally logs every finished stage as a JSON line at DEBUG level.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.log = False
+        self.lock = threading.Lock()
+        self.stages = dict()
+        self.errors = dict()
+        self.server = None
+
+    def enable(self, log=False):
+        self.enabled = True
+        self.log = log
+
+    def disable(self):
+        self.enabled = False
+        self.log = False
+
+    def reset(self):
+        with self.lock:
+            self.stages.clear()
+            self.errors.clear()
+
+    def stage(self, name, detail=None):
+        '''
+        context manager timing a stage, detail tells apart instances of a stage (e.g. the
+        pattern of a hearst pattern match)
+        '''
+        if not self.enabled:
+            return NULL_STAGE
+        return Stage(self, name, detail)
+
+    def timed(self, name):
+        '''
+        decorator timing every call of a function as the stage name
+        '''
+        def decorator(function):
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with Stage(self, name):
+                    return function(*args, **kwargs)
+            wrapper.__name__ = function.__name__
+            wrapper.__doc__ = function.__doc__
+            return wrapper
+        return decorator
+
+    def iterate(self, name, iterable):
+        '''
+        times producing every item of iterable as the stage name, for lazy pipelines like
+        nlp.pipe. Returns iterable itself while the metrics are off
+        '''
+        if not self.enabled:
+            return iterable
+        return self.__iterate(name, iterable)
+
+    def __iterate(self, name, iterable):
+        iterator = iter(iterable)
+        while True:
+            with Stage(self, name) as stage:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    # the end of the iteration is no call
+                    stage.name = None
+                    return
+            yield item
+
+    def record(self, name, wall, cpu, failed=False, detail=None):
+        if name is None:
+            return
+        key = (name, detail)
+        with self.lock:
+            entry = self.stages.get(key)
+            if entry is None:
+                entry = self.stages[key] = [0, 0, 0.0, 0.0, 0.0]
+            entry[0] += 1
+            if failed:
+                entry[1] += 1
+            entry[2] += wall
+            entry[3] += cpu
+            if wall > entry[4]:
+                entry[4] = wall
+        if self.log:
+            logger.debug(json.dumps({'stage': name, 'detail': detail, 'wall_ms': round(wall * 1000, 4),
+                                     'cpu_ms': round(cpu * 1000, 4), 'error': failed}))
+
+    def error(self, site, exception=None):
+        '''
+        counts an error swallowed at site, logged at DEBUG level with its traceback
+        '''
+        if not self.enabled:
+            return
+        with self.lock:
+            self.errors[site] = self.errors.get(site, 0) + 1
+        if self.log:
+            logger.debug(json.dumps({'error': site, 'exception': repr(exception)}), exc_info=exception)
+
+    def summary(self):
+        '''
+        returns {'stages': [per stage dicts, slowest total first], 'errors': {site: count}}
+        '''
+        with self.lock:
+            stages = [(key, list(entry)) for key, entry in self.stages.items()]
+            errors = dict(self.errors)
+        results = list()
+        for (name, detail), (count, failed, wall, cpu, slowest) in stages:
+            results.append({
+                'stage': name,
+                'detail': detail,
+                'count': count,
+                'errors': failed,
+                'wall_seconds': round(wall, 6),
+                'cpu_seconds': round(cpu, 6),
+                'mean_ms': round(wall / count * 1000, 4),
+                'max_ms': round(slowest * 1000, 4),
+            })
+        results.sort(key=lambda r: r['wall_seconds'], reverse=True)
+        return {'enabled': self.enabled, 'stages': results, 'errors': errors}
+
+    def to_json(self, indent=None):
+        return json.dumps(self.summary(), indent=indent)
+
+    def prometheus(self, prefix='triples'):
+        '''
+        the metrics in the Prometheus text exposition format
+        '''
+        summary = self.summary()
+        series = [
+            ('stage_calls_total', 'counter', 'Calls of a pipeline stage', 'count'),
+            ('stage_errors_total', 'counter', 'Calls of a pipeline stage which raised', 'errors'),
+            ('stage_wall_seconds_total', 'counter', 'Wall time spent in a pipeline stage', 'wall_seconds'),
+            ('stage_cpu_seconds_total', 'counter', 'CPU time spent in a pipeline stage', 'cpu_seconds'),
+            ('stage_max_seconds', 'gauge', 'Slowest call of a pipeline stage', 'max_ms'),
+        ]
+        lines = list()
+        for metric, kind, help_text, field in series:
+            lines.append('# HELP {}_{} {}'.format(prefix, metric, help_text))
+            lines.append('# TYPE {}_{} {}'.format(prefix, metric, kind))
+            for stage in summary['stages']:
+                value = round(stage[field] / 1000.0, 7) if field == 'max_ms' else stage[field]
+                lines.append('{}_{}{{{}}} {}'.format(prefix, metric, self.__labels(stage['stage'], stage['detail']), value))
+        lines.append('# HELP {}_swallowed_errors_total Errors caught and swallowed by the pipeline'.format(prefix))
+        lines.append('# TYPE {}_swallowed_errors_total counter'.format(prefix))
+        for site, count in sorted(summary['errors'].items()):
+            lines.append('{}_swallowed_errors_total{{site="{}"}} {}'.format(prefix, self.__escape(site), count))
+        return '\n'.join(lines) + '\n'
+
+    def __labels(self, name, detail):
+        labels = 'stage="{}"'.format(self.__escape(name))
+        if detail is not None:
+            labels += ',detail="{}"'.format(self.__escape(detail))
+        return labels
+
+    def __escape(self, value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    def serve(self, port=9464, host='127.0.0.1'):
+        '''
+        serves /metrics (Prometheus text) and /metrics.json on a daemon thread, returns the server
+        '''
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body = metrics.prometheus().encode('utf-8')
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                elif self.path == '/metrics.json':
+                    body = metrics.to_json().encode('utf-8')
+                    content_type = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format, *args)
+
+        self.close()
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+metrics = Metrics()
+
+if os.environ.get(METRICS_ENV, '') not in ('', '0'):
+    metrics.enable(log=os.environ[METRICS_ENV] == 'log')
+
+
+if __name__=="__main__" :
+    metrics.enable()
+    for i in range(3):
+        with metrics.stage('example'):
+            time.sleep(0.01)
+    print(metrics.prometheus())
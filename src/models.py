@@ -0,0 +1,113 @@
+import gc
+import threading
+
+
+class ModelRegistry(object):
+    """
+    Loads the spacy pipelines lazily and shares one instance of each across all the
+    extractors and threads.
+
+    Models are registered by name with a loader, get(name) loads a model on first use,
+    preload(names) loads models up front (e.g. at worker start up) and unload(name)
+    drops them again to free the memory.
+    """
+
+    def __init__(self):
+        self.loaders = dict()
+        self.models = dict()
+        self.lock = threading.Lock()
+        self.model_locks = dict()
+
+    def register(self, name, loader):
+        '''
+        registers loader, a callable without arguments returning the model, under name
+        '''
+        with self.lock:
+            self.loaders[name] = loader
+            self.model_locks.setdefault(name, threading.Lock())
+
+    def get(self, name):
+        model = self.models.get(name)
+        if model is not None:
+            return model
+        with self.lock:
+            if name not in self.loaders:
+                raise Exception("No model registered as {}. Registered models are {}".format(name, ', '.join(sorted(self.loaders))))
+            model_lock = self.model_locks[name]
+        # loading happens outside the registry lock, so different models can load in parallel
+        with model_lock:
+            model = self.models.get(name)
+            if model is None:
+                model = self.loaders[name]()
+                self.models[name] = model
+        return model
+
+    def set(self, name, model):
+        '''
+        installs an already loaded model under name
+        '''
+        with self.lock:
+            self.model_locks.setdefault(name, threading.Lock())
+            self.models[name] = model
+
+    def preload(self, names=None):
+        '''
+        loads the given models, all registered models if names is None
+        '''
+        for name in (names if names is not None else list(self.loaders)):
+            self.get(name)
+
+    def unload(self, name=None):
+        '''
+        drops a loaded model, all of them if name is None. A model loaded under several names
+        (like en and en_coref, which share one pipeline) is dropped under all of them, else the
+        other names would keep it in memory
+        '''
+        with self.lock:
+            if name is None:
+                self.models.clear()
+            elif name in self.models:
+                model = self.models[name]
+                for alias in [n for n, m in self.models.items() if m is model]:
+                    del self.models[alias]
+        gc.collect()
+
+    def is_loaded(self, name):
+        return name in self.models
+
+    def loaded(self):
+        return sorted(self.models)
+
+
+def spacy_loader(model_name):
+    def load():
+        import spacy
+        return spacy.load(model_name)
+    return load
+
+
+def coref_loader(base_name):
+    '''
+    adds neuralcoref to the registered model base_name instead of loading a second copy, so
+    both names share one pipeline. Users of the base model disable 'neuralcoref' where they
+    do not need it. Unloading either name unloads both, the next get loads a clean base pipeline
+    '''
+    def load():
+        import neuralcoref
+        nlp = registry.get(base_name)
+        if 'neuralcoref' not in nlp.pipe_names:
+            neuralcoref.add_to_pipe(nlp)
+        return nlp
+    return load
+
+
+registry = ModelRegistry()
+registry.register('en', spacy_loader('en'))
+registry.register('en_coref', coref_loader('en'))
+registry.register('de', spacy_loader('de_core_news_sm'))
+registry.register('fr', spacy_loader('fr_core_news_sm'))
+registry.register('es', spacy_loader('es_core_news_sm'))
+
+
+def get_model(name):
+    return registry.get(name)
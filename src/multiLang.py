@@ -1,15 +1,22 @@
-import spacy
 from .deps import TripleExtraction_Deps
 from .parseTree import TripleExtraction
 from .Constants import Constants
-
-nlp_german = spacy.load("de_core_news_sm")
-nlp_french = spacy.load("fr_core_news_sm")
-nlp_spanish = spacy.load("es_core_news_sm")
+from .depGraph import DependencyGraph
+from .models import get_model
 
 class SpacyDependencyParser(object):
     def __init__(self, nlp_model):
-        self.nlp_model = nlp_model
+        '''
+        nlp_model is a spacy pipeline or the name of one in the model registry, named models
+        are loaded on first use
+        '''
+        self.model = nlp_model
+
+    @property
+    def nlp_model(self):
+        if isinstance(self.model, str):
+            return get_model(self.model)
+        return self.model
 
 
     def get_dependencies(self, sentence):
@@ -18,25 +25,32 @@ class SpacyDependencyParser(object):
             (('word', POS), dependency, ('word', POS))
         the first dependency is 
         """
-        doc = self.nlp_model(sentence)
+        doc = self.nlp_model(sentence, disable=['neuralcoref'])
         dependencies_list = list()
         for token in doc:
             dep = ((token.head.text, token.head.tag_), token.dep_, (token.text, token.tag_))
             dependencies_list.append(dep)
         return dependencies_list
 
+    def get_dependency_graph(self, sentence):
+        '''
+        returns the parse as a DependencyGraph, graph.to_triples('tokens', True) gives the
+        get_dependencies format
+        '''
+        return DependencyGraph.from_spacy(self.nlp_model(sentence, disable=['neuralcoref']))
+
 
 class GermanDependencyParse(SpacyDependencyParser):
     def __init__(self):
-        super().__init__(nlp_german)
+        super().__init__('de')
 
 class FrenchDependencyParse(SpacyDependencyParser):
     def __init__(self):
-        super().__init__(nlp_french)
+        super().__init__('fr')
 
 class SpanishDependencyParse(SpacyDependencyParser):
     def __init__(self):
-        super().__init__(nlp_spanish)
+        super().__init__('es')
 
 class TripleExtraction_Deps_Lang(TripleExtraction_Deps):
     def __init__(self, language):
@@ -71,7 +85,7 @@ class TripleExtraction_Lang(TripleExtraction):
 
     def treebank(self, sentence):
         tree = list(self.parser.parse(sentence.split()))[0]
-        triple = self.main(ParentedTree.convert(tree))
+        triple = self.main(tree)
         return triple
 
  
\ No newline at end of file
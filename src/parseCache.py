@@ -0,0 +1,190 @@
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def parser_identity(parser, kind):
+    '''
+    identifies a parser by the kind of parse it returns and the server it talks to,
+    cached parses are only shared between identical parsers
+    '''
+    return '{}:{}'.format(kind, getattr(parser, 'url', type(parser).__name__))
+
+
+def normalize_sentence(sentence):
+    return ' '.join(sentence.split())
+
+
+class SQLiteParseStore(object):
+    """
+    On disk key value store for parses, survives restarts. Values are pickled and stored
+    with the time they were written, get skips values older than max_age seconds.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS parses (key TEXT PRIMARY KEY, value BLOB, created REAL)')
+        columns = [row[1] for row in self.connection.execute('PRAGMA table_info(parses)')]
+        if 'created' not in columns:
+            # stores written before values were timestamped
+            self.connection.execute('ALTER TABLE parses ADD COLUMN created REAL')
+        self.connection.commit()
+
+    def get(self, key, max_age=None):
+        entry = self.get_entry(key, max_age)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key, max_age=None):
+        '''
+        returns (value, created) or None, created is None for values of untimestamped stores
+        '''
+        with self.lock:
+            row = self.connection.execute('SELECT value, created FROM parses WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        if max_age is not None and (row[1] is None or time.time() - row[1] > max_age):
+            return None
+        return pickle.loads(row[0]), row[1]
+
+    def put(self, key, value, created=None):
+        blob = sqlite3.Binary(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        if created is None:
+            created = time.time()
+        with self.lock:
+            self.connection.execute('INSERT OR REPLACE INTO parses (key, value, created) VALUES (?, ?, ?)', (key, blob, created))
+            self.connection.commit()
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM parses').fetchone()[0]
+
+    def clear(self):
+        with self.lock:
+            self.connection.execute('DELETE FROM parses')
+            self.connection.commit()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class ParseCache(object):
+    """
+    Memoizes parses keyed by the normalized sentence text and the parser identity.
+
+    Parses are kept in an in-memory LRU of at most max_size entries. When a path is given
+    they are also written to an SQLite store, which is consulted on memory misses and
+    survives restarts. With a ttl (seconds) entries older than ttl count as misses.
+    hits, disk_hits and misses count the lookups.
+    """
+
+    def __init__(self, max_size=10000, path=None, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.store = SQLiteParseStore(path) if path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(sentence, parser_id):
+        return '{}\x1f{}'.format(parser_id, normalize_sentence(sentence))
+
+    def get(self, sentence, parser_id):
+        '''
+        returns the cached parse or None
+        '''
+        key = self.key(sentence, parser_id)
+        with self.lock:
+            if key in self.entries:
+                value, created = self.entries[key]
+                if self.ttl is None or time.time() - created <= self.ttl:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+        if self.store is not None:
+            entry = self.store.get_entry(key, self.ttl)
+            if entry is not None:
+                value, created = entry
+                with self.lock:
+                    self.disk_hits += 1
+                # the parse keeps the age it has on disk, promoting it does not extend its ttl
+                self.__remember(key, value, created if created is not None else time.time())
+                return value
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, sentence, parser_id, value):
+        key = self.key(sentence, parser_id)
+        created = time.time()
+        self.__remember(key, value, created)
+        if self.store is not None:
+            self.store.put(key, value, created)
+
+    def get_or_parse(self, sentence, parser_id, parse):
+        '''
+        returns the cached parse of the sentence, parsing it with parse(sentence) on a miss
+        '''
+        value = self.get(sentence, parser_id)
+        if value is None:
+            value = parse(sentence)
+            self.put(sentence, parser_id, value)
+        return value
+
+    def get_or_parse_many(self, sentences, parser_id, parse_many):
+        '''
+        batched get_or_parse, the misses are parsed together with parse_many(sentences)
+        which must return the parses in order
+        '''
+        values = [self.get(sentence, parser_id) for sentence in sentences]
+        # repeated sentences of the batch are parsed once
+        missing = OrderedDict()
+        for i, value in enumerate(values):
+            if value is None:
+                missing.setdefault(self.key(sentences[i], parser_id), list()).append(i)
+        if missing:
+            positions = list(missing.values())
+            parsed = parse_many([sentences[p[0]] for p in positions])
+            for p, value in zip(positions, parsed):
+                self.put(sentences[p[0]], parser_id, value)
+                for i in p:
+                    values[i] = value
+        return values
+
+    def __remember(self, key, value, created):
+        with self.lock:
+            self.entries[key] = (value, created)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'size': len(self.entries),
+                'max_size': self.max_size,
+            }
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.disk_hits = 0
+            self.misses = 0
+        if self.store is not None:
+            self.store.clear()
+
+
+# shared by the dependency and constituency extractors unless they are given their own cache
+default_cache = ParseCache()
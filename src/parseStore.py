@@ -0,0 +1,326 @@
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+
+from nltk.tree import Tree
+
+from .depGraph import DependencyGraph, Vocab, ROOT, conll_tag
+
+# Columnar on-disk format for parsed sentences, so that extraction experiments can be rerun
+# over a corpus without parsing it again.
+#
+# layout (little endian)
+#   header     magic, format version, number of sections
+#   directory  per section: name, offset, length in bytes, crc32 of the section bytes
+#   sections   8 byte aligned arrays
+#       strings.offsets  q  start of every interned string in strings.data (+ the end)
+#       strings.data     B  utf-8 bytes of all the strings (words, lemmas, tags, relations, trees)
+#       sentences        q  first token of every sentence (+ the token count)
+#       words, lemmas, tags, relations   i  string ids, one per token
+#       heads            i  sentence relative head of every token, ROOT for the root
+#       spaces           B  1 if the token is followed by whitespace
+#       chunks.offsets   q  first noun chunk of every sentence (+ the chunk count)
+#       chunks           i  sentence relative (start, end) token spans of the noun chunks
+#       trees            i  string id of the bracketed constituency tree of every sentence, -1 if none
+
+MAGIC = b'PARSESTR'
+VERSION = 1
+HEADER = struct.Struct('<8sII')
+SECTION = struct.Struct('<16sQQI')
+
+COLUMNS = [
+    ('strings.offsets', 'q'), ('strings.data', 'B'), ('sentences', 'q'),
+    ('words', 'i'), ('lemmas', 'i'), ('tags', 'i'), ('relations', 'i'), ('heads', 'i'), ('spaces', 'B'),
+    ('chunks.offsets', 'q'), ('chunks', 'i'), ('trees', 'i'),
+]
+
+
+class ParseStoreException(Exception):
+    pass
+
+
+class ParseStoreWriter(object):
+    """
+    Collects parsed sentences and writes them to a parse store on close(). Sentences are
+    added from spacy spans, CoNLL-U TokenLists or CoreNLP json sentences, or as plain columns.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.vocab = Vocab()
+        self.columns = dict((name, array(typecode)) for name, typecode in COLUMNS)
+        self.columns['sentences'].append(0)
+        self.columns['chunks.offsets'].append(0)
+
+    def add(self, words, lemmas, tags, heads, relations, spaces=None, chunks=None, tree=None):
+        '''
+        adds a sentence, heads are sentence relative token indices (ROOT for the root), chunks
+        (start, end) token spans and tree a bracketed tree string or nltk Tree
+        '''
+        columns = self.columns
+        intern = self.vocab.intern
+        columns['words'].extend(intern(w) for w in words)
+        columns['lemmas'].extend(intern(l) for l in lemmas)
+        columns['tags'].extend(intern(t) for t in tags)
+        columns['relations'].extend(intern(r) for r in relations)
+        columns['heads'].extend(heads)
+        columns['spaces'].extend(1 if s else 0 for s in (spaces if spaces is not None else [True] * len(words)))
+        columns['sentences'].append(len(columns['words']))
+        for start, end in (chunks or []):
+            columns['chunks'].extend((start, end))
+        columns['chunks.offsets'].append(len(columns['chunks']) // 2)
+        if isinstance(tree, Tree):
+            tree = tree.pformat(margin=sys.maxsize)
+        columns['trees'].append(intern(tree) if tree is not None else -1)
+        if not len(columns['heads']) == len(columns['words']) == len(columns['spaces']) == len(columns['lemmas']):
+            raise ParseStoreException('The columns of a sentence must have the same length')
+
+    def add_spacy(self, sentence, tree=None):
+        tokens = list(sentence)
+        offset = tokens[0].i if tokens else 0
+        self.add([t.text for t in tokens], [t.lemma_ for t in tokens], [t.tag_ for t in tokens],
+                 [ROOT if t.head.i == t.i else t.head.i - offset for t in tokens],
+                 [t.dep_ for t in tokens], [bool(t.whitespace_) for t in tokens],
+                 [(chunk.start - offset, chunk.end - offset) for chunk in sentence.noun_chunks], tree)
+
+    def add_conll(self, tokenlist, tree=None):
+        tokens = [token for token in tokenlist if isinstance(token['id'], int)]
+        spaces = [not (token.get('misc') and token['misc'].get('SpaceAfter') == 'No') for token in tokens]
+        self.add([t['form'] for t in tokens], [t['lemma'] or '' for t in tokens], [conll_tag(t) for t in tokens],
+                 [(t['head'] or 0) - 1 for t in tokens], [t['deprel'] for t in tokens], spaces, None, tree)
+
+    def add_corenlp(self, sentence):
+        '''
+        adds a sentence of a CoreNLP json response, with its tree when the parse annotator ran
+        '''
+        tokens = sentence['tokens']
+        heads = [ROOT] * len(tokens)
+        relations = ['ROOT'] * len(tokens)
+        for dependency in sentence.get('basicDependencies', []):
+            heads[dependency['dependent'] - 1] = dependency['governor'] - 1
+            relations[dependency['dependent'] - 1] = dependency['dep']
+        self.add([t['word'] for t in tokens], [t.get('lemma', t['word']) for t in tokens], [t['pos'] for t in tokens],
+                 heads, relations, [t.get('after', ' ') != '' for t in tokens], None,
+                 ' '.join(sentence['parse'].split()) if 'parse' in sentence else None)
+
+    def close(self):
+        strings = [s.encode('utf-8') for s in self.vocab.strings]
+        offsets = self.columns['strings.offsets']
+        del offsets[:]
+        position = 0
+        for s in strings:
+            offsets.append(position)
+            position += len(s)
+        offsets.append(position)
+        self.columns['strings.data'] = array('B', b''.join(strings))
+
+        sections = list()
+        position = HEADER.size + SECTION.size * len(COLUMNS)
+        for name, typecode in COLUMNS:
+            column = self.columns[name]
+            if sys.byteorder == 'big':
+                column = array(typecode, column)
+                column.byteswap()
+            data = column.tobytes()
+            position += -position % 8
+            sections.append((name, position, data))
+            position += len(data)
+        with open(self.path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(sections)))
+            for name, offset, data in sections:
+                f.write(SECTION.pack(name.encode('ascii'), offset, len(data), zlib.crc32(data)))
+            for name, offset, data in sections:
+                f.write(b'\0' * (offset - f.tell()))
+                f.write(data)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+
+
+class ParseStore(object):
+    """
+    Reader of a parse store. The file is memory mapped and the columns are memoryviews over
+    it, nothing is copied or decoded until a sentence is accessed. The checksums of all the
+    sections are verified on open unless verify is False.
+    """
+
+    def __init__(self, path, verify=True):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ParseStoreException('{} is not a parse store'.format(path))
+        if version != VERSION:
+            raise ParseStoreException('Unsupported parse store version {} in {}'.format(version, path))
+        view = memoryview(self.mm)
+        self.columns = dict()
+        typecodes = dict(COLUMNS)
+        for k in range(count):
+            name, offset, length, crc = SECTION.unpack_from(self.mm, HEADER.size + k * SECTION.size)
+            name = name.rstrip(b'\0').decode('ascii')
+            data = view[offset:offset + length]
+            if verify and zlib.crc32(data) != crc:
+                raise ParseStoreException('Checksum mismatch in section {} of {}'.format(name, path))
+            if sys.byteorder == 'big':
+                column = array(typecodes[name], data.tobytes())
+                column.byteswap()
+                self.columns[name] = column
+            else:
+                self.columns[name] = data.cast(typecodes[name])
+        self.strings = dict()
+
+    def string(self, i):
+        s = self.strings.get(i)
+        if s is None:
+            offsets = self.columns['strings.offsets']
+            s = bytes(self.columns['strings.data'][offsets[i]:offsets[i + 1]]).decode('utf-8')
+            self.strings[i] = s
+        return s
+
+    def __len__(self):
+        return len(self.columns['sentences']) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('sentence index out of range')
+        return StoredSentence(self, i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield StoredSentence(self, i)
+
+    def close(self):
+        self.columns = dict()
+        self.mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class StoredToken(object):
+    __slots__ = ('i', 'idx', 'text', 'lemma_', 'tag_', 'dep_', 'whitespace_')
+
+    def __init__(self, i, idx, text, lemma, tag, dep, whitespace):
+        self.i = i
+        self.idx = idx
+        self.text = text
+        self.lemma_ = lemma
+        self.tag_ = tag
+        self.dep_ = dep
+        self.whitespace_ = whitespace
+
+
+class StoredChunk(list):
+    """
+    The tokens of a noun chunk, with its sentence relative start and end.
+    """
+
+    def __init__(self, tokens, start, end):
+        super().__init__(tokens)
+        self.start = start
+        self.end = end
+
+
+class StoredSentence(object):
+    """
+    A sentence of a parse store. Besides the columns it offers the parts of the spacy Span
+    interface the Hearst chunking uses (iteration over tokens, text, start, start_char and
+    noun_chunks), the dependency triples short_relations takes and the constituency tree.
+    """
+
+    start = 0
+    start_char = 0
+
+    def __init__(self, store, i):
+        self.store = store
+        self.index = i
+        sentences = store.columns['sentences']
+        self.first = sentences[i]
+        self.last = sentences[i + 1]
+
+    def __len__(self):
+        return self.last - self.first
+
+    def __column(self, name):
+        return self.store.columns[name][self.first:self.last]
+
+    def __strings(self, name):
+        return [self.store.string(k) for k in self.__column(name)]
+
+    @property
+    def words(self):
+        return self.__strings('words')
+
+    @property
+    def lemmas(self):
+        return self.__strings('lemmas')
+
+    @property
+    def tags(self):
+        return self.__strings('tags')
+
+    @property
+    def relations(self):
+        return self.__strings('relations')
+
+    @property
+    def heads(self):
+        return self.__column('heads').tolist()
+
+    @property
+    def spaces(self):
+        return [bool(s) for s in self.__column('spaces')]
+
+    @property
+    def text(self):
+        return ''.join(w + (' ' if s else '') for w, s in zip(self.words, self.spaces)).rstrip()
+
+    @property
+    def chunks(self):
+        offsets = self.store.columns['chunks.offsets']
+        spans = self.store.columns['chunks'][2 * offsets[self.index]:2 * offsets[self.index + 1]]
+        return [(spans[k], spans[k + 1]) for k in range(0, len(spans), 2)]
+
+    def tokens(self):
+        tokens = list()
+        idx = 0
+        for i, (word, lemma, tag, relation, space) in enumerate(zip(self.words, self.lemmas, self.tags, self.relations, self.spaces)):
+            tokens.append(StoredToken(i, idx, word, lemma, tag, relation, ' ' if space else ''))
+            idx += len(word) + (1 if space else 0)
+        return tokens
+
+    def __iter__(self):
+        return iter(self.tokens())
+
+    @property
+    def noun_chunks(self):
+        tokens = self.tokens()
+        return [StoredChunk(tokens[start:end], start, end) for start, end in self.chunks]
+
+    def graph(self):
+        return DependencyGraph(self.words, self.tags, self.heads, self.relations)
+
+    def triples(self):
+        '''
+        the dependency triples in the dependency_triplets format
+        '''
+        return self.graph().to_triples()
+
+    def tree(self):
+        '''
+        the constituency tree as an nltk Tree, None if none was stored
+        '''
+        k = self.store.columns['trees'][self.index]
+        return Tree.fromstring(self.store.string(k)) if k >= 0 else None
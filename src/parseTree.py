@@ -2,8 +2,12 @@ import sys
 sys.path.append("../../..")
 sys.path.append("..")
 
-from .conllu.conllu import parse_single, TokenList
-from .stanford import treegex_api
+from .conllReader import ConllReader
+from .stanford import treegex_api, treegex_local, treegex_local_many
+from .parseCache import default_cache, parser_identity
+from .corenlpClient import get_client
+from .treeIndex import TreeIndex
+from .metrics import metrics
 
 # data_file = open("sample.conll", "r", encoding="utf-8")
 # tokenlist = parse_single(data_file) #tokenlist gives the parsed conllu file
@@ -24,29 +28,50 @@ class TripleExtraction(object):
     VERBS = ['VB', 'VBD', 'VBG', 'VBN', 'VBP', 'VBZ']
     NOUNS = ['NN', 'NNS', 'NNP', 'NNPS']
 
-    def __init__(self, filepath_to_conll=None):
+    def __init__(self, filepath_to_conll=None, parse_cache=None, client=None):
+        '''
+        parse_cache is the ParseCache used for the constituency trees, the shared default_cache if not given.
+        client is the CoreNLPClient used for the constituency parses, the shared client of the parser url if not given
+        '''
+        self.parse_cache = parse_cache if parse_cache is not None else default_cache
+        self.client = client if client is not None else get_client(parser.url)
         self.filepath_to_conll = None
         self.tokenlist = None
         self.tokenTree = None
         if filepath_to_conll:
             self.filepath_to_conll = filepath_to_conll
-            data_file = open(filepath_to_conll, "r", encoding="utf-8")
-            self.tokenlist = parse_single(data_file)
-            self.tokenTree = tokenlist[0].to_tree()
+            self.tokenlist = ConllReader(filepath_to_conll)
+            self.tokenTree = self.tokenlist[0].to_tree() if len(self.tokenlist) else None
 
 
         self.treegex_patterns = [
 
         ]
 
+    def token_trees(self):
+        '''
+        yields the token tree of every sentence of the CoNLL-U file, tokenTree is the first one
+        '''
+        if self.tokenlist is None:
+            return
+        for tree in self.tokenlist.trees():
+            yield tree
+
     def treegex(self, sentence):
         '''
         make sure the coreNLP server is running
         the default url is set to - http://localhost:9000/tregex, if this is not the url which you are using set the required url
         in the param url, and pass it to the treegex_api function (third parameter)
+
+        the sentence is parsed once and all the patterns are matched locally against its tree,
+        returns a dict pattern -> list of matches
         '''
 
-        responses = treegex_api(self.treegex_patterns, sentence)
+        responses = treegex_local(self.treegex_patterns, sentence, self.client.url, self.parse_cache)
+        return responses
+
+    def treegex_many(self, sentences):
+        return treegex_local_many(self.treegex_patterns, sentences, self.client.url, self.parse_cache)
 
     def find_subject(self, t): 
         for s in t.subtrees(lambda t: t.label() == 'NP'):
@@ -109,20 +134,49 @@ class TripleExtraction(object):
         return attrs
 
     def main(self, sentence):
+        '''
+        sentence is an nltk Tree (no ParentedTree needed) or a TreeIndex of one. The queries are
+        answered from a TreeIndex built in one traversal, with the results of find_subject,
+        find_predicate and find_object
+        '''
         try:
-            subject = self.find_subject(sentence)
-            predicate = self.find_predicate(sentence)
-            object_ = self.find_object(sentence)
+            index = sentence if isinstance(sentence, TreeIndex) else TreeIndex(sentence)
+            subject = index.subject()
+            predicate = index.predicate()
+            object_ = index.object()
             # print("triplet - ", subject, predicate, object_)
             return (subject, predicate, object_)
-        except:
+        except Exception as e:
+            # sentences without a subject, verb or object give no triple
+            metrics.error('parseTree.main', e)
             return ()
 
+    def main_many(self, trees):
+        return [self.main(tree) for tree in trees]
+
     def treebank(self, sentence):
-        tree = list(parser.raw_parse(sentence))[0]
-        triple = self.main(ParentedTree.convert(tree))
+        tree = self.parse_cache.get_or_parse(sentence, parser_identity(self.client, 'constituency'), self.client.parse_tree)
+        triple = self.main(tree)
         return triple
 
+    def treebank_many(self, sentences):
+        '''
+        treebank for a list of sentences, the uncached ones are parsed concurrently through
+        the pooled client
+        '''
+        trees = self.parse_cache.get_or_parse_many(list(sentences), parser_identity(self.client, 'constituency'), self.client.parse_trees)
+        return self.main_many(trees)
+
+    def treebank_store(self, store):
+        '''
+        treebank over the constituency trees of a ParseStore, yields a triple per sentence,
+        sentences stored without a tree are skipped
+        '''
+        for sentence in store:
+            tree = sentence.tree()
+            if tree is not None:
+                yield self.main(tree)
+
 if __name__=="__main__" :
     import sys   
     # Parse the example sentence
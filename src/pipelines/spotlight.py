@@ -2,33 +2,196 @@ import sys
 sys.path.append("../../../..")
 sys.path.append("../..")
 
-from GSoC2019.pyspotlight import spotlight
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 
+import requests
+from requests.adapters import HTTPAdapter
+
+from ..parseCache import ParseCache
+from ..metrics import metrics
+
+
+class RateLimiter(object):
+    """
+    Spaces out calls to at most rate per second across all threads, None for no limit.
+    """
+
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_call = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.time()
+            call = max(now, self.next_call)
+            self.next_call = call + self.interval
+        if call > now:
+            time.sleep(call - now)
 
 
 class Spotlight_Pipeline(object):
+    """
+    DBpedia Spotlight annotation over its REST API.
+
+    Lookups are cached per text in a ParseCache (an LRU of cache_size entries, kept on disk
+    as well when cache_path is given) whose entries expire after ttl seconds. Concurrent
+    lookups of a text which is already being annotated wait for that request instead of
+    sending their own. annotate_many runs the lookups on max_workers threads over a pooled
+    session, at most rate requests per second.
 
-    def __init__(self):
-        self.spotlight_config = spotlight.Config()
-        self.spotlight_address = self.spotlight_config.spotlight_address
+    address defaults to the one of the pyspotlight Config, pass the url of a local (mock)
+    server to use that instead.
+    """
+
+    def __init__(self, address=None, confidence=0.5, support=0, max_workers=4, rate=None,
+                 cache_size=10000, cache_path=None, ttl=7 * 24 * 3600, timeout=30):
+        if address is None:
+            from GSoC2019.pyspotlight import spotlight
+            self.spotlight_config = spotlight.Config()
+            address = self.spotlight_config.spotlight_address
+        self.spotlight_address = address
+        self.confidence = confidence
+        self.support = support
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.rate_limiter = RateLimiter(rate)
+        self.cache = ParseCache(cache_size, cache_path, ttl)
+        self.cache_id = 'spotlight:{}:{}:{}'.format(address, confidence, support)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = None
+        self.lock = threading.Lock()
+        self.in_flight = dict()
 
     def read_annotations(self, annotations):
         return [ i['URI'] for i in annotations ]
 
-    def annotate_word(self, word):
+    def request(self, text):
+        '''
+        posts text to the annotate endpoint, returns the annotations as dicts with the URI,
+        surfaceForm, offset, similarityScore and types of every resource
+        '''
+        self.rate_limiter.wait()
+        with metrics.stage('spotlight.request'):
+            r = self.session.post(self.spotlight_address,
+                                  data={'text': text, 'confidence': self.confidence, 'support': self.support},
+                                  headers={'Accept': 'application/json'}, timeout=self.timeout)
+        r.raise_for_status()
+        resources = r.json().get('Resources') or []
+        annotations = list()
+        for resource in resources:
+            annotations.append({
+                'URI': resource['@URI'],
+                'surfaceForm': resource.get('@surfaceForm', ''),
+                'offset': int(resource.get('@offset', 0)),
+                'similarityScore': float(resource.get('@similarityScore', 0)),
+                'types': resource.get('@types', ''),
+            })
+        return annotations
+
+    def annotate(self, text):
+        '''
+        cached and coalesced request(text)
+        '''
+        annotations = self.cache.get(text, self.cache_id)
+        if annotations is not None:
+            return annotations
+        key = self.cache.key(text, self.cache_id)
+        with self.lock:
+            future = self.in_flight.get(key)
+            owner = future is None
+            if owner:
+                # a request for the text may have finished since the lookup above
+                annotations = self.cache.get(text, self.cache_id)
+                if annotations is not None:
+                    return annotations
+                future = Future()
+                self.in_flight[key] = future
+        if not owner:
+            return future.result()
         try:
-            annotations = spotlight.annotate(self.spotlight_address,
-                                        word)
-            return self.read_annotations(annotations)
-        except spotlight.SpotlightException:
+            annotations = self.request(text)
+            self.cache.put(text, self.cache_id, annotations)
+            future.set_result(annotations)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)
+        return annotations
+
+    def annotate_word(self, word):
+        uris = self.read_annotations(self.annotate(word))
+        if not uris:
             print("URI not found")
             return word
+        return uris
 
+    def annotate_many(self, words):
+        '''
+        annotate_word for many words, every distinct word is looked up once and the lookups
+        run concurrently. Returns the results in input order
+        '''
+        words = list(words)
+        unique = list(dict.fromkeys(words))
+        if len(unique) <= 1:
+            results = [self.annotate_word(word) for word in unique]
+        else:
+            results = list(self.__executor().map(self.annotate_word, unique))
+        annotated = dict(zip(unique, results))
+        return [annotated[word] for word in words]
 
+    def annotate_sentence(self, sentence, triples=None):
+        '''
+        annotates a whole sentence in one request. Without triples the annotations are returned,
+        otherwise every triple with its subject and object replaced by the URIs of the entities
+        spotted in them (an argument keeps its text when nothing was spotted in it)
+        '''
+        annotations = self.annotate(sentence)
+        if triples is None:
+            return annotations
+        return [self.link_triple(triple, annotations) for triple in triples]
 
-    
-        
+    def link_triple(self, triple, annotations):
+        triple = list(triple)
+        for k in (0, 2):
+            uris = self.argument_uris(triple[k], annotations)
+            if uris:
+                triple[k] = uris
+        return triple
 
-    
+    def argument_uris(self, argument, annotations):
+        '''
+        URIs of the annotations whose surface form overlaps the argument text
+        '''
+        text = argument if isinstance(argument, str) else argument[0]
+        text = text.lower()
+        uris = list()
+        if not text:
+            return uris
+        for annotation in annotations:
+            surface = annotation['surfaceForm'].lower()
+            if surface and (surface in text or text in surface) and annotation['URI'] not in uris:
+                uris.append(annotation['URI'])
+        return uris
 
+    def __executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            return self.executor
 
+    def close(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+        self.session.close()
@@ -0,0 +1,388 @@
+import argparse
+import asyncio
+import json
+import logging
+import math
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .metrics import metrics
+from .models import registry
+
+# asyncio HTTP service around HearstPatterns and AdvancedTripleExtractionDeps, stdlib only.
+#
+#   python -m src.service --port 8080
+#   curl -d '{"text": "Dogs such as poodles bark."}' localhost:8080/hearst
+#
+# Concurrent requests are grouped into micro batches, so spacy sees them through one nlp.pipe
+# call and CoreNLP through one round of pooled requests. Requests for a text already waiting or
+# being processed share its result. The waiting texts are bounded, beyond that requests are
+# shed with 503, and a request still waiting at its deadline gets 504.
+#
+#   POST /hearst, POST /triples  {"text": ..., "deadline_ms": ...} or the plain text as the body
+#   GET /healthz                 200 while the process serves, with the warm up state and counters
+#   GET /readyz                  200 once the models are loaded and warmed up, 503 before
+#   GET /metrics                 src.metrics in the Prometheus text format
+
+logger = logging.getLogger(__name__)
+
+WARMUP_TEXT = 'Astatine is a radioactive chemical element, such as uranium, with the chemical symbol At.'
+MAX_BODY = 1 << 20
+
+STATUS_REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable',
+    504: 'Gateway Timeout',
+}
+
+
+class ServiceUnavailable(Exception):
+    pass
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class MicroBatcher(object):
+    """
+    Groups concurrent texts into batches for a blocking batch function.
+
+    submit(text, deadline) returns a future of process_batch's result for text. A worker takes
+    the first waiting text, waits at most max_wait_ms for up to max_batch_size - 1 more and
+    runs process_batch(texts) -> results (in order) on the executor. A text which is already
+    waiting or in a running batch is not queued again, its callers share one future. At most
+    max_queue texts wait, submit raises ServiceUnavailable beyond that. Texts whose latest
+    deadline (time.monotonic()) passed while they waited are failed with DeadlineExceeded
+    instead of being processed.
+    """
+
+    def __init__(self, name, process_batch, executor, max_batch_size=32, max_wait_ms=5, max_queue=1024, workers=1):
+        self.name = name
+        self.process_batch = process_batch
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue = max_queue
+        self.workers = workers
+        self.waiting = deque()
+        self.futures = dict()
+        self.deadlines = dict()
+        self.arrived = None
+        self.tasks = list()
+        self.stats = {'submitted': 0, 'coalesced': 0, 'shed': 0, 'expired': 0, 'batches': 0, 'batched': 0}
+
+    def start(self):
+        self.arrived = asyncio.Event()
+        self.tasks = [asyncio.ensure_future(self.__run()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = list()
+
+    def submit(self, text, deadline):
+        self.stats['submitted'] += 1
+        future = self.futures.get(text)
+        if future is not None:
+            self.stats['coalesced'] += 1
+            self.deadlines[text] = max(self.deadlines.get(text, deadline), deadline)
+            return future
+        if len(self.waiting) >= self.max_queue:
+            self.stats['shed'] += 1
+            raise ServiceUnavailable('{} queue is full'.format(self.name))
+        future = asyncio.get_running_loop().create_future()
+        # callers past their deadline no longer wait, their failure is not worth a warning
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.futures[text] = future
+        self.deadlines[text] = deadline
+        self.waiting.append(text)
+        self.arrived.set()
+        return future
+
+    async def __next_batch(self):
+        while not self.waiting:
+            self.arrived.clear()
+            await self.arrived.wait()
+        loop = asyncio.get_running_loop()
+        flush_at = loop.time() + self.max_wait
+        while len(self.waiting) < self.max_batch_size:
+            remaining = flush_at - loop.time()
+            if remaining <= 0:
+                break
+            self.arrived.clear()
+            try:
+                await asyncio.wait_for(self.arrived.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        batch = list()
+        now = time.monotonic()
+        while self.waiting and len(batch) < self.max_batch_size:
+            text = self.waiting.popleft()
+            if self.deadlines.pop(text) < now:
+                self.stats['expired'] += 1
+                self.futures.pop(text).set_exception(DeadlineExceeded())
+            else:
+                batch.append(text)
+        return batch
+
+    async def __run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self.__next_batch()
+            if not batch:
+                continue
+            self.stats['batches'] += 1
+            self.stats['batched'] += len(batch)
+            try:
+                with metrics.stage('service.batch', self.name):
+                    results = await loop.run_in_executor(self.executor, self.process_batch, batch)
+            except Exception as e:
+                logger.exception('%s batch of %d texts failed', self.name, len(batch))
+                for text in batch:
+                    self.futures.pop(text).set_exception(e)
+                continue
+            for text, result in zip(batch, results):
+                self.futures.pop(text).set_result(result)
+
+
+class ExtractionService(object):
+    """
+    The HTTP front of the batchers, see the top of the module for the endpoints.
+
+    hearst_options are passed on to HearstPatterns, triple_options to
+    AdvancedTripleExtractionDeps (e.g. spacy_dependencies=True to skip CoreNLP). client
+    replaces the CoreNLPClient of the triple extractors. timeout_ms is the deadline of
+    requests which do not set deadline_ms. batch_workers is the number of batches of an
+    endpoint which may run at once, threads the size of the pool they run on.
+    """
+
+    def __init__(self, host='127.0.0.1', port=8080, max_batch_size=32, max_wait_ms=5, max_queue=1024, timeout_ms=10000,
+                 threads=4, batch_workers=1, hearst_options=None, triple_options=None, client=None, warmup=True):
+        self.host = host
+        self.port = port
+        self.timeout = timeout_ms / 1000.0
+        self.hearst_options = hearst_options or dict()
+        self.triple_options = triple_options or dict()
+        self.client = client
+        self.warmup = warmup
+        self.hearst = None
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.batchers = {
+            '/hearst': MicroBatcher('hearst', self.hearst_batch, self.executor, max_batch_size, max_wait_ms, max_queue, batch_workers),
+            '/triples': MicroBatcher('triples', self.triples_batch, self.executor, max_batch_size, max_wait_ms, max_queue, batch_workers),
+        }
+        self.state = 'starting'
+        self.warmup_error = None
+        self.warmup_seconds = None
+        self.server = None
+
+    def hearst_batch(self, texts):
+        if self.hearst is None:
+            from .hpatterns import HearstPatterns
+            self.hearst = HearstPatterns(**self.hearst_options)
+        return list(self.hearst.find_hearstpatterns_spacy_batch(texts, batch_size=len(texts)))
+
+    def triples_batch(self, texts):
+        from .depsAdv import extract_triples_many
+        return extract_triples_many(texts, client=self.client, batch_size=len(texts), **self.triple_options)
+
+    def warm_up(self):
+        '''
+        loads the models and runs a sentence through them, so the first requests do not pay for it
+        '''
+        started = time.perf_counter()
+        registry.preload([self.hearst_options.get('model', 'en'), 'en_coref'])
+        self.hearst_batch([WARMUP_TEXT])
+        registry.get('en_coref')(WARMUP_TEXT)
+        self.warmup_seconds = round(time.perf_counter() - started, 3)
+
+    async def __warm_up(self):
+        self.state = 'warming'
+        try:
+            if self.warmup:
+                await asyncio.get_running_loop().run_in_executor(self.executor, self.warm_up)
+        except Exception as e:
+            logger.exception('warm up failed')
+            self.state = 'failed'
+            self.warmup_error = '{}: {}'.format(type(e).__name__, e)
+            return
+        self.state = 'ready'
+
+    def health(self):
+        return {
+            'state': self.state,
+            'ready': self.state == 'ready',
+            'warmup_seconds': self.warmup_seconds,
+            'warmup_error': self.warmup_error,
+            'models': registry.loaded(),
+            'queues': dict((b.name, dict(b.stats, waiting=len(b.waiting))) for b in self.batchers.values()),
+        }
+
+    async def extract(self, path, text, deadline_ms=None):
+        '''
+        returns (status, payload) for an extraction request
+        '''
+        if self.state != 'ready':
+            return 503, {'error': 'not ready', 'state': self.state}
+        timeout = deadline_ms / 1000.0 if deadline_ms is not None else self.timeout
+        deadline = time.monotonic() + timeout
+        try:
+            future = self.batchers[path].submit(text, deadline)
+        except ServiceUnavailable as e:
+            return 503, {'error': str(e)}
+        try:
+            # shielded, a caller timing out does not cancel the result other callers share
+            result = await asyncio.wait_for(asyncio.shield(future), timeout)
+        except (asyncio.TimeoutError, DeadlineExceeded):
+            return 504, {'error': 'deadline exceeded'}
+        except Exception as e:
+            return 500, {'error': '{}: {}'.format(type(e).__name__, e)}
+        key = 'hypernyms' if path == '/hearst' else 'triples'
+        return 200, {key: result}
+
+    async def route(self, method, path, headers, body):
+        '''
+        returns (status, payload, content type), payloads other than str are sent as JSON
+        '''
+        path = path.split('?', 1)[0]
+        if path == '/healthz':
+            return 200, self.health(), 'application/json'
+        if path == '/readyz':
+            health = self.health()
+            return (200 if health['ready'] else 503), health, 'application/json'
+        if path == '/metrics':
+            return 200, metrics.prometheus(), 'text/plain; version=0.0.4; charset=utf-8'
+        if path not in self.batchers:
+            return 404, {'error': 'not found'}, 'application/json'
+        if method != 'POST':
+            return 405, {'error': 'use POST'}, 'application/json'
+        deadline_ms = None
+        try:
+            if headers.get('content-type', '').startswith('application/json'):
+                request = json.loads(body.decode('utf-8'))
+                text = request['text']
+                deadline_ms = request.get('deadline_ms')
+            else:
+                text = body.decode('utf-8')
+        except (ValueError, KeyError, TypeError):
+            return 400, {'error': 'expected {"text": ...} or a plain text body'}, 'application/json'
+        if not isinstance(text, str) or not text.strip():
+            return 400, {'error': 'empty text'}, 'application/json'
+        if deadline_ms is not None and (isinstance(deadline_ms, bool) or not isinstance(deadline_ms, (int, float))
+                                        or not math.isfinite(deadline_ms) or deadline_ms <= 0):
+            return 400, {'error': 'deadline_ms must be a positive number'}, 'application/json'
+        status, payload = await self.extract(path, text, deadline_ms)
+        return status, payload, 'application/json'
+
+    async def handle(self, reader, writer):
+        '''
+        serves the HTTP/1.1 requests of one connection, keeping it alive unless asked not to
+        '''
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, version = request_line.decode('latin-1').split()
+                headers = dict()
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY:
+                    await self.respond(writer, 413, {'error': 'body larger than {} bytes'.format(MAX_BODY)}, 'application/json', False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                try:
+                    status, payload, content_type = await self.route(method, path, headers, body)
+                except Exception as e:
+                    logger.exception('%s %s failed', method, path)
+                    status, payload, content_type = 500, {'error': '{}: {}'.format(type(e).__name__, e)}, 'application/json'
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                await self.respond(writer, status, payload, content_type, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, payload, content_type, keep_alive):
+        body = (payload if isinstance(payload, str) else json.dumps(payload)).encode('utf-8')
+        head = 'HTTP/1.1 {} {}\r\nContent-Type: {}\r\nContent-Length: {}\r\nConnection: {}\r\n\r\n'.format(
+            status, STATUS_REASONS.get(status, ''), content_type, len(body), 'keep-alive' if keep_alive else 'close')
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def start(self):
+        for batcher in self.batchers.values():
+            batcher.start()
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        asyncio.ensure_future(self.__warm_up())
+        logger.info('serving on %s:%d', self.host, self.port)
+        return self.server
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        for batcher in self.batchers.values():
+            await batcher.stop()
+        self.executor.shutdown(wait=False)
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Micro batching HTTP service for HearstPatterns and AdvancedTripleExtractionDeps')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--max-wait-ms', type=float, default=5, help='how long a batch waits for more requests after the first one')
+    parser.add_argument('--max-queue', type=int, default=1024, help='waiting texts per endpoint before requests are shed with 503')
+    parser.add_argument('--timeout-ms', type=float, default=10000, help='deadline of requests which do not set deadline_ms')
+    parser.add_argument('--threads', type=int, default=4, help='threads running the batches')
+    parser.add_argument('--batch-workers', type=int, default=1, help='batches per endpoint running at once')
+    parser.add_argument('--spacy-dependencies', action='store_true', help='take the triple dependencies from spacy instead of CoreNLP')
+    parser.add_argument('--metrics', action='store_true', help='record src.metrics for /metrics')
+    parser.add_argument('--stubs', action='store_true', help='use the benchmark stub parsers instead of spacy and CoreNLP')
+    parser.add_argument('--stub-latency', type=float, default=0, help='seconds every stub parse sleeps')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.metrics:
+        metrics.enable()
+    client = None
+    if args.stubs:
+        from benchmarks.run import install_stubs
+        client = install_stubs(args.stub_latency)
+    service = ExtractionService(args.host, args.port, args.max_batch_size, args.max_wait_ms, args.max_queue, args.timeout_ms,
+                                args.threads, args.batch_workers, triple_options={'spacy_dependencies': args.spacy_dependencies}, client=client)
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__=="__main__" :
+    sys.exit(main())
@@ -1,17 +1,39 @@
 # java -mx4g -cp "*" edu.stanford.nlp.pipeline.StanfordCoreNLPServer -port 9000 -timeout 15000
 
-import requests
+from .corenlpClient import get_client, CORENLP_URL
+from .parseCache import default_cache, parser_identity
+from .tregexMatcher import tregex_matches
 
 def treegex_api(patterns, text, url="http://localhost:9000/tregex"):
-    pattern = None
+    '''
+    runs every pattern on the server, one request per pattern. The server parses the text again
+    for every request, prefer treegex_local
+    '''
+    session = get_client(url.rsplit('/tregex', 1)[0]).session
     responeses = list()
     for p in patterns:
-        pattern = p 
         request_params = {"pattern": p}
-        r = requests.post(url, data=text, params=request_params)
+        r = session.post(url, data=text.encode('utf-8'), params=request_params)
         responeses.append(r.json())
     return responeses
 
+def treegex_local(patterns, text, url=CORENLP_URL, parse_cache=default_cache):
+    '''
+    parses the text once (through the parse cache) and evaluates all the patterns on its trees
+    locally, see tregexMatcher. Returns a dict pattern -> list of matches
+    '''
+    return treegex_local_many(patterns, [text], url, parse_cache)[0]
+
+def treegex_local_many(patterns, texts, url=CORENLP_URL, parse_cache=default_cache):
+    '''
+    treegex_local for many texts, the uncached texts are parsed concurrently over the pooled
+    session of the shared client. Returns one dict pattern -> list of matches per text
+    '''
+    client = get_client(url)
+    texts = list(texts)
+    parses = parse_cache.get_or_parse_many(texts, parser_identity(client, 'constituency_text'), client.parse_texts)
+    return [tregex_matches(patterns, trees) for trees in parses]
+
 
 
 # request_params = {"pattern": "(NP[$VP]>S)|(NP[$VP]>S\\n)|(NP\\n[$VP]>S)|(NP\\n[$VP]>S\\n)"}
@@ -0,0 +1,102 @@
+import os
+
+from nltk.tokenize import sent_tokenize
+
+from .depsAdv import AdvancedTripleExtractionDeps
+from .hpatterns import HearstPatterns
+
+# Streaming entry points: the input is read incrementally, processed a window of sentences at
+# a time and the results are yielded as soon as they are found, so memory stays bounded by
+# the window instead of growing with the document.
+#
+# Inputs (text_or_file) are a str holding the text itself, a path (os.PathLike, e.g. a
+# pathlib.Path), an open file or any iterable of strings (lines, chunks).
+
+READ_SIZE = 64 * 1024
+
+# a sentence longer than this is cut off instead of buffering the input indefinitely
+MAX_SENTENCE_CHARS = 100000
+
+
+def iter_text(text_or_file, read_size=READ_SIZE):
+    '''
+    yields the input piece by piece, files are read read_size characters at a time
+    '''
+    if isinstance(text_or_file, str):
+        yield text_or_file
+    elif isinstance(text_or_file, os.PathLike):
+        with open(text_or_file, 'r', encoding='utf-8') as f:
+            for piece in iter_text(f, read_size):
+                yield piece
+    elif hasattr(text_or_file, 'read'):
+        while True:
+            piece = text_or_file.read(read_size)
+            if not piece:
+                break
+            yield piece
+    else:
+        for piece in text_or_file:
+            yield piece
+
+
+def iter_sentences(text_or_file, read_size=READ_SIZE, max_chars=MAX_SENTENCE_CHARS):
+    '''
+    yields the sentences of the input (split with sent_tokenize) while it is being read.
+    The last sentence of the buffer is held back until more input arrives, it may continue
+    in the next piece.
+    '''
+    buffer = ''
+    for piece in iter_text(text_or_file, read_size):
+        buffer += piece
+        sentences = sent_tokenize(buffer)
+        # the boundary before the last sentence depends on its first token, which is only
+        # known once the token is complete
+        held = 1 if sentences and len(sentences[-1].split()) > 1 else 2
+        if len(sentences) > held:
+            position = 0
+            for sentence in sentences[:-held]:
+                position = buffer.find(sentence, position) + len(sentence)
+                yield sentence
+            buffer = buffer[buffer.find(sentences[-held], position):]
+        elif len(buffer) > max_chars:
+            yield buffer.strip()
+            buffer = ''
+    for sentence in sent_tokenize(buffer):
+        yield sentence
+
+
+def iter_windows(sentences, window):
+    '''
+    groups sentences into texts of at most window sentences
+    '''
+    group = list()
+    for sentence in sentences:
+        group.append(sentence)
+        if len(group) >= window:
+            yield ' '.join(group)
+            group = list()
+    if group:
+        yield ' '.join(group)
+
+
+def iter_triples(text_or_file, window=20, **options):
+    '''
+    yields the AdvancedTripleExtractionDeps triples of the input. Coreference is resolved
+    within windows of window sentences, options are passed on to AdvancedTripleExtractionDeps
+    (e.g. document_parse, spacy_dependencies).
+    '''
+    for text in iter_windows(iter_sentences(text_or_file), window):
+        extractor = AdvancedTripleExtractionDeps(text, **options)
+        for triple in extractor.iter_triples():
+            yield triple
+
+
+def iter_hearst_patterns(stream, hearst_patterns=None, window=20, batch_size=50, n_process=1):
+    '''
+    yields the hearst patterns of the input, windows of window sentences are chunked by
+    spacy batch_size windows at a time. hearst_patterns defaults to HearstPatterns()
+    '''
+    hearst_patterns = hearst_patterns or HearstPatterns()
+    texts = iter_windows(iter_sentences(stream), window)
+    for hearst_pattern in hearst_patterns.iter_hearstpatterns_spacy(texts, batch_size, n_process):
+        yield hearst_pattern
@@ -0,0 +1,159 @@
+from nltk.tree import Tree
+
+
+class TreeIndex(object):
+    """
+    Preorder index over a constituency tree, built in one traversal without copying the tree:
+    the nodes, their labels (None for the words), parents, children and subtree ends, plus the
+    positions of the NP and VP nodes and next-NN/next-JJ lookups.
+
+    subject(), predicate(), object() and attrs(i) answer the queries of
+    TripleExtraction.find_subject/find_predicate/find_object/find_attrs from it, with the
+    same results.
+    """
+
+    __slots__ = ('tree', 'nodes', 'labels', 'parents', 'children', 'ends', 'nps', 'vps', 'next_nn', 'next_jj')
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.nodes = list()
+        self.labels = list()
+        self.parents = list()
+        self.children = list()
+        self.ends = list()
+        self.nps = list()
+        self.vps = list()
+        stack = [(tree, -1)]
+        while stack:
+            node, parent = stack.pop()
+            i = len(self.nodes)
+            self.nodes.append(node)
+            self.parents.append(parent)
+            self.children.append(list())
+            self.ends.append(i + 1)
+            if parent >= 0:
+                self.children[parent].append(i)
+            if isinstance(node, Tree):
+                label = node.label()
+                self.labels.append(label)
+                if label == 'NP':
+                    self.nps.append(i)
+                elif label == 'VP':
+                    self.vps.append(i)
+                for k in range(len(node) - 1, -1, -1):
+                    stack.append((node[k], i))
+            else:
+                self.labels.append(None)
+        # subtree ends and the next NN/JJ lookups in one backward pass
+        n = len(self.nodes)
+        self.next_nn = next_nn = [n] * (n + 1)
+        self.next_jj = next_jj = [n] * (n + 1)
+        ends = self.ends
+        children = self.children
+        labels = self.labels
+        for i in range(n - 1, -1, -1):
+            if children[i]:
+                ends[i] = ends[children[i][-1]]
+            prefix = labels[i][:2] if labels[i] is not None else None
+            next_nn[i] = i if prefix == 'NN' else next_nn[i + 1]
+            next_jj[i] = i if prefix == 'JJ' else next_jj[i + 1]
+
+    def __first_in(self, following, i):
+        j = following[i]
+        return j if j < self.ends[i] else None
+
+    def word(self, i):
+        return self.nodes[i][0]
+
+    def subject(self):
+        '''
+        the first NN node of the first NP containing one
+        '''
+        for np in self.nps:
+            n = self.__first_in(self.next_nn, np)
+            if n is not None:
+                return (self.word(n), self.attrs(n))
+        return None
+
+    def predicate(self):
+        '''
+        the last VB node of the first VP
+        '''
+        if not self.vps:
+            return None
+        vp = self.vps[0]
+        for v in range(self.ends[vp] - 1, vp - 1, -1):
+            label = self.labels[v]
+            if label is not None and label.startswith('VB'):
+                return (self.word(v), self.attrs(v))
+        raise TypeError('The first VP has no verb')
+
+    def object(self):
+        '''
+        the first NN of an NP or PP, or JJ of an ADJP, inside a VP
+        '''
+        covered = -1
+        for vp in self.vps:
+            # a VP inside an already searched VP has nothing left to find
+            if vp < covered:
+                continue
+            covered = self.ends[vp]
+            for n in range(vp, self.ends[vp]):
+                label = self.labels[n]
+                if label in ('NP', 'PP'):
+                    c = self.__first_in(self.next_nn, n)
+                elif label == 'ADJP':
+                    c = self.__first_in(self.next_jj, n)
+                else:
+                    continue
+                if c is not None:
+                    return (self.word(c), self.attrs(c))
+        return None
+
+    def __siblings(self, p):
+        '''
+        the children of p, words among them fail like calling label() on them does
+        '''
+        if p < 0:
+            raise TypeError('The node has no parent')
+        for s in self.children[p]:
+            if self.labels[s] is None:
+                raise AttributeError('A word has no label')
+            yield s
+
+    def __flat(self, s):
+        return ' '.join(self.nodes[s].leaves())
+
+    def attrs(self, i):
+        attrs = []
+        label = self.labels[i]
+        p = self.parents[i]
+
+        # Search siblings
+        if label.startswith('JJ'):
+            for s in self.__siblings(p):
+                if self.labels[s] == 'RB':
+                    attrs.append(self.word(s))
+
+        elif label.startswith('NN'):
+            for s in self.__siblings(p):
+                if self.labels[s] in ['DT','PRP$','POS','JJ','CD','ADJP','QP','NP']:
+                    attrs.append(self.__flat(s))
+
+        elif label.startswith('VB'):
+            for s in self.__siblings(p):
+                if self.labels[s] == 'ADVP':
+                    attrs.append(self.__flat(s))
+
+        # Search uncles, the parent itself is skipped by value like the != comparison of trees does
+        if label.startswith('JJ') or label.startswith('NN'):
+            for s in self.__siblings(self.parents[p]):
+                if self.labels[s] == 'PP' and not (self.labels[p] == 'PP' and self.nodes[s] == self.nodes[p]):
+                    attrs.append(self.__flat(s))
+
+        elif label.startswith('VB'):
+            for s in self.__siblings(self.parents[p]):
+                if self.labels[s].startswith('VB') and not (self.labels[s] == self.labels[p] and self.nodes[s] == self.nodes[p]):
+                    attrs.append(self.word(s))
+
+        return attrs
@@ -0,0 +1,374 @@
+import re
+import sys
+
+from nltk.tree import Tree
+
+# Local evaluation of Tregex patterns over nltk trees, so that many patterns can be run
+# against a tree which has been parsed once instead of posting the text to the CoreNLP
+# /tregex endpoint once per pattern.
+#
+# Supported syntax, following the Tregex documentation:
+#   node descriptions    NP, NP|VP (alternatives), /^NN/ (regex), __ (any node), !NP (negated)
+#   naming               NP=subject, the named nodes are returned with the match
+#   relations            < > << >> $ $+ $- $++ $-- $. $, $.. $,, <, <- <: >, >- >: .. ,, . ,
+#   negated/optional     !< NP, ?< NP
+#   grouping             A < (B < C), [< B | < C] (disjunction), [< B & < C], (A) | (B) at top level
+# Leaves (the words) are nodes as well, as in Tregex.
+
+RELATIONS = ['<<', '>>', '$++', '$--', '$..', '$,,', '$+', '$-', '$.', '$,', '<,', '<-', '<:',
+             '>,', '>-', '>:', '..', ',,', '<', '>', '$', '.', ',']
+
+LABEL = r'[^\s()\[\]!<>$,.=|&?/@]+(?:\|[^\s()\[\]!<>$,.=|&?/@]+)*'
+
+TOKEN = re.compile(r'''
+      (?P<regex>/(?:\\.|[^/\\])*/)
+    | (?P<any>__)
+    | (?P<relation>{relations})
+    | (?P<name>={label})
+    | (?P<label>{label})
+    | (?P<symbol>[()\[\]!|&?@])
+'''.format(relations='|'.join(re.escape(r) for r in RELATIONS), label=LABEL), re.X)
+
+
+class TregexException(Exception):
+    pass
+
+
+def tokenize(pattern):
+    tokens = list()
+    position = 0
+    while position < len(pattern):
+        if pattern[position].isspace():
+            position += 1
+            continue
+        m = TOKEN.match(pattern, position)
+        if not m:
+            raise TregexException('Cannot parse tregex pattern {} at {}'.format(pattern, position))
+        tokens.append((m.lastgroup, m.group(0)))
+        position = m.end()
+    return tokens
+
+
+class NodeSpec(object):
+    """
+    A node description with its name and the relations (a conjunction) it must satisfy.
+    """
+
+    def __init__(self, description, negated=False, name=None):
+        self.description = description
+        self.negated = negated
+        self.name = name
+        self.relations = list()
+
+    def label_matches(self, label):
+        kind, value = self.description
+        if kind == 'any':
+            matched = True
+        elif kind == 'regex':
+            matched = value.search(label) is not None
+        else:
+            matched = label in value
+        return matched != self.negated
+
+
+class Relation(object):
+
+    def __init__(self, op, target, negated=False, optional=False):
+        self.op = op
+        self.target = target
+        self.negated = negated
+        self.optional = optional
+
+
+class RelationDisjunction(object):
+
+    def __init__(self, alternatives, negated=False):
+        self.alternatives = alternatives
+        self.negated = negated
+
+
+class Parser(object):
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.tokens = tokenize(pattern)
+        self.position = 0
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def take(self, value=None):
+        token = self.peek()
+        if token[0] is None or (value is not None and token[1] != value):
+            raise TregexException('Unexpected {} in tregex pattern {}'.format(token[1], self.pattern))
+        self.position += 1
+        return token
+
+    def parse(self):
+        clauses = [self.clause()]
+        while self.peek()[1] == '|':
+            self.take('|')
+            clauses.append(self.clause())
+        if self.peek()[0] is not None:
+            raise TregexException('Unexpected {} in tregex pattern {}'.format(self.peek()[1], self.pattern))
+        return clauses
+
+    def clause(self):
+        if self.peek()[1] == '(':
+            self.take('(')
+            spec = self.clause()
+            self.take(')')
+            spec.relations.extend(self.relations())
+            return spec
+        spec = self.node()
+        spec.relations.extend(self.relations())
+        return spec
+
+    def node(self):
+        negated = False
+        if self.peek()[1] == '!':
+            self.take('!')
+            negated = True
+        if self.peek()[1] == '@':
+            self.take('@')
+        kind, value = self.take()
+        if kind == 'any':
+            description = ('any', None)
+        elif kind == 'regex':
+            description = ('regex', re.compile(value[1:-1]))
+        elif kind == 'label':
+            description = ('label', set(value.split('|')))
+        else:
+            raise TregexException('Expected a node description, got {} in {}'.format(value, self.pattern))
+        name = None
+        if self.peek()[0] == 'name':
+            name = self.take()[1][1:]
+        return NodeSpec(description, negated, name)
+
+    def relations(self):
+        relations = list()
+        while True:
+            kind, value = self.peek()
+            if value == '&':
+                self.take('&')
+                continue
+            negated = optional = False
+            start = self.position
+            while value in ('!', '?'):
+                if value == '!':
+                    negated = True
+                else:
+                    optional = True
+                self.take()
+                kind, value = self.peek()
+            if value == '[':
+                self.take('[')
+                alternatives = [self.relations()]
+                while self.peek()[1] == '|':
+                    self.take('|')
+                    alternatives.append(self.relations())
+                self.take(']')
+                relations.append(RelationDisjunction(alternatives, negated))
+            elif kind == 'relation':
+                op = self.take()[1]
+                if self.peek()[1] == '(':
+                    self.take('(')
+                    target = self.clause()
+                    self.take(')')
+                else:
+                    target = self.node()
+                relations.append(Relation(op, target, negated, optional))
+            else:
+                self.position = start
+                return relations
+
+
+class TreeView(object):
+    """
+    Preorder arrays over all the nodes of a tree, leaves included: labels, parents,
+    children, subtree sizes and leaf spans.
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.positions = list()
+        self.labels = list()
+        self.parents = list()
+        self.children = list()
+        self.sizes = list()
+        self.starts = list()
+        self.ends = list()
+        leaf = 0
+        stack = [(tree, (), -1)]
+        while stack:
+            node, position, parent = stack.pop()
+            i = len(self.positions)
+            self.positions.append(position)
+            self.parents.append(parent)
+            self.children.append(list())
+            self.sizes.append(0)
+            self.starts.append(leaf)
+            self.ends.append(leaf)
+            if parent >= 0:
+                self.children[parent].append(i)
+            if isinstance(node, Tree):
+                self.labels.append(node.label())
+                for k in range(len(node) - 1, -1, -1):
+                    stack.append((node[k], position + (k,), i))
+            else:
+                self.labels.append(node)
+                leaf += 1
+        for i in range(len(self.positions) - 1, -1, -1):
+            if self.children[i]:
+                self.sizes[i] = sum(self.sizes[c] + 1 for c in self.children[i])
+                self.starts[i] = self.starts[self.children[i][0]]
+                self.ends[i] = self.ends[self.children[i][-1]]
+
+    def __len__(self):
+        return len(self.positions)
+
+    def subtree(self, i):
+        return self.tree[self.positions[i]] if self.positions[i] else self.tree
+
+    def sisters(self, i):
+        parent = self.parents[i]
+        return self.children[parent] if parent >= 0 else [i]
+
+    def candidates(self, op, i):
+        parent = self.parents[i]
+        if op == '<':
+            return self.children[i]
+        if op == '>':
+            return [parent] if parent >= 0 else []
+        if op == '<<':
+            return range(i + 1, i + self.sizes[i] + 1)
+        if op == '>>':
+            ancestors = list()
+            while parent >= 0:
+                ancestors.append(parent)
+                parent = self.parents[parent]
+            return ancestors
+        if op == '<,':
+            return self.children[i][:1]
+        if op == '<-':
+            return self.children[i][-1:]
+        if op == '<:':
+            return self.children[i] if len(self.children[i]) == 1 else []
+        if op in ('>,', '>-', '>:'):
+            if parent < 0:
+                return []
+            sisters = self.children[parent]
+            if (op == '>,' and sisters[0] == i) or (op == '>-' and sisters[-1] == i) or (op == '>:' and len(sisters) == 1):
+                return [parent]
+            return []
+        if op[0] == '$':
+            sisters = self.sisters(i)
+            k = sisters.index(i)
+            if op == '$':
+                return [s for s in sisters if s != i]
+            if op in ('$+', '$.'):
+                return sisters[k + 1:k + 2]
+            if op in ('$-', '$,'):
+                return sisters[max(k - 1, 0):k]
+            if op in ('$++', '$..'):
+                return sisters[k + 1:]
+            return sisters[:k]
+        if op == '..':
+            return [j for j in range(len(self)) if self.starts[j] > self.ends[i]]
+        if op == ',,':
+            return [j for j in range(len(self)) if self.ends[j] < self.starts[i]]
+        if op == '.':
+            return [j for j in range(len(self)) if self.starts[j] == self.ends[i] + 1]
+        if op == ',':
+            return [j for j in range(len(self)) if self.ends[j] == self.starts[i] - 1]
+        raise TregexException('Unsupported tregex relation {}'.format(op))
+
+
+def _flat(node):
+    if isinstance(node, Tree):
+        return node.pformat(margin=sys.maxsize)
+    return node
+
+
+class TregexPattern(object):
+    """
+    A compiled Tregex pattern, findall(tree) returns the matches in preorder as dicts
+        {'position': tree position, 'match': bracketed subtree, 'namedNodes': {name: bracketed subtree}}
+    """
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.clauses = Parser(pattern).parse()
+
+    def findall(self, tree):
+        view = tree if isinstance(tree, TreeView) else TreeView(tree)
+        matches = list()
+        for i in range(len(view)):
+            for clause in self.clauses:
+                bindings = self.__satisfies(view, clause, i, dict())
+                if bindings is not None:
+                    matches.append({
+                        'position': view.positions[i],
+                        'match': _flat(view.subtree(i)),
+                        'namedNodes': dict((name, _flat(view.subtree(j))) for name, j in bindings.items()),
+                    })
+                    break
+        return matches
+
+    def __satisfies(self, view, spec, i, bindings):
+        if not spec.label_matches(view.labels[i]):
+            return None
+        bindings = dict(bindings)
+        if spec.name:
+            bindings[spec.name] = i
+        return self.__relations(view, spec.relations, i, bindings)
+
+    def __relations(self, view, relations, i, bindings):
+        for relation in relations:
+            if isinstance(relation, RelationDisjunction):
+                found = None
+                for alternative in relation.alternatives:
+                    found = self.__relations(view, alternative, i, bindings)
+                    if found is not None:
+                        break
+                if relation.negated:
+                    if found is not None:
+                        return None
+                elif found is None:
+                    return None
+                else:
+                    bindings = found
+                continue
+            found = None
+            for j in view.candidates(relation.op, i):
+                found = self.__satisfies(view, relation.target, j, bindings)
+                if found is not None:
+                    break
+            if relation.negated:
+                if found is not None:
+                    return None
+            elif found is not None:
+                bindings = found
+            elif not relation.optional:
+                return None
+        return bindings
+
+
+def tregex_matches(patterns, trees):
+    '''
+    runs every pattern over every tree, returns a dict pattern -> list of matches, each match
+    carrying the index of its tree as sentIndex
+    '''
+    compiled = [TregexPattern(p) for p in patterns]
+    views = [TreeView(tree) for tree in trees]
+    results = dict()
+    for pattern in compiled:
+        matches = list()
+        for k, view in enumerate(views):
+            for match in pattern.findall(view):
+                match['sentIndex'] = k
+                matches.append(match)
+        results[pattern.pattern] = matches
+    return results
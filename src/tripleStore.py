@@ -0,0 +1,403 @@
+import argparse
+import hashlib
+import json
+import re
+import sqlite3
+import string
+import sys
+import threading
+
+# Aggregation of extracted triples. TripleAggregator canonicalizes and dedupes a stream of
+# triples in memory, counting how often every triple was seen (its support) and where
+# (source ids, e.g. document:sentence). TripleStore is the indexed SQLite file aggregators
+# are flushed into, it merges the counts of every flush and answers lookups by subject,
+# predicate and object.
+#
+#   python -m src.tripleStore build triples.jsonl triples.db     (the src.corpus output)
+#   python -m src.tripleStore build triples.jsonl triples.db --lemmatize
+#   python -m src.tripleStore lookup triples.db --subject astatine
+
+# terms lose their surrounding punctuation, but not inner characters like in "u.s" or "c++"
+EDGE_PUNCTUATION = string.punctuation + '‘’“”'
+WHITESPACE = re.compile(r'\s+')
+
+# what the meta table records for a lemmatizer passed as a callable, it cannot be loaded by name
+CUSTOM_LEMMATIZER = 'custom'
+
+
+def wordnet_lemmatizer():
+    '''
+    the nltk WordNet lemmatizer, words are lemmatized as nouns (needs nltk's wordnet data)
+    '''
+    from nltk.stem import WordNetLemmatizer
+    return WordNetLemmatizer().lemmatize
+
+
+# name -> function returning the lemmatizer, the name is what stores record
+LEMMATIZERS = {
+    'wordnet': wordnet_lemmatizer,
+}
+
+DEFAULT_LEMMATIZER = 'wordnet'
+
+
+def get_lemmatizer(name):
+    if name not in LEMMATIZERS:
+        raise Exception("Unknown lemmatizer {}. Known lemmatizers are {}".format(name, ', '.join(sorted(LEMMATIZERS))))
+    return LEMMATIZERS[name]()
+
+
+def triple_id(key):
+    '''
+    64 bit hash of a canonical (subject, predicate, object), stable across processes and runs
+    '''
+    digest = hashlib.blake2b('\x1f'.join(key).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+class TripleAggregator(object):
+    """
+    Streaming dedup of triples.
+
+    Every term is canonicalized: lists and tuples ((word, attrs) as returned by
+    TripleExtraction) are reduced to their first element, whitespace is collapsed, surrounding
+    punctuation stripped, the term lowercased if lowercase and every word passed through
+    lemmatizer if one is given, the name of one in LEMMATIZERS (e.g. 'wordnet') or a callable
+    word -> lemma (results are memoized). Triples are
+    hashed on their canonical form, add counts the support of the triple and records source
+    with the number of occurrences it contributed. At most max_sources source ids are kept
+    per triple, all of them if None.
+
+    The subjects, predicates and objects are indexed, by_subject/by_predicate/by_object
+    return the triples of a term.
+    """
+
+    def __init__(self, lowercase=True, lemmatizer=None, max_sources=None):
+        self.lowercase = lowercase
+        if isinstance(lemmatizer, str):
+            self.lemmatizer_name = lemmatizer
+            lemmatizer = get_lemmatizer(lemmatizer)
+        else:
+            self.lemmatizer_name = CUSTOM_LEMMATIZER if lemmatizer is not None else None
+        self.lemmatizer = lemmatizer
+        self.max_sources = max_sources
+        self.lemmas = dict()
+        # raw term -> canonical term, extracted terms repeat a lot
+        self.terms = dict()
+        self.triples = dict()
+        self.subjects = dict()
+        self.predicates = dict()
+        self.objects = dict()
+        self.seen = 0
+
+    def canonical_term(self, term):
+        while isinstance(term, (list, tuple)):
+            if not term:
+                return ''
+            term = term[0]
+        if term is None:
+            return ''
+        canonical = self.terms.get(term)
+        if canonical is None:
+            canonical = WHITESPACE.sub(' ', str(term)).strip(EDGE_PUNCTUATION + ' ')
+            if self.lowercase:
+                canonical = canonical.lower()
+            if self.lemmatizer is not None:
+                canonical = ' '.join(self.__lemma(word) for word in canonical.split(' '))
+            self.terms[term] = canonical
+        return canonical
+
+    def __lemma(self, word):
+        lemma = self.lemmas.get(word)
+        if lemma is None:
+            lemma = self.lemmas[word] = self.lemmatizer(word)
+        return lemma
+
+    def canonical(self, triple):
+        '''
+        returns the canonical (subject, predicate, object) of triple, None if a term is empty
+        '''
+        if len(triple) < 3:
+            return None
+        key = (self.canonical_term(triple[0]), self.canonical_term(triple[1]), self.canonical_term(triple[2]))
+        if not all(key):
+            return None
+        return key
+
+    def add(self, triple, source=None):
+        '''
+        adds one occurrence of triple, returns its canonical form (None if it was dropped)
+        '''
+        self.seen += 1
+        key = self.canonical(triple)
+        if key is None:
+            return None
+        entry = self.triples.get(key)
+        if entry is None:
+            entry = self.triples[key] = [0, dict()]
+            self.subjects.setdefault(key[0], list()).append(key)
+            self.predicates.setdefault(key[1], list()).append(key)
+            self.objects.setdefault(key[2], list()).append(key)
+        entry[0] += 1
+        sources = entry[1]
+        # an insertion ordered dict of source -> occurrences, the sources in the order they were seen
+        if source is not None:
+            if source in sources:
+                sources[source] += 1
+            elif self.max_sources is None or len(sources) < self.max_sources:
+                sources[source] = 1
+        return key
+
+    def add_many(self, triples, source=None):
+        for triple in triples:
+            self.add(triple, source)
+
+    def add_hypernyms(self, hypernyms, source=None):
+        '''
+        adds the (hyponym(s), hypernym, hearst type[, parser]) tuples of HearstPatterns as
+        (hyponym, hearst type, hypernym) triples, a list of hyponyms gives a triple each
+        '''
+        for hypernym in hypernyms:
+            hyponyms = hypernym[0] if isinstance(hypernym[0], list) else [hypernym[0]]
+            for hyponym in hyponyms:
+                self.add((hyponym, hypernym[2], hypernym[1]), source)
+
+    def __len__(self):
+        return len(self.triples)
+
+    def __contains__(self, triple):
+        return self.canonical(triple) in self.triples
+
+    def __iter__(self):
+        '''
+        yields (subject, predicate, object, support, sources) in the order the triples were first seen
+        '''
+        for key, (support, sources) in self.triples.items():
+            yield key[0], key[1], key[2], support, list(sources)
+
+    def support(self, triple):
+        entry = self.triples.get(self.canonical(triple))
+        return entry[0] if entry is not None else 0
+
+    def sources(self, triple):
+        entry = self.triples.get(self.canonical(triple))
+        return list(entry[1]) if entry is not None else []
+
+    def by_subject(self, term):
+        return self.subjects.get(self.canonical_term(term), [])
+
+    def by_predicate(self, term):
+        return self.predicates.get(self.canonical_term(term), [])
+
+    def by_object(self, term):
+        return self.objects.get(self.canonical_term(term), [])
+
+    def clear(self):
+        self.terms.clear()
+        self.triples.clear()
+        self.subjects.clear()
+        self.predicates.clear()
+        self.objects.clear()
+        self.seen = 0
+
+    def flush(self, store):
+        '''
+        merges the triples into a TripleStore and starts over, keeps the memory of long streams bounded
+        '''
+        store.merge(self)
+        self.clear()
+
+
+class TripleStore(object):
+    """
+    SQLite file of aggregated triples.
+
+    merge(aggregator) adds the support of the aggregated triples to the stored ones (rows are
+    keyed by triple_id) and records their sources. Occurrences from a (triple, source) pair the
+    store already has are not counted again, so re-ingesting the same records leaves the store
+    as it was. Occurrences without a source id, or past the aggregator's max_sources, cannot be
+    told apart and are added on every merge. Subjects, predicates and objects are
+    indexed. lookup canonicalizes the query terms like the aggregator which wrote the store,
+    its lowercase and lemmatizer settings are kept in the file and aggregators with other
+    settings are refused. A store written with a callable lemmatizer must be opened with it.
+    """
+
+    def __init__(self, path, lemmatizer=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript('''
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS triples (id INTEGER PRIMARY KEY, subject TEXT NOT NULL, predicate TEXT NOT NULL,
+                                                object TEXT NOT NULL, support INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS sources (triple INTEGER NOT NULL, source TEXT NOT NULL, PRIMARY KEY (triple, source)) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS triples_subject ON triples (subject);
+            CREATE INDEX IF NOT EXISTS triples_predicate ON triples (predicate);
+            CREATE INDEX IF NOT EXISTS triples_object ON triples (object);
+            CREATE TEMP TABLE IF NOT EXISTS merging (triple INTEGER NOT NULL, source TEXT NOT NULL, occurrences INTEGER NOT NULL);
+        ''')
+        self.connection.commit()
+        self.lemmatizer = lemmatizer
+        self.canonicalizer = self.__canonicalizer()
+
+    def __setting(self, key):
+        row = self.connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def __canonicalizer(self):
+        '''
+        an aggregator canonicalizing terms with the settings the store was written with
+        '''
+        lowercase = self.__setting('lowercase')
+        lemmatizer = self.__setting('lemmatizer')
+        if lemmatizer is None:
+            # nothing merged yet, or a store from before the lemmatizer was recorded
+            lemmatizer = self.lemmatizer
+        elif lemmatizer == CUSTOM_LEMMATIZER:
+            if self.lemmatizer is None:
+                raise Exception("{} was written with a custom lemmatizer, pass it as lemmatizer".format(self.path))
+            lemmatizer = self.lemmatizer
+        else:
+            lemmatizer = lemmatizer or None
+        return TripleAggregator(lowercase=lowercase != '0', lemmatizer=lemmatizer)
+
+    def merge(self, aggregator):
+        settings = {'lowercase': '1' if aggregator.lowercase else '0', 'lemmatizer': aggregator.lemmatizer_name or ''}
+        with self.lock:
+            for key, value in settings.items():
+                stored = self.__setting(key)
+                if stored is not None and stored != value:
+                    raise Exception("{} was written with {} {!r}, the aggregator uses {!r}".format(self.path, key, stored, value))
+            for key, value in settings.items():
+                self.connection.execute('INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)', (key, value))
+            if aggregator.lemmatizer_name == CUSTOM_LEMMATIZER and self.lemmatizer is None:
+                self.lemmatizer = aggregator.lemmatizer
+            rows = list()
+            sources = list()
+            for key, (support, triple_sources) in aggregator.triples.items():
+                i = triple_id(key)
+                # the occurrences without a recorded source are always added
+                rows.append([i, key[0], key[1], key[2], support - sum(triple_sources.values())])
+                sources.extend((i, str(source), occurrences) for source, occurrences in triple_sources.items())
+            self.connection.executemany('INSERT INTO merging (triple, source, occurrences) VALUES (?, ?, ?)', sources)
+            # only the occurrences of (triple, source) pairs the store does not have yet count
+            added = dict(self.connection.execute('SELECT triple, SUM(occurrences) FROM merging m WHERE NOT EXISTS '
+                                                 '(SELECT 1 FROM sources s WHERE s.triple = m.triple AND s.source = m.source) GROUP BY triple'))
+            for row in rows:
+                row[4] += added.get(row[0], 0)
+            self.connection.executemany('INSERT INTO triples (id, subject, predicate, object, support) VALUES (?, ?, ?, ?, ?) '
+                                        'ON CONFLICT (id) DO UPDATE SET support = support + excluded.support', rows)
+            self.connection.execute('INSERT OR IGNORE INTO sources (triple, source) SELECT triple, source FROM merging')
+            self.connection.execute('DELETE FROM merging')
+            self.connection.commit()
+            if (self.canonicalizer.lowercase, self.canonicalizer.lemmatizer_name) != (aggregator.lowercase, aggregator.lemmatizer_name):
+                self.canonicalizer = self.__canonicalizer()
+
+    def lookup(self, subject=None, predicate=None, object_=None, min_support=1, limit=None):
+        '''
+        returns the stored (subject, predicate, object, support) matching the given terms, the
+        best supported first
+        '''
+        conditions = ['support >= ?']
+        values = [min_support]
+        for column, term in (('subject', subject), ('predicate', predicate), ('object', object_)):
+            if term is not None:
+                conditions.append('{} = ?'.format(column))
+                values.append(self.canonicalizer.canonical_term(term))
+        query = 'SELECT subject, predicate, object, support FROM triples WHERE {} ORDER BY support DESC, id'.format(' AND '.join(conditions))
+        if limit is not None:
+            query += ' LIMIT ?'
+            values.append(limit)
+        with self.lock:
+            return [tuple(row) for row in self.connection.execute(query, values)]
+
+    def support(self, triple):
+        key = self.canonicalizer.canonical(triple)
+        if key is None:
+            return 0
+        with self.lock:
+            row = self.connection.execute('SELECT support FROM triples WHERE id = ?', (triple_id(key),)).fetchone()
+        return row[0] if row is not None else 0
+
+    def sources(self, triple):
+        key = self.canonicalizer.canonical(triple)
+        if key is None:
+            return []
+        with self.lock:
+            return [row[0] for row in self.connection.execute('SELECT source FROM sources WHERE triple = ? ORDER BY source', (triple_id(key),))]
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM triples').fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def build_store(records, store, flush_every=100000, lowercase=True, lemmatizer=None):
+    '''
+    aggregates the triples of src.corpus records ({"id": ..., "triples": [...]}) into store,
+    the document id is the source of its triples. lemmatizer is a name in LEMMATIZERS or a
+    callable, see TripleAggregator. Returns the number of triples read
+    '''
+    aggregator = TripleAggregator(lowercase=lowercase, lemmatizer=lemmatizer)
+    seen = 0
+    for record in records:
+        aggregator.add_many(record.get('triples') or [], record.get('id'))
+        if aggregator.seen >= flush_every:
+            seen += aggregator.seen
+            aggregator.flush(store)
+    seen += aggregator.seen
+    aggregator.flush(store)
+    return seen
+
+
+def read_records(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Aggregate extracted triples into an indexed SQLite store and look them up')
+    commands = parser.add_subparsers(dest='command')
+    build = commands.add_parser('build', help='aggregate a src.corpus JSONL output into a store')
+    build.add_argument('input')
+    build.add_argument('store')
+    build.add_argument('--keep-case', action='store_true', help='do not lowercase the terms')
+    build.add_argument('--flush-every', type=int, default=100000, help='triples aggregated in memory before they are merged into the store')
+    build.add_argument('--lemmatize', action='store_true', help='lemmatize the terms with the {} lemmatizer'.format(DEFAULT_LEMMATIZER))
+    lookup = commands.add_parser('lookup', help='print the stored triples of a subject, predicate and/or object')
+    lookup.add_argument('store')
+    lookup.add_argument('--subject')
+    lookup.add_argument('--predicate')
+    lookup.add_argument('--object')
+    lookup.add_argument('--min-support', type=int, default=1)
+    lookup.add_argument('--limit', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        with TripleStore(args.store) as store:
+            lemmatizer = DEFAULT_LEMMATIZER if args.lemmatize else None
+            seen = build_store(read_records(args.input), store, args.flush_every, not args.keep_case, lemmatizer)
+            print(json.dumps({'triples': seen, 'unique': len(store)}))
+    elif args.command == 'lookup':
+        with TripleStore(args.store) as store:
+            for triple in store.lookup(args.subject, args.predicate, args.object, args.min_support, args.limit):
+                print(json.dumps(triple))
+    else:
+        parser.print_help()
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
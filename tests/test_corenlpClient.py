@@ -0,0 +1,166 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+# bound here, the backoff tests replace time.sleep
+from time import sleep
+
+import pytest
+import requests
+
+import src.corenlpClient as corenlpClient
+from src.corenlpClient import CoreNLPClient, CoreNLPException, document_chunks
+from src.parseCache import ParseCache
+
+
+class StubCoreNLP(object):
+    """
+    A CoreNLP server answering like the real one for whitespace tokenized input: one sentence
+    per non empty line (ssplit.eolonly), every token a NN governed by the first one.
+    failures is a list of status codes answered before the real responses, delay(text) the
+    seconds a request waits before it is answered.
+    """
+
+    def __init__(self):
+        self.requests = list()
+        self.failures = list()
+        self.delay = lambda text: 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_POST(self):
+                text = self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8')
+                properties = json.loads(parse_qs(urlparse(self.path).query)['properties'][0])
+                with stub.lock:
+                    stub.requests.append(text)
+                    status = stub.failures.pop(0) if stub.failures else 200
+                sleep(stub.delay(text))
+                body = json.dumps(stub.annotate(text, properties) if status == 200 else {'error': status}).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = 'http://127.0.0.1:{}'.format(self.server.server_address[1])
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def annotate(self, text, properties):
+        lines = text.split('\n') if properties.get('ssplit.eolonly') == 'true' else [text]
+        sentences = list()
+        for line in lines:
+            words = line.split()
+            if not words:
+                continue
+            tokens = [{'word': word, 'pos': 'NN'} for word in words]
+            dependencies = [{'dep': 'ROOT', 'governor': 0, 'dependent': 1}]
+            dependencies += [{'dep': 'dep', 'governor': 1, 'dependent': i} for i in range(2, len(words) + 1)]
+            parse = '(ROOT (NP {}))'.format(' '.join('(NN {})'.format(word) for word in words))
+            sentences.append({'tokens': tokens, 'basicDependencies': dependencies, 'parse': parse})
+        return {'sentences': sentences}
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def server():
+    stub = StubCoreNLP()
+    yield stub
+    stub.close()
+
+
+@pytest.fixture
+def client(server):
+    client = CoreNLPClient(server.url, max_workers=4, retries=2, backoff=0.01, timeout=5)
+    yield client
+    client.close()
+
+
+def triples(words):
+    return [((words[0], 'NN'), 'dep', (word, 'NN')) for word in words[1:]]
+
+
+def test_document_skips_empty_sentences(server, client):
+    sentences = [['astatine', 'is', 'rare'], [], ['radon', 'is', 'a', 'gas'], ['   ']]
+    assert client.dependencies_document(sentences) == [triples(sentences[0]), [], triples(sentences[2]), []]
+    assert server.requests == ['astatine is rare\nradon is a gas']
+    assert client.dependencies([]) == []
+    assert len(server.requests) == 1
+
+
+def test_document_falls_back_to_sentences_on_a_count_mismatch(server, client, monkeypatch):
+    annotate = server.annotate
+    # a server returning a sentence too many for multi line requests
+    monkeypatch.setattr(server, 'annotate', lambda text, properties: annotate(text + '\nextra' if '\n' in text else text, properties))
+    sentences = [['astatine', 'is', 'rare'], ['radon', 'is', 'a', 'gas']]
+    assert client.dependencies_document(sentences) == [triples(sentences[0]), triples(sentences[1])]
+    assert server.requests == ['astatine is rare\nradon is a gas', 'astatine is rare', 'radon is a gas']
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    waits = list()
+    monkeypatch.setattr(corenlpClient.time, 'sleep', waits.append)
+    return waits
+
+
+def test_retries_a_503(server, client, sleeps):
+    server.failures = [503]
+    assert client.dependencies(['radon', 'is', 'a', 'gas']) == triples(['radon', 'is', 'a', 'gas'])
+    assert server.requests == ['radon is a gas'] * 2
+    assert sleeps == [0.01]
+
+
+def test_backoff_doubles_until_the_retries_run_out(server, client, sleeps):
+    server.failures = [503, 502, 500]
+    with pytest.raises(CoreNLPException):
+        client.dependencies(['radon'])
+    assert len(server.requests) == 3
+    assert sleeps == [0.01, 0.02]
+
+
+def test_client_errors_are_not_retried(server, client, sleeps):
+    server.failures = [400]
+    with pytest.raises(requests.HTTPError):
+        client.dependencies(['radon'])
+    assert len(server.requests) == 1
+    assert sleeps == []
+
+
+def test_many_keeps_the_input_order(server, client):
+    sentences = [['w{}'.format(i), 'is', 'here'] for i in range(8)]
+    # the first sentences are answered last
+    server.delay = lambda text: 0.1 - 0.01 * int(text.split()[0][1:])
+    assert client.dependencies_many(sentences) == [triples(words) for words in sentences]
+    assert sorted(server.requests) == sorted(' '.join(words) for words in sentences)
+    assert server.requests != [' '.join(words) for words in sentences]
+
+
+def test_document_chunks():
+    assert document_chunks(['aaaa', 'bb', 'cccc', 'dddddddddd', 'e'], max_chars=8) == [[0, 1], [2], [3], [4]]
+    assert document_chunks(['aaaa', 'bb'], max_chars=100) == [[0, 1]]
+    assert document_chunks([], max_chars=8) == []
+
+
+def test_document_is_sent_in_chunks(server, client):
+    sentences = [['astatine', 'is', 'rare'], ['radon', 'is', 'a', 'gas'], ['xenon', 'glows'], ['neon', 'too']]
+    assert client.dependencies_document(sentences, max_chars=32) == [triples(words) for words in sentences]
+    assert sorted(server.requests) == ['astatine is rare\nradon is a gas', 'xenon glows\nneon too']
+
+
+def test_treebank_and_treebank_many_share_one_parse(server, client):
+    from src.parseTree import TripleExtraction
+    extractor = TripleExtraction(parse_cache=ParseCache(), client=client)
+    extractor.treebank('radon is a gas')
+    extractor.treebank_many(['radon is a gas', 'xenon glows'])
+    extractor.treebank('xenon glows')
+    assert sorted(server.requests) == ['radon is a gas', 'xenon glows']
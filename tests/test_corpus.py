@@ -0,0 +1,35 @@
+import json
+import multiprocessing
+
+import pytest
+
+import src.corpus as corpus
+
+
+def fake_extract(document):
+    doc_id, text = document
+    if 'fail' in text:
+        return {'id': doc_id, 'error': 'Exception: parse failed'}
+    return {'id': doc_id, 'triples': [[text.split()[0], 'is', text.split()[-1]]]}
+
+
+def test_failed_documents_are_retried(tmp_path, monkeypatch):
+    # the workers are forked, so they see the patched module
+    if multiprocessing.get_start_method() != 'fork':
+        pytest.skip('needs forked pool workers')
+    monkeypatch.setattr(corpus, '_init_worker', lambda options: None)
+    monkeypatch.setattr(corpus, 'extract_document', fake_extract)
+    documents = tmp_path / 'documents.jsonl'
+    documents.write_text('{"id": "a", "text": "astatine is element"}\n{"id": "b", "text": "this will fail"}\n')
+    output = str(tmp_path / 'triples.jsonl')
+
+    assert corpus.run_corpus(str(documents), output, processes=1) == {'processed': 1, 'failed': 1, 'skipped': 0}
+    assert corpus.read_checkpoint(output + '.done') == {'a'}
+
+    documents.write_text('{"id": "a", "text": "astatine is element"}\n{"id": "b", "text": "radon is gas"}\n')
+    assert corpus.run_corpus(str(documents), output, processes=1) == {'processed': 1, 'failed': 0, 'skipped': 1}
+    assert corpus.read_checkpoint(output + '.done') == {'a', 'b'}
+    with open(output) as f:
+        records = [json.loads(line) for line in f]
+    assert [r['id'] for r in records] == ['a', 'b', 'b']
+    assert records[-1]['triples'] == [['radon', 'is', 'gas']]
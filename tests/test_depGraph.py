@@ -0,0 +1,85 @@
+import os
+import pickle
+import subprocess
+import sys
+
+from src.depGraph import RELATIONS, TAGS, DependencyGraph
+from src.parseCache import ParseCache
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+UNPICKLE = '''
+import pickle, sys
+from src.depGraph import TAGS, RELATIONS
+# the fresh process interns other tags and relations first, so the ids differ from the writer
+for tag in ('FIRST', 'SECOND'):
+    TAGS.intern(tag)
+RELATIONS.intern('first')
+graph = pickle.load(sys.stdin.buffer)
+pickle.dump(graph.to_triples(order='tokens'), sys.stdout.buffer)
+'''
+
+CACHED = '''
+import sys
+from src.depGraph import TAGS
+from src.parseCache import ParseCache
+TAGS.intern('FIRST')
+graph = ParseCache(path=sys.argv[1]).get('Astatine is an element .', 'dependency_graph:test')
+print(graph.to_triples(order='tokens'))
+'''
+
+
+def graph():
+    # interned after whatever the other tests interned, so the ids are not the low ones a fresh process gives out
+    for i in range(5):
+        TAGS.intern('TEST{}'.format(i))
+        RELATIONS.intern('test{}'.format(i))
+    return DependencyGraph(['Astatine', 'is', 'an', 'element', '.'], ['NNP', 'VBZ', 'DT', 'NN', '.'],
+                           [3, 3, 3, -1, 3], ['nsubj', 'cop', 'det', 'ROOT', 'punct'])
+
+
+def run(code, *args, stdin=b''):
+    result = subprocess.run([sys.executable, '-c', code] + list(args), input=stdin, cwd=ROOT_DIR,
+                            stdout=subprocess.PIPE, check=True)
+    return result.stdout
+
+
+def test_pickle_round_trip():
+    g = graph()
+    copy = pickle.loads(pickle.dumps(g))
+    assert copy.to_triples(order='tokens') == g.to_triples(order='tokens')
+    assert list(copy.heads) == list(g.heads)
+
+
+def test_unpickle_in_a_fresh_process():
+    g = graph()
+    triples = pickle.loads(run(UNPICKLE, stdin=pickle.dumps(g)))
+    assert triples == g.to_triples(order='tokens')
+
+
+def test_parse_cache_on_disk_across_processes(tmp_path):
+    path = str(tmp_path / 'parses.db')
+    g = graph()
+    cache = ParseCache(path=path)
+    cache.put('Astatine is an element .', 'dependency_graph:test', g)
+    cache.store.close()
+    assert run(CACHED, path).decode('utf-8').strip() == str(g.to_triples(order='tokens'))
+
+
+def test_tree_edges_in_triples_order():
+    g = DependencyGraph(['cat', 'running', 'garden', 'saw', 'dog', 'running', 'park'],
+                        ['NN', 'VBG', 'NN', 'VBD', 'NN', 'VBG', 'NN'], [3, 0, 1, -1, 3, 4, 5],
+                        ['nsubj', 'acl', 'obl', 'ROOT', 'obj', 'acl', 'obl'])
+    edges = list(g.tree_edges())
+    assert [(head, dependent) for head, relation, dependent in edges] == [(3, 0), (0, 1), (1, 2), (3, 4), (4, 5), (5, 6)]
+    assert [(g.node(h), RELATIONS.string(r), g.node(d)) for h, r, d in edges] == g.to_triples()
+    assert list(g.tree_edges(4)) == edges[4:]
+
+
+def test_bfs_only_expands_accepted_nodes():
+    g = graph()
+    assert list(g.bfs(3, 1)) == [(3, 0, 1), (3, 1, 1), (3, 2, 1), (3, 4, 1)]
+    g = DependencyGraph(['a', 'b', 'c', 'd'], ['NN', 'VB', 'NN', 'NN'], [-1, 0, 1, 2], ['ROOT', 'dep', 'dep', 'dep'])
+    assert list(g.bfs(0, 5)) == [(0, 1, 1), (1, 2, 2), (2, 3, 3)]
+    assert list(g.bfs(0, 5, lambda i: g.tags[i] != TAGS.intern('NN'))) == [(0, 1, 1), (1, 2, 2)]
+    assert list(g.bfs(0, 2)) == [(0, 1, 1), (1, 2, 2)]
@@ -0,0 +1,184 @@
+import random
+from collections import deque
+
+import pytest
+
+# nltk's CoreNLP wrappers are only constructed, no server is contacted
+import src.deps as deps
+from src.depGraph import DependencyGraph
+
+NOUNS = ['NN', 'NNS', 'NNP', 'NNPS']
+
+
+def scan_bfs(start_dep, level, dependencies):
+    '''
+    the traversal bfs_triplets implements, scanning the whole dependency list for every node
+    '''
+    queue = deque([(start_dep[2], 0)])
+    connected, nouns = list(), list()
+    while queue:
+        node, current = queue.popleft()
+        for dep in dependencies:
+            if dep[0] == node and current < level:
+                if dep[2][1] not in NOUNS:
+                    queue.append((dep[2], current+1))
+                    connected.append(dep)
+                else:
+                    nouns.append(dep)
+    return connected, nouns
+
+
+def random_tree(rng, size, branching):
+    tags = ['NN', 'NNP', 'VB', 'VBG', 'JJ', 'RB', 'IN', 'DT']
+    relations = ['nmod', 'obl', 'amod', 'advmod', 'case', 'det', 'conj', 'acl']
+    nodes = [('w0', 'VB')]
+    dependencies = list()
+    for i in range(1, size):
+        governor = nodes[rng.randrange(max(0, len(nodes) - branching), len(nodes))]
+        node = ('w{}'.format(i), rng.choice(tags))
+        nodes.append(node)
+        dependencies.append((governor, rng.choice(relations), node))
+    rng.shuffle(dependencies)
+    return dependencies
+
+
+@pytest.fixture
+def extractor():
+    return deps.TripleExtraction_Deps(client=object())
+
+
+def test_bfs_follows_every_branch(extractor):
+    element, occurring = ('element', 'NN'), ('occurring', 'VBG')
+    naturally, found = ('naturally', 'RB'), ('found', 'VBN')
+    crust, earth = ('crust', 'NN'), ('earth', 'NN')
+    dependencies = [
+        (element, 'acl', occurring),
+        (occurring, 'advmod', naturally),
+        (occurring, 'obl', crust),
+        (occurring, 'conj', found),
+        (found, 'obl', earth),
+    ]
+    connected, nouns = extractor.bfs_triplets(dependencies[0], 2, dependencies)
+    assert connected == [(occurring, 'advmod', naturally), (occurring, 'conj', found)]
+    # earth hangs off the second branch, which the list based queue used to drop
+    assert nouns == [(occurring, 'obl', crust), (found, 'obl', earth)]
+
+
+def test_bfs_stops_at_the_level(extractor):
+    chain = [(('n', 'NN'), 'acl', ('v0', 'VB'))]
+    chain += [(('v{}'.format(i), 'VB'), 'xcomp', ('v{}'.format(i+1), 'VB')) for i in range(10)]
+    chain.append((('v10', 'VB'), 'obj', ('end', 'NN')))
+    assert extractor.bfs_triplets(chain[0], 3, chain) == (chain[1:4], [])
+    assert extractor.bfs_triplets(chain[0], 11, chain) == (chain[1:11], [chain[-1]])
+
+
+def test_bfs_on_a_long_chain(extractor):
+    size = 5000
+    chain = [(('v{}'.format(i), 'VB'), 'xcomp', ('v{}'.format(i+1), 'VB')) for i in range(size)]
+    chain.append((('v{}'.format(size), 'VB'), 'obj', ('end', 'NN')))
+    connected, nouns = extractor.bfs_triplets(chain[0], size + 1, chain)
+    assert connected == chain[1:size]
+    assert nouns == [chain[-1]]
+
+
+@pytest.mark.parametrize('branching', [1, 3, 50])
+def test_bfs_matches_a_full_scan(extractor, branching):
+    rng = random.Random(branching)
+    for _ in range(50):
+        dependencies = random_tree(rng, rng.randint(2, 300), branching)
+        index = deps.index_dependencies(dependencies)
+        for start in dependencies[:20]:
+            for level in (1, 2, 4):
+                expected = scan_bfs(start, level, dependencies)
+                assert extractor.bfs_triplets(start, level, dependencies) == expected
+                assert extractor.bfs_triplets(start, level, dependencies, index) == expected
+
+
+def test_prepositions_of_every_branch(extractor):
+    crust, earth = ('crust', 'NN'), ('earth', 'NNP')
+    dependencies = [
+        (crust, 'case', ('on', 'IN')),
+        (crust, 'det', ('the', 'DT')),
+        (crust, 'nmod', earth),
+        (crust, 'prep', ('of', 'IN')),
+        (earth, 'case', ('at', 'IN')),
+        (('on', 'IN'), 'case', ('deeper', 'IN')),
+    ]
+    # only the prepositions crust governs itself, in order
+    assert extractor.get_prepositions(crust, dependencies) == [dependencies[0], dependencies[3]]
+    assert extractor.get_prepositions(earth, dependencies, deps.index_dependencies(dependencies)) == [dependencies[4]]
+    assert extractor.get_prepositions(('none', 'NN'), dependencies) == []
+
+
+def test_prepositions_on_a_long_list(extractor):
+    rng = random.Random(7)
+    dependencies = random_tree(rng, 5000, 3)
+    index = deps.index_dependencies(dependencies)
+    for governor in set(dep[0] for dep in dependencies):
+        expected = [dep for dep in dependencies if dep[0] == governor and dep[1] in ('case', 'prep')]
+        assert extractor.get_prepositions(governor, dependencies, index) == expected
+
+
+def test_short_relations_keeps_repeated_words_apart(extractor):
+    graph = DependencyGraph(['cat', 'running', 'garden', 'saw', 'dog', 'running', 'park'],
+                            ['NN', 'VBG', 'NN', 'VBD', 'NN', 'VBG', 'NN'], [3, 0, 1, -1, 3, 4, 5],
+                            ['nsubj', 'acl', 'obl', 'ROOT', 'obj', 'acl', 'obl'])
+    running = ('running', 'VBG')
+    direct, short, hypernyms, prepositions = extractor.short_relations(graph, 2)
+    assert short == [[('cat', 'NN'), [(running, 'obl', ('garden', 'NN'))]],
+                     [('dog', 'NN'), [(running, 'obl', ('park', 'NN'))]]]
+    # the tuple form can not tell the two 'running' apart, both branches reach both nouns
+    merged = extractor.short_relations(graph.to_triples(), 2)[1]
+    assert merged[0][1] == [(running, 'obl', ('garden', 'NN')), (running, 'obl', ('park', 'NN'))]
+
+
+@pytest.mark.parametrize('branching', [1, 3, 50])
+def test_short_relations_of_a_graph_and_its_triples(extractor, branching):
+    rng = random.Random(branching)
+    for _ in range(30):
+        graph = DependencyGraph.from_triples(random_tree(rng, rng.randint(2, 200), branching))
+        for width in (1, 2, 4):
+            assert extractor.short_relations(graph, width) == extractor.short_relations(graph.to_triples(), width)
+
+
+class CountingClient(object):
+    url = 'http://corenlp.test:9000'
+
+    def __init__(self):
+        self.parsed = list()
+
+    def dependencies(self, tokens):
+        self.parsed.append(' '.join(tokens))
+        return [((tokens[0], 'NN'), 'dep', (tokens[-1], 'NN'))]
+
+    def dependencies_many(self, tokenized_sentences):
+        return [self.dependencies(tokens) for tokens in tokenized_sentences]
+
+    def dependency_graph(self, tokens):
+        self.parsed.append(' '.join(tokens))
+        return DependencyGraph(list(tokens), ['NN'] * len(tokens), [-1] + [0] * (len(tokens) - 1),
+                               ['ROOT'] + ['dep'] * (len(tokens) - 1))
+
+
+def test_single_and_batch_parses_share_the_cache(monkeypatch):
+    from src.parseCache import ParseCache
+    monkeypatch.setattr(deps, 'word_tokenize', str.split)
+    client = CountingClient()
+    extractor = deps.TripleExtraction_Deps(parse_cache=ParseCache(), client=client)
+    prefetched = extractor.dependency_triplets_many(['astatine is an element', 'radon is a gas'])
+    assert extractor.dependency_triplets('radon is a gas') == prefetched[1]
+    assert extractor.dependency_triplets('xenon is a gas') == [(('xenon', 'NN'), 'dep', ('gas', 'NN'))]
+    assert client.parsed == ['astatine is an element', 'radon is a gas', 'xenon is a gas']
+
+
+def test_dependency_graph_goes_through_the_client(monkeypatch):
+    from src.parseCache import ParseCache
+    monkeypatch.setattr(deps, 'word_tokenize', str.split)
+    client = CountingClient()
+    cache = ParseCache()
+    extractor = deps.TripleExtraction_Deps(parse_cache=cache, client=client)
+    graph = extractor.dependency_graph('radon is a gas')
+    assert extractor.dependency_graph('radon is a gas') is graph
+    assert graph.to_triples()[-1] == (('radon', 'NN'), 'dep', ('gas', 'NN'))
+    assert client.parsed == ['radon is a gas']
+    assert cache.get('radon is a gas', 'dependency_graph:' + client.url) is graph
@@ -0,0 +1,54 @@
+import sys
+import types
+
+try:
+    import src.Utils
+except ImportError:
+    # the cleaning helpers are patched in the tests, only their names have to import
+    sys.modules['src.Utils'] = types.ModuleType('src.Utils')
+    sys.modules['src.Utils'].__dict__.update(dict.fromkeys(
+        ['hearst_get_triplet', 'hypernym_clean', 'directRelation_clean', 'short_relations_clean', 'annotate_triple']))
+
+import src.depsAdv as depsAdv
+
+
+class ParsedExtractor(depsAdv.AdvancedTripleExtractionDeps):
+    '''
+    an extractor over given short_relations results, no models or parsers involved
+    '''
+
+    def __init__(self, relations):
+        self.relations = relations
+
+    def sentences(self):
+        return ['sentence {}'.format(i) for i in range(len(self.relations))]
+
+    def sentence_dependencies(self, sentences):
+        for sentence in sentences:
+            yield sentence, sentence
+
+    def short_relations(self, dependencies, width):
+        return self.relations[int(dependencies.split()[1])]
+
+    def get_entites(self, sentence):
+        return []
+
+
+def test_with_sentences_yields_the_sentence_index(monkeypatch):
+    monkeypatch.setattr(depsAdv, 'directRelation_clean', lambda d: (d[0][0], d[1], d[2][0]))
+    monkeypatch.setattr(depsAdv, 'hypernym_clean', lambda h: (h[0][0], 'hypernym', h[2][0]))
+    monkeypatch.setattr(depsAdv, 'short_relations_clean', lambda relation, prepositions: [])
+    paris, france = ('paris', 'NNP'), ('france', 'NNP')
+    astatine, element = ('astatine', 'NN'), ('element', 'NN')
+    extractor = ParsedExtractor([
+        ([], [], [], []),
+        # a direct relation and a hypernym in one sentence
+        ([(paris, 'nmod', france)], [], [(astatine, 'nsubj', element)], []),
+        ([(france, 'nmod', paris), (france, 'amod', paris)], [], [], []),
+    ])
+    assert list(extractor.iter_triples(with_sentences=True)) == [
+        (1, ['paris', 'nmod', 'france']),
+        (1, ['astatine', 'hypernym', 'element']),
+        (2, ['france', 'nmod', 'paris']),
+    ]
+    assert extractor.get_triples() == [triple for i, triple in extractor.iter_triples(with_sentences=True)]
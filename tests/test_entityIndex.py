@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+from src.entityIndex import SEPARATOR, EntityIndex, resolve_entities
+
+
+def first_containing(word, entities):
+    '''
+    the linear scan EntityIndex replaces
+    '''
+    for entity in entities:
+        if word in entity:
+            return entity
+    return None
+
+
+def test_overlapping_entities():
+    entities = ['new york city', 'york', 'new york', 'the city of york']
+    index = EntityIndex(entities)
+    for word in ['york', 'new york', 'city', 'of york', 'new', 'ork c', 'the', 'boston', 'york city hall']:
+        assert index.lookup(word) == first_containing(word, entities)
+    assert index.lookup('york') == 'new york city'
+
+
+def test_repeated_substrings():
+    entities = ['ab', 'abab', 'ba', 'b', 'aba']
+    index = EntityIndex(entities)
+    for word in ['a', 'b', 'ab', 'ba', 'aba', 'bab', 'abab', 'ababa', '']:
+        assert index.lookup(word) == first_containing(word, entities)
+    # asked again, from the memo
+    assert index.lookup('bab') == 'abab'
+
+
+def test_words_do_not_match_across_entities():
+    entities = ['paris', 'france']
+    index = EntityIndex(entities)
+    assert index.lookup('parisfrance') is None
+    assert index.lookup('s' + SEPARATOR + 'f') is None
+    assert EntityIndex(['a' + SEPARATOR + 'b']).lookup('a' + SEPARATOR) == 'a' + SEPARATOR + 'b'
+    assert EntityIndex([]).lookup('paris') is None
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_lookups_match_the_scan(seed):
+    rng = random.Random(seed)
+    for _ in range(200):
+        entities = [''.join(rng.choice('abc ') for _ in range(rng.randint(0, 6))) for _ in range(rng.randint(0, 8))]
+        index = EntityIndex(entities)
+        for _ in range(20):
+            word = ''.join(rng.choice('abc ') for _ in range(rng.randint(0, 4)))
+            assert index.lookup(word) == first_containing(word, entities)
+
+
+def test_resolve_entities():
+    entities = ['marie curie', 'curie institute', 'paris']
+    triplets = [('curie', 'founded', 'institute'), ('marie', 'lived in', 'paris'), ('curie', 'is', 'marie')]
+    assert resolve_entities(triplets, entities) == [['marie curie', 'founded', 'curie institute'],
+                                                    ['marie curie', 'lived in', 'paris']]
+    assert resolve_entities(triplets, EntityIndex(entities)) == resolve_entities(triplets, entities)
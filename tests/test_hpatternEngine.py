@@ -0,0 +1,62 @@
+import itertools
+
+import pytest
+
+import src.hpatternEngine as hpatternEngine
+from src.hpatternEngine import HearstPatternEngine
+from src.hpatternTokens import compile_token_pattern
+
+BORN_IN = r'NP_(\w+).*?(born|developed|made|established|published).*?(in|at).*?CD_(\w+)'
+SENTENCE = 'NP_curie was born in NP_warsaw in CD_1867'
+PATTERNS = [
+    (r'NP_(\w+) was', 'first', 'test', None),
+    (r'born in NP_(\w+)', 'first', 'test', None),
+    (r'in CD_(\w+)', 'first', 'test', None),
+    (BORN_IN, 'first', 'test', None),
+]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    '''
+    a perf_counter advancing by a second on every call
+    '''
+    ticks = itertools.count()
+    monkeypatch.setattr(hpatternEngine.time, 'perf_counter', lambda: float(next(ticks)))
+
+
+def matched(engine, sentence=SENTENCE):
+    return [pattern[0] for pattern, m in engine.matches(sentence)]
+
+
+def test_token_search_gives_up_past_the_deadline(clock):
+    pattern = compile_token_pattern(BORN_IN)
+    assert pattern.search(SENTENCE).groups() == ('curie', 'born', 'in', '1867')
+    assert pattern.search(SENTENCE, deadline=1000).groups() == ('curie', 'born', 'in', '1867')
+    # three steps backward and three forward, the clock runs out half way
+    assert pattern.search(SENTENCE, deadline=hpatternEngine.time.perf_counter() + 4) is None
+
+
+def test_without_a_budget_every_pattern_runs(clock):
+    engine = HearstPatternEngine(PATTERNS, backend='tokens')
+    assert matched(engine) == [p[0] for p in PATTERNS]
+    assert engine.budget_exceeded == 0
+
+
+# the deadline is taken at 0. As regexes the patterns start at 1 and 2, the third would start
+# at 3. As token patterns every search reads the clock twice, the third would start at 7
+@pytest.mark.parametrize('backend, budget', [('regex', 2.5), ('tokens', 6.5)])
+def test_later_patterns_are_skipped_once_the_budget_is_used_up(clock, backend, budget):
+    engine = HearstPatternEngine(PATTERNS, backend=backend, time_budget=budget)
+    assert matched(engine) == [p[0] for p in PATTERNS[:2]]
+    assert engine.budget_exceeded == 1
+
+
+def test_a_token_search_is_interrupted(clock):
+    engine = HearstPatternEngine([PATTERNS[0], PATTERNS[3]], backend='tokens', time_budget=4.5)
+    # the second search starts at 4 and gives up within its steps, it was the last pattern
+    assert matched(engine) == [PATTERNS[0][0]]
+    assert engine.budget_exceeded == 1
+    engine = HearstPatternEngine([PATTERNS[0], PATTERNS[3]], backend='regex', time_budget=4.5)
+    assert matched(engine) == [PATTERNS[0][0], BORN_IN]
+    assert engine.budget_exceeded == 0
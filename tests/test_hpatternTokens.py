@@ -0,0 +1,64 @@
+import random
+import re
+
+import pytest
+
+from src.hpatternTokens import PATTERN_ELEMENT, compile_token_pattern
+
+# the CD_ patterns of HearstPatterns, in their default, greedy, semi-greedy and same sentence forms
+CD_PATTERNS = [
+    r'NP_(\w+).*?born.*on.* CD_(\d+)? (\w+) CD_(\d+)? ',
+    r'NP_(\w+).*?(died|passed away).*?on.*?CD_(\d+)? (\w+) CD_(\d+)? ',
+    r'NP_(\w+).*?(born|developed|made|established|published).*?(in|at).*?CD_(\w+)',
+    r'NP_(\w+).*?(was|is).*?published.*?(in|on).*?CD_(\w+)',
+    r'.*NP_(\w+).*?born.*on.* CD_(\d+)? (\w+) CD_(\d+)? ',
+    r'.*NP_(\w+).*?(died|passed away).*?on.*?CD_(\d+)? (\w+) CD_(\d+)? ',
+    r'.*NP_(\w+).*?(born|developed|made|established|published).*?(in|at).*?CD_(\w+)',
+    r'.*NP_(\w+) (was|is).*?published.*?(in|on).*?CD_(\w+)',
+    r'.*?NP_(\w+).*?born.*on.* CD_(\d+)? (\w+) CD_(\d+)? ',
+    r'.*?NP_(\w+).*?(died|passed away).*?on.*?CD_(\d+)? (\w+) CD_(\d+)? ',
+    r'.*?NP_(\w+).*?(born|developed|made|established|published).*?(in|at).*?CD_(\w+)',
+    r'.*?NP_(\w+) (was|is).*?published.*?(in|on).*?CD_(\w+)',
+]
+
+VOCABULARY = ('NP_curie NP_paris NP_book CD_ CD_7 CD_1867 CD_may CD_march march may born on in at was is '
+              'died passed away developed made established published the x').split()
+
+
+def whole_token_regex(pattern):
+    '''
+    the pattern with its keywords and atoms bound to whole tokens, what the token backend matches
+    '''
+    parts = list()
+    for m in PATTERN_ELEMENT.finditer(pattern):
+        kind, text = m.lastgroup, m.group(0)
+        if kind == 'kw':
+            text = r'\b{}\b'.format(text)
+        elif kind == 'alt':
+            text = '({})'.format('|'.join(r'\b{}\b'.format(a) for a in text[1:-1].split('|')))
+        elif kind in ('np', 'cd', 'cd_opt', 'word'):
+            text = r'(?<!\S)' + text
+        parts.append(text)
+    return re.compile(''.join(parts))
+
+
+@pytest.mark.parametrize('pattern', CD_PATTERNS)
+def test_cd_patterns_match_like_the_regex(pattern):
+    tokens = compile_token_pattern(pattern)
+    assert tokens is not None
+    regex = whole_token_regex(pattern)
+    rng = random.Random(pattern)
+    for _ in range(3000):
+        sentence = ' '.join(rng.choice(VOCABULARY) for _ in range(rng.randint(1, 16))) + rng.choice(['', ' '])
+        expected = regex.search(sentence)
+        found = tokens.search(sentence)
+        assert (expected is None) == (found is None), sentence
+        if expected is not None:
+            assert expected.groups() == found.groups(), sentence
+
+
+def test_optional_cd_rejects_words():
+    pattern = compile_token_pattern(r'NP_(\w+).*?born.*on.* CD_(\d+)? (\w+) CD_(\d+)? ')
+    assert pattern.search('NP_curie born on CD_may march CD_1867 ') is None
+    assert pattern.search('NP_curie born on CD_7 march CD_1867 ').groups() == ('curie', '7', 'march', '1867')
+    assert pattern.search('NP_curie born on CD_ march CD_ ').groups() == ('curie', None, 'march', None)
@@ -0,0 +1,56 @@
+import sys
+import types
+
+from src.models import ModelRegistry, coref_loader
+import src.models
+
+
+class Pipeline(object):
+
+    def __init__(self):
+        self.pipe_names = ['tagger', 'parser', 'ner']
+
+
+def test_coref_model_shares_the_base_pipeline(monkeypatch):
+    loads = list()
+    registry = ModelRegistry()
+    registry.register('en', lambda: loads.append('en') or Pipeline())
+    registry.register('en_coref', coref_loader('en'))
+    neuralcoref = types.ModuleType('neuralcoref')
+    neuralcoref.add_to_pipe = lambda nlp: nlp.pipe_names.append('neuralcoref')
+    monkeypatch.setitem(sys.modules, 'neuralcoref', neuralcoref)
+    monkeypatch.setattr(src.models, 'registry', registry)
+
+    coref = registry.get('en_coref')
+    assert registry.get('en') is coref
+    assert loads == ['en']
+    assert coref.pipe_names == ['tagger', 'parser', 'ner', 'neuralcoref']
+
+    # reloading en_coref does not add the component twice
+    registry.unload('en_coref')
+    assert registry.get('en_coref').pipe_names.count('neuralcoref') == 1
+
+
+def test_unloading_an_alias_drops_the_shared_pipeline(monkeypatch):
+    loads = list()
+    registry = ModelRegistry()
+    registry.register('en', lambda: loads.append('en') or Pipeline())
+    registry.register('en_coref', coref_loader('en'))
+    registry.register('de', lambda: loads.append('de') or Pipeline())
+    neuralcoref = types.ModuleType('neuralcoref')
+    neuralcoref.add_to_pipe = lambda nlp: nlp.pipe_names.append('neuralcoref')
+    monkeypatch.setitem(sys.modules, 'neuralcoref', neuralcoref)
+    monkeypatch.setattr(src.models, 'registry', registry)
+
+    registry.preload(['en_coref', 'de'])
+    registry.unload('en_coref')
+    assert registry.loaded() == ['de']
+    # en is loaded again, without the coref component
+    assert registry.get('en').pipe_names == ['tagger', 'parser', 'ner']
+    assert loads == ['en', 'de', 'en']
+
+    registry.get('en_coref')
+    registry.unload('en')
+    assert registry.loaded() == ['de']
+    registry.unload('missing')
+    assert registry.loaded() == ['de']
@@ -0,0 +1,31 @@
+import time
+
+from src.parseCache import ParseCache
+
+
+def test_disk_hit_keeps_its_created_time(tmp_path):
+    path = str(tmp_path / 'parses.db')
+    writer = ParseCache(path=path, ttl=60)
+    writer.put('Paris is a city .', 'dependency:test', ['parse'])
+    created = writer.store.get_entry(ParseCache.key('Paris is a city .', 'dependency:test'))[1]
+
+    reader = ParseCache(path=path, ttl=60)
+    assert reader.get('Paris is a city .', 'dependency:test') == ['parse']
+    assert reader.stats()['size'] == 1
+    assert list(reader.entries.values())[0][1] == created
+
+
+def test_promoted_entry_expires_with_the_stored_parse(tmp_path, monkeypatch):
+    path = str(tmp_path / 'parses.db')
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now)
+    ParseCache(path=path).put('Paris is a city .', 'dependency:test', ['parse'])
+
+    reader = ParseCache(path=path, ttl=10)
+    monkeypatch.setattr(time, 'time', lambda: now + 8)
+    assert reader.get('Paris is a city .', 'dependency:test') == ['parse']
+    assert reader.stats()['disk_hits'] == 1
+
+    monkeypatch.setattr(time, 'time', lambda: now + 12)
+    assert reader.get('Paris is a city .', 'dependency:test') is None
+    assert reader.stats()['hits'] == 0
@@ -0,0 +1,65 @@
+import asyncio
+import json
+
+from src.service import ExtractionService
+
+
+class EchoService(ExtractionService):
+
+    def hearst_batch(self, texts):
+        return [[text.upper()] for text in texts]
+
+    def triples_batch(self, texts):
+        raise Exception('unused')
+
+
+class BrokenService(EchoService):
+
+    async def extract(self, path, text, deadline_ms=None):
+        raise RuntimeError('broken')
+
+
+async def post(port, body, content_type='application/json'):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    body = body.encode('utf-8')
+    writer.write('POST /hearst HTTP/1.1\r\nContent-Type: {}\r\nContent-Length: {}\r\nConnection: close\r\n\r\n'.format(
+        content_type, len(body)).encode('latin-1') + body)
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(payload.decode('utf-8'))
+
+
+def serve(service, requests):
+    async def run():
+        await service.start()
+        for _ in range(100):
+            if service.state == 'ready':
+                break
+            await asyncio.sleep(0.01)
+        try:
+            return [await post(service.port, body) for body in requests]
+        finally:
+            await service.stop()
+    return asyncio.run(run())
+
+
+def test_deadline_ms_is_validated():
+    bodies = [
+        {'text': 'astatine', 'deadline_ms': 'soon'},
+        {'text': 'astatine', 'deadline_ms': -5},
+        {'text': 'astatine', 'deadline_ms': 0},
+        {'text': 'astatine', 'deadline_ms': True},
+        {'text': 'astatine', 'deadline_ms': [100]},
+        {'text': 'astatine', 'deadline_ms': 2000},
+        {'text': 'astatine'},
+    ]
+    responses = serve(EchoService(port=0, warmup=False), [json.dumps(body) for body in bodies])
+    assert [status for status, payload in responses] == [400, 400, 400, 400, 400, 200, 200]
+    assert responses[0][1] == {'error': 'deadline_ms must be a positive number'}
+    assert responses[-1][1] == {'hypernyms': ['ASTATINE']}
+
+
+def test_unexpected_errors_get_a_500():
+    responses = serve(BrokenService(port=0, warmup=False), [json.dumps({'text': 'astatine'})])
+    assert responses == [(500, {'error': 'RuntimeError: broken'})]
@@ -0,0 +1,161 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+import requests
+
+import src.parseCache as parseCache
+from src.pipelines import Spotlight_Pipeline
+
+
+class CountingSpotlight(object):
+    """
+    A Spotlight annotate endpoint spotting every capitalized word of the text as a resource,
+    counting the requests. failures is a list of status codes answered before the real
+    responses, requests wait for release to be set before they are answered.
+    """
+
+    def __init__(self):
+        self.requests = list()
+        self.failures = list()
+        self.release = threading.Event()
+        self.release.set()
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_POST(self):
+                form = parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8'))
+                text = form['text'][0]
+                with stub.lock:
+                    stub.requests.append(text)
+                    status = stub.failures.pop(0) if stub.failures else 200
+                stub.release.wait(5)
+                body = json.dumps(stub.annotate(text) if status == 200 else {'error': status}).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = 'http://127.0.0.1:{}/rest/annotate'.format(self.server.server_address[1])
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def annotate(self, text):
+        resources = list()
+        offset = 0
+        for word in text.split():
+            if word[0].isupper():
+                resources.append({'@URI': 'http://dbpedia.org/resource/' + word, '@surfaceForm': word,
+                                  '@offset': str(text.index(word, offset)), '@similarityScore': '0.9', '@types': ''})
+            offset += len(word) + 1
+        return {'@text': text, 'Resources': resources} if resources else {'@text': text}
+
+    def close(self):
+        self.release.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def endpoint():
+    stub = CountingSpotlight()
+    yield stub
+    stub.close()
+
+
+@pytest.fixture
+def pipeline(endpoint):
+    pipeline = Spotlight_Pipeline(address=endpoint.url, max_workers=8, ttl=60, timeout=5)
+    yield pipeline
+    pipeline.close()
+
+
+def lookup_concurrently(pipeline, endpoint, text, count=8):
+    '''
+    starts count lookups of text while the endpoint holds the first request, returns the
+    results (or exceptions) once it is released
+    '''
+    endpoint.release.clear()
+    results = [None] * count
+
+    def lookup(i):
+        try:
+            results[i] = pipeline.annotate(text)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=lookup, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    deadline = time.time() + 5
+    while not endpoint.requests and time.time() < deadline:
+        time.sleep(0.01)
+    # the other lookups find the request in flight
+    time.sleep(0.1)
+    endpoint.release.set()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_concurrent_lookups_share_one_request(pipeline, endpoint):
+    results = lookup_concurrently(pipeline, endpoint, 'Berlin is in Germany')
+    assert endpoint.requests == ['Berlin is in Germany']
+    assert all(result == results[0] for result in results)
+    assert pipeline.read_annotations(results[0]) == ['http://dbpedia.org/resource/Berlin', 'http://dbpedia.org/resource/Germany']
+    assert pipeline.in_flight == {}
+
+
+def test_lookups_are_cached(pipeline, endpoint):
+    first = pipeline.annotate('Berlin')
+    assert pipeline.annotate('Berlin') == first
+    assert pipeline.annotate_word('Berlin') == ['http://dbpedia.org/resource/Berlin']
+    assert pipeline.annotate_word('nothing') == 'nothing'
+    assert endpoint.requests == ['Berlin', 'nothing']
+
+
+def test_failed_lookups_are_not_cached(pipeline, endpoint):
+    endpoint.failures = [500]
+    with pytest.raises(requests.HTTPError):
+        pipeline.annotate('Berlin')
+    assert pipeline.annotate_word('Berlin') == ['http://dbpedia.org/resource/Berlin']
+    assert endpoint.requests == ['Berlin', 'Berlin']
+
+
+def test_a_failed_request_fails_every_waiting_lookup(pipeline, endpoint):
+    endpoint.failures = [503]
+    results = lookup_concurrently(pipeline, endpoint, 'Paris')
+    assert endpoint.requests == ['Paris']
+    assert all(isinstance(result, requests.HTTPError) for result in results)
+    # and the next lookup asks again
+    assert pipeline.annotate_word('Paris') == ['http://dbpedia.org/resource/Paris']
+    assert endpoint.requests == ['Paris', 'Paris']
+
+
+def test_lookups_expire_after_the_ttl(pipeline, endpoint, monkeypatch):
+    now = [time.time()]
+    monkeypatch.setattr(parseCache.time, 'time', lambda: now[0])
+    pipeline.annotate('Berlin')
+    now[0] += 59
+    pipeline.annotate('Berlin')
+    assert endpoint.requests == ['Berlin']
+    now[0] += 2
+    pipeline.annotate('Berlin')
+    assert endpoint.requests == ['Berlin', 'Berlin']
+
+
+def test_annotate_many_looks_up_every_word_once(pipeline, endpoint):
+    words = ['Berlin', 'Paris', 'Berlin', 'nothing', 'Paris']
+    assert pipeline.annotate_many(words) == [['http://dbpedia.org/resource/Berlin'], ['http://dbpedia.org/resource/Paris'],
+                                             ['http://dbpedia.org/resource/Berlin'], 'nothing', ['http://dbpedia.org/resource/Paris']]
+    assert sorted(endpoint.requests) == ['Berlin', 'Paris', 'nothing']
@@ -0,0 +1,70 @@
+import pytest
+from nltk.tree import Tree
+
+from src.tregexMatcher import TregexException, TregexPattern, tregex_matches
+
+ASTATINE = Tree.fromstring('(ROOT (S (NP (NNP Astatine)) (VP (VBZ is) (NP (NP (DT a) (JJ rare) (NN element))'
+                           ' (PP (IN on) (NP (NNP Earth))))) (. .)))')
+RADON = Tree.fromstring('(ROOT (S (NP (NN Radon)) (VP (VBZ is) (NP (DT a) (NN gas))) (. .)))')
+
+
+def found(pattern, tree=ASTATINE):
+    return [(m['position'], m['match']) for m in TregexPattern(pattern).findall(tree)]
+
+
+def test_sister_under_a_clause():
+    # the subject pattern, an NP next to the VP of a clause
+    assert found('NP $ VP > S') == [((0, 0), '(NP (NNP Astatine))')]
+    assert found('NP $++ VP > S') == found('NP $ VP > S')
+    assert [position for position, match in found('VP $-- NP')] == [(0, 1)]
+    assert found('NP $ ADJP') == []
+
+
+def test_immediate_dominance():
+    assert found('NP < NN') == [((0, 1, 1, 0), '(NP (DT a) (JJ rare) (NN element))')]
+    assert found('__ < element') == [((0, 1, 1, 0, 2), '(NN element)')]
+    assert [m['namedNodes'] for m in TregexPattern('VP < /^VB/=verb').findall(ASTATINE)] == [{'verb': '(VBZ is)'}]
+
+
+def test_dominance():
+    assert [position for position, match in found('NP >> VP')] == [(0, 1, 1), (0, 1, 1, 0), (0, 1, 1, 1, 1)]
+    assert [position for position, match in found('NP << NN')] == [(0, 1, 1), (0, 1, 1, 0)]
+    assert [position for position, match in found('S < (VP < (NP < PP))')] == [(0,)]
+
+
+def test_negation():
+    assert [position for position, match in found('NP !<< PP')] == [(0, 0), (0, 1, 1, 0), (0, 1, 1, 1, 1)]
+    assert [position for position, match in found('NP !<< PP !< NNP')] == [(0, 1, 1, 0)]
+    assert found('!NP < NNP') == []
+
+
+def test_named_and_optional_nodes():
+    match = TregexPattern('NP=subject $+ VP > S').findall(ASTATINE)[0]
+    assert match['namedNodes'] == {'subject': '(NP (NNP Astatine))'}
+    assert [m['namedNodes'] for m in TregexPattern('NP ?< DT=det < NN').findall(RADON)] == [{}, {'det': '(DT a)'}]
+    assert [m['namedNodes'] for m in TregexPattern('NP ?< DT=det < NN').findall(Tree.fromstring('(NP (NN gas))'))] == [{}]
+
+
+def test_alternatives():
+    assert [position for position, match in found('(NP < NNP) | (VP < VBZ)')] == [(0, 0), (0, 1), (0, 1, 1, 1, 1)]
+    assert [position for position, match in found('NP [< NN | < PP]')] == [(0, 1, 1), (0, 1, 1, 0)]
+    assert found('VP [< NN | < PP]') == []
+
+
+def test_no_match():
+    assert found('ADJP') == []
+    assert found('NP < VP') == []
+    assert tregex_matches(['SBAR << NN'], [ASTATINE, RADON]) == {'SBAR << NN': []}
+
+
+def test_matches_of_many_trees():
+    matches = tregex_matches(['NP $ VP > S', 'NP < NN'], [ASTATINE, RADON])
+    assert [(m['sentIndex'], m['match']) for m in matches['NP $ VP > S']] == [(0, '(NP (NNP Astatine))'), (1, '(NP (NN Radon))')]
+    assert [(m['sentIndex'], m['match']) for m in matches['NP < NN']] == [(0, '(NP (DT a) (JJ rare) (NN element))'), (1, '(NP (NN Radon))'), (1, '(NP (DT a) (NN gas))')]
+
+
+def test_invalid_patterns():
+    with pytest.raises(TregexException):
+        TregexPattern('NP < (VP')
+    with pytest.raises(TregexException):
+        TregexPattern('NP <')
@@ -0,0 +1,101 @@
+import pytest
+
+import src.tripleStore as tripleStore
+from src.tripleStore import TripleAggregator, TripleStore, build_store
+
+
+def singular(word):
+    return word[:-1] if word.endswith('s') else word
+
+
+@pytest.fixture
+def lemmatizer(monkeypatch):
+    monkeypatch.setitem(tripleStore.LEMMATIZERS, 'singular', lambda: singular)
+    return 'singular'
+
+
+RECORDS = [
+    {'id': 'a', 'triples': [['Elements', 'include', 'Astatine'], ['Gases', 'include', 'Radon']]},
+    {'id': 'b', 'triples': [['element', 'includes', 'astatine']]},
+]
+
+
+def test_lookup_uses_the_recorded_lemmatizer(tmp_path, lemmatizer):
+    path = str(tmp_path / 'triples.db')
+    with TripleStore(path) as store:
+        assert build_store(RECORDS, store, lemmatizer=lemmatizer) == 3
+    # opened without a lemmatizer, the store loads the one it was written with
+    with TripleStore(path) as store:
+        assert store.lookup(subject='Elements') == [('element', 'include', 'astatine', 2)]
+        assert store.support(('gases', 'include', 'radon')) == 1
+        assert store.sources(('ELEMENTS', 'includes', 'astatine')) == ['a', 'b']
+
+
+def test_other_settings_are_refused(tmp_path, lemmatizer):
+    path = str(tmp_path / 'triples.db')
+    with TripleStore(path) as store:
+        build_store(RECORDS, store, lemmatizer=lemmatizer)
+        with pytest.raises(Exception):
+            build_store(RECORDS, store)
+        with pytest.raises(Exception):
+            build_store(RECORDS, store, lowercase=False, lemmatizer=lemmatizer)
+        assert len(store) == 2
+
+
+def test_custom_lemmatizer_must_be_given(tmp_path):
+    path = str(tmp_path / 'triples.db')
+    with TripleStore(path) as store:
+        build_store(RECORDS, store, lemmatizer=singular)
+        assert store.lookup(subject='elements')[0][3] == 2
+    with pytest.raises(Exception):
+        TripleStore(path)
+    with TripleStore(path, lemmatizer=singular) as store:
+        assert store.lookup(object_='Radons') == [('gase', 'include', 'radon', 1)]
+
+
+def test_cli_lemmatize_flag(tmp_path, lemmatizer, monkeypatch, capsys):
+    monkeypatch.setattr(tripleStore, 'DEFAULT_LEMMATIZER', lemmatizer)
+    records = tmp_path / 'triples.jsonl'
+    records.write_text('{"id": "a", "triples": [["Elements", "include", "Astatine"]]}\n')
+    path = str(tmp_path / 'triples.db')
+    assert tripleStore.main(['build', str(records), path, '--lemmatize']) == 0
+    assert tripleStore.main(['lookup', path, '--subject', 'elements']) == 0
+    assert capsys.readouterr().out.splitlines()[-1] == '["element", "include", "astatine", 1]'
+
+
+def test_aggregator_takes_a_lemmatizer_name(lemmatizer):
+    aggregator = TripleAggregator(lemmatizer=lemmatizer)
+    assert aggregator.lemmatizer_name == 'singular'
+    assert aggregator.canonical(('Noble Gases', 'include', 'radon')) == ('noble gase', 'include', 'radon')
+    with pytest.raises(Exception):
+        TripleAggregator(lemmatizer='unknown')
+
+
+def test_reingesting_is_idempotent(tmp_path):
+    path = str(tmp_path / 'triples.db')
+    records = RECORDS + [{'id': 'c', 'triples': [['radon', 'is', 'gas'], ['radon', 'is', 'gas']]}]
+    with TripleStore(path) as store:
+        build_store(records, store, flush_every=1)
+        before = store.lookup()
+        build_store(records, store)
+        build_store(records[1:], store, flush_every=2)
+        assert store.lookup() == before
+        assert store.support(('radon', 'is', 'gas')) == 2
+        assert store.sources(('elements', 'include', 'astatine')) == ['a']
+
+        build_store([{'id': 'd', 'triples': [['radon', 'is', 'gas']]}], store)
+        assert store.support(('radon', 'is', 'gas')) == 3
+
+
+def test_unsourced_occurrences_are_always_added(tmp_path):
+    path = str(tmp_path / 'triples.db')
+    with TripleStore(path) as store:
+        for _ in range(2):
+            aggregator = TripleAggregator(max_sources=1)
+            aggregator.add(('radon', 'is', 'gas'))
+            aggregator.add(('radon', 'is', 'gas'), 'a')
+            aggregator.add(('radon', 'is', 'gas'), 'b')
+            aggregator.flush(store)
+        # the first merge counts all 3, the second only the occurrences without a kept source
+        assert store.support(('radon', 'is', 'gas')) == 5
+        assert store.sources(('radon', 'is', 'gas')) == ['a']